@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+"""
+Script to measure the memory used by romdb_data.Version objects. It's not part of the test suite, run it from the
+romdb_tools_v2 directory with:
+
+    python -m benchmarks.measure_version_memory [versions]
+
+Every Version is built from its own json, decoded from text like the answers of ROMdb, and the json is discarded
+afterwards. The growth of the resident memory of the process is reported twice: right after parsing the versions and
+after accessing all their lazy properties.
+
+Results for 100k versions, each with 3 parent games and 1 sibling, on Python 2.7.18 / Linux x86_64, before and after
+Version stopped keeping the whole json of the version (it only keeps the raw json of the lazy fields until they are
+decoded):
+
+                 before                after
+    parsed:  2614.9 MiB (27419 B)   1995.7 MiB (20926 B)
+    decoded: 2797.0 MiB (29328 B)   2007.9 MiB (21054 B)
+"""
+
+import gc
+import json
+import resource
+import sys
+
+from libs import romdb_data
+
+from tests.test_romdb_data import _get_game_json, _get_version_json
+
+
+def _get_rss():
+    """
+    Function to get the resident memory of the process in bytes.
+    :rtype int
+    """
+    try:
+        with open('/proc/self/statm', 'r') as o_file:
+            return int(o_file.read().split()[1]) * resource.getpagesize()
+    except IOError:
+        # Peak memory instead of the current one, in KiB on Linux but in bytes on macOS
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def main(pi_versions):
+    dx_json = _get_version_json(u'00000000', [_get_game_json(i_nid) for i_nid in range(3)])
+    dx_json['as_mdata_screen_titles'] = [u'jp: スーパーマリオワールド (Super Mario World)']
+    dx_json['s_mdata_differences'] = u'Language: Japanese text.'
+    dx_json['ao_sibling_versions'] = [_get_version_json(u'00000001', [])]
+    s_json = json.dumps(dx_json)
+
+    gc.collect()
+    i_start = _get_rss()
+
+    lo_versions = []
+    for i_version in range(pi_versions):
+        o_version = romdb_data.Version()
+        o_version.from_json(json.loads(s_json.replace('00000000', '%08x' % i_version)))
+        lo_versions.append(o_version)
+
+    gc.collect()
+    i_parsed = _get_rss()
+
+    for o_version in lo_versions:
+        o_version.o_mdata_screen_titles
+        o_version.lo_mdata_differences
+        o_version.lo_siblings
+        o_version.lo_parent_games
+
+    gc.collect()
+    i_decoded = _get_rss()
+
+    print '%i versions' % pi_versions
+    print '  parsed:  %7.1f MiB (%i bytes/version)' % ((i_parsed - i_start) / 1048576.0,
+                                                      (i_parsed - i_start) / pi_versions)
+    print '  decoded: %7.1f MiB (%i bytes/version)' % ((i_decoded - i_start) / 1048576.0,
+                                                      (i_decoded - i_start) / pi_versions)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
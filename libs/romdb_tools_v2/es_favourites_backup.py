@@ -175,7 +175,8 @@ def get_favourites_from_gamelist(pu_gamelist, pu_dat=None):
     o_xtree = o_xml.getroot()
 
     if pu_dat is not None:
-        o_dat = dat_files.RomSetContainer(pu_dat)
+        # The same dats are read on every run, so they are cached once parsed
+        o_dat = dat_files.RomSetContainer(pu_dat, pb_cache=True)
     else:
         o_dat = None
 
@@ -0,0 +1,716 @@
+# -*- coding: utf-8 -*-
+
+"""
+Library to store the data of a dat in columns (arrays of numbers and bytes) instead of millions of Python objects. The
+dat is read RomSet by RomSet, so the whole RomSetContainer never exists in memory. e.g.
+
+    o_columns = dat_columns.RomSetColumns.from_dat(u'/home/john/mame.dat')
+
+    for o_romset in o_columns:
+        print o_romset.u_desc
+
+CRC32s are stored as uint32, sizes as uint64, MD5s and SHA1s as fixed width binary strings and all the texts (names,
+descriptions...) only once in a table of strings.
+
+The columns are stored in shared memory (multiprocessing.sharedctypes.RawArray), so worker processes use them without
+any copy. RawArray objects can't be pickled, so the columns only reach the workers when the worker processes are
+created: inherited through fork (e.g. a module global set before creating the pool on Linux) or passed to the pool
+initializer:
+
+    o_pool = multiprocessing.Pool(4, initializer=_init_worker, initargs=(o_columns,))
+
+Sending them later, through Pool.map(), apply_async(), a Queue... fails with a PicklingError (a Queue only reports it
+in its feeder thread).
+
+RomSets and Roms are built on demand when they are requested, so they are normal dat_files objects and any change done
+to them is NOT stored in the columns. The indexes used by get_romsets_by_field() are normal dictionaries built on demand
+too, so each process builds its own ones.
+
+--- This library is part of the "hqtools" package. Never modify it outside it. ---
+"""
+
+import array
+import binascii
+import bisect
+import ctypes
+import multiprocessing.sharedctypes
+
+import dat_files
+
+
+# Constants
+#=======================================================================================================================
+# Position in the table of strings for missing attributes (e.g. RomSets without year)
+_i_NO_STRING = 0xffffffff
+
+# Bits of the flags of each ROM
+_i_FLAG_BAD = 1
+_i_FLAG_CRC32 = 2
+_i_FLAG_MD5 = 4
+_i_FLAG_SHA1 = 8
+
+# Bits of the flags for hashes that are None instead of empty (XML dats use None for missing MD5s and SHA1s)
+_di_FLAGS_NONE = {'u_crc32': 16, 'u_md5': 32, 'u_sha1': 64}
+
+# Length in bytes of the binary hashes
+_i_MD5_BYTES = 16
+_i_SHA1_BYTES = 20
+
+_i_MAX_UINT64 = 0xffffffffffffffff
+
+# Fields that can be searched with get_romsets_by_field()
+_tu_SEARCH_FIELDS = ('u_year',
+                     'u_ccrc32', 'u_dcrc32',
+                     'u_cmd5', 'u_dmd5',
+                     'u_csha1', 'u_dsha1',
+                     'u_desc', 'u_name', 'u_auth')
+
+# Fields read directly from the table of strings, without building the RomSets
+_ds_STRING_COLUMNS = {'u_name': '_ai_romset_names',
+                      'u_desc': '_ai_romset_descs',
+                      'u_auth': '_ai_romset_auths',
+                      'u_year': '_ai_romset_years'}
+
+
+# Classes
+#=======================================================================================================================
+class RomSetColumns(object):
+    """
+    Class to store RomSets in columns, sorted by description like in a RomSetContainer. The object is read only.
+    """
+    def __init__(self, po_container=None, pb_shared=True):
+        """
+        :param po_container: Container with the RomSets to store. Use from_dat() to read them directly from a dat.
+        :type po_container: dat_files.RomSetContainer
+
+        :param pb_shared: Whether the columns are stored in shared memory (to be used from several processes) or not.
+        :type pb_shared: bool
+        """
+        # Meta-data of the dat
+        self.u_name = u''
+        self.u_description = u''
+        self.u_version = u''
+        self.u_comment = u''
+        self.u_type = u''
+        self.u_author = u''
+        self.u_homepage = u''
+
+        # Values that don't fit in the columns (e.g. malformed hashes), keyed by (rom position, attribute). They are
+        # rare, so they are stored as they are.
+        self._dtx_irregular = {}
+
+        # Lookup indexes for get_romsets_by_field(), built on demand: {field: {value: [position, ...]}}
+        self._dli_indexes = {}
+
+        # CRC32s of the ROMs sorted, and the position of each ROM, for get_romsets_by_rom_crc32(). Built on demand.
+        self._ai_sorted_crc32s = None
+        self._ai_sorted_crc32_roms = None
+
+        if po_container is None:
+            po_container = dat_files.RomSetContainer()
+
+        self._build(po_container, po_container, pb_shared)
+
+    @classmethod
+    def from_dat(cls, pu_file, pb_shared=True):
+        """
+        Method to build the columns reading a dat RomSet by RomSet (see dat_files.iter_dat_romsets()), so only one of
+        them is in memory at the same time.
+
+        :param pu_file: Path of the dat file. i.e. '/home/john/mame.dat'
+        :type pu_file: unicode
+
+        :param pb_shared: Whether the columns are stored in shared memory (to be used from several processes) or not.
+        :type pb_shared: bool
+
+        :return: The columns.
+        :rtype RomSetColumns
+        """
+        o_header = dat_files.RomSetContainer()
+        o_columns = cls(pb_shared=pb_shared)
+        o_columns._build(o_header, dat_files.iter_dat_romsets(pu_file, po_container=o_header), pb_shared)
+
+        return o_columns
+
+    def _build(self, po_header, po_romsets, pb_shared):
+        """
+        Method to fill the columns.
+
+        :param po_header: Object with the meta-data of the dat (name, description...). It's read after po_romsets, so
+                          it can be filled while reading them.
+        :type po_header: dat_files.RomSetContainer
+
+        :param po_romsets: RomSets to store, in any order.
+        :type po_romsets: collections.Iterable[dat_files.RomSet]
+
+        :param pb_shared: Whether the columns are stored in shared memory.
+        :type pb_shared: bool
+
+        :return: Nothing
+        """
+        o_strings = _StringTable()
+
+        # Columns are built in compact arrays; sizes don't fit in the arrays of Python 2 (there is no 64 bits type)
+        ai_romset_names = array.array('I')
+        ai_romset_descs = array.array('I')
+        ai_romset_auths = array.array('I')
+        ai_romset_years = array.array('I')
+        ai_romset_starts = array.array('I', [0])
+
+        ai_rom_names = array.array('I')
+        ai_rom_crc32s = array.array('I')
+        li_rom_sizes = []
+        ai_rom_flags = array.array('B')
+        as_rom_md5s = bytearray()
+        as_rom_sha1s = bytearray()
+
+        for o_romset in po_romsets:
+            ai_romset_names.append(o_strings.add(o_romset.u_name))
+            ai_romset_descs.append(o_strings.add(o_romset.u_desc))
+            ai_romset_auths.append(o_strings.add(o_romset.u_auth))
+            ai_romset_years.append(o_strings.add(getattr(o_romset, 'u_year', None)))
+
+            for o_rom in o_romset.lo_roms:
+                i_rom = len(ai_rom_names)
+                i_flags = _i_FLAG_BAD if o_rom.b_bad else 0
+
+                ai_rom_names.append(o_strings.add(o_rom.u_name))
+
+                i_crc32 = 0
+                if o_rom.u_crc32:
+                    s_crc32 = _pack_hex(o_rom.u_crc32, 4)
+                    if s_crc32 is None:
+                        self._dtx_irregular[(i_rom, 'u_crc32')] = o_rom.u_crc32
+                    else:
+                        i_crc32 = int(o_rom.u_crc32, 16)
+                        i_flags |= _i_FLAG_CRC32
+                elif o_rom.u_crc32 is None:
+                    i_flags |= _di_FLAGS_NONE['u_crc32']
+                ai_rom_crc32s.append(i_crc32)
+
+                for s_attribute, i_bytes, i_flag, as_column in (('u_md5', _i_MD5_BYTES, _i_FLAG_MD5, as_rom_md5s),
+                                                                ('u_sha1', _i_SHA1_BYTES, _i_FLAG_SHA1, as_rom_sha1s)):
+                    u_hash = getattr(o_rom, s_attribute)
+                    s_hash = _pack_hex(u_hash, i_bytes) if u_hash else None
+                    if s_hash is None:
+                        s_hash = '\x00' * i_bytes
+                        if u_hash is None:
+                            i_flags |= _di_FLAGS_NONE[s_attribute]
+                        elif u_hash != u'':
+                            self._dtx_irregular[(i_rom, s_attribute)] = u_hash
+                    else:
+                        i_flags |= i_flag
+                    as_column.extend(s_hash)
+
+                if isinstance(o_rom.i_size, (int, long)) and 0 <= o_rom.i_size <= _i_MAX_UINT64:
+                    li_rom_sizes.append(o_rom.i_size)
+                else:
+                    li_rom_sizes.append(0)
+                    self._dtx_irregular[(i_rom, 'i_size')] = o_rom.i_size
+
+                ai_rom_flags.append(i_flags)
+
+            ai_romset_starts.append(len(ai_rom_names))
+
+        # Meta-data
+        #----------
+        self.u_name = po_header.u_name
+        self.u_description = po_header.u_description
+        self.u_version = po_header.u_version
+        self.u_comment = po_header.u_comment
+        self.u_type = po_header.u_type
+        self.u_author = po_header.u_author
+        self.u_homepage = po_header.u_homepage
+
+        # Sorting
+        #--------
+        # Dats are usually sorted already, so the RomSets are only moved when they are not
+        ls_sort_keys = [o_strings.get(i_desc).encode('utf8', 'strict') for i_desc in ai_romset_descs]
+        if any(ls_sort_keys[i_romset] > ls_sort_keys[i_romset + 1] for i_romset in xrange(len(ls_sort_keys) - 1)):
+            li_order = sorted(xrange(len(ls_sort_keys)), key=ls_sort_keys.__getitem__)
+
+            ai_romset_names = _reorder(ai_romset_names, li_order)
+            ai_romset_descs = _reorder(ai_romset_descs, li_order)
+            ai_romset_auths = _reorder(ai_romset_auths, li_order)
+            ai_romset_years = _reorder(ai_romset_years, li_order)
+
+            # ROMs are moved together with their RomSets
+            li_rom_order = []
+            ai_sorted_starts = array.array('I', [0])
+            for i_romset in li_order:
+                li_rom_order.extend(xrange(ai_romset_starts[i_romset], ai_romset_starts[i_romset + 1]))
+                ai_sorted_starts.append(len(li_rom_order))
+            ai_romset_starts = ai_sorted_starts
+
+            ai_rom_names = _reorder(ai_rom_names, li_rom_order)
+            ai_rom_crc32s = _reorder(ai_rom_crc32s, li_rom_order)
+            li_rom_sizes = [li_rom_sizes[i_rom] for i_rom in li_rom_order]
+            ai_rom_flags = _reorder(ai_rom_flags, li_rom_order)
+            as_rom_md5s = _reorder_bytes(as_rom_md5s, li_rom_order, _i_MD5_BYTES)
+            as_rom_sha1s = _reorder_bytes(as_rom_sha1s, li_rom_order, _i_SHA1_BYTES)
+
+            if self._dtx_irregular:
+                di_positions = dict((i_old, i_new) for i_new, i_old in enumerate(li_rom_order))
+                self._dtx_irregular = dict(((di_positions[i_rom], s_attribute), x_value)
+                                           for (i_rom, s_attribute), x_value in self._dtx_irregular.iteritems())
+
+        # Columns
+        #--------
+        self._o_strings = o_strings.freeze(pb_shared)
+
+        self._ai_romset_names = _new_array(ctypes.c_uint32, ai_romset_names, pb_shared)
+        self._ai_romset_descs = _new_array(ctypes.c_uint32, ai_romset_descs, pb_shared)
+        self._ai_romset_auths = _new_array(ctypes.c_uint32, ai_romset_auths, pb_shared)
+        self._ai_romset_years = _new_array(ctypes.c_uint32, ai_romset_years, pb_shared)
+        self._ai_romset_starts = _new_array(ctypes.c_uint32, ai_romset_starts, pb_shared)
+
+        self._ai_rom_names = _new_array(ctypes.c_uint32, ai_rom_names, pb_shared)
+        self._ai_rom_crc32s = _new_array(ctypes.c_uint32, ai_rom_crc32s, pb_shared)
+        self._ai_rom_sizes = _new_array(ctypes.c_uint64, li_rom_sizes, pb_shared)
+        self._ai_rom_flags = _new_array(ctypes.c_uint8, ai_rom_flags, pb_shared)
+        self._as_rom_md5s = _new_bytes(str(as_rom_md5s), pb_shared)
+        self._as_rom_sha1s = _new_bytes(str(as_rom_sha1s), pb_shared)
+
+    def __getitem__(self, pi_position):
+        """
+        :param pi_position: Position of the RomSet. Negative positions are counted from the end.
+        :type pi_position: int
+
+        :return: A new RomSet object with the data of the position.
+        :rtype dat_files.RomSet
+        """
+        i_romsets = len(self)
+        if pi_position < 0:
+            pi_position += i_romsets
+        if not 0 <= pi_position < i_romsets:
+            raise IndexError('RomSet position out of range')
+
+        return self._get_romset(pi_position)
+
+    def __iter__(self):
+        for i_romset in xrange(len(self)):
+            yield self._get_romset(i_romset)
+
+    def __len__(self):
+        return len(self._ai_romset_names)
+
+    def __str__(self):
+        return unicode(self).encode('utf8')
+
+    def __unicode__(self):
+        u_output = u''
+        u_output += u'<RomSetColumns>\n'
+        u_output += u'  .u_name:     %s\n' % self.u_name
+        u_output += u'  .u_desc:     %s\n' % self.u_description
+        u_output += u'  .u_version:  %s\n' % self.u_version
+        u_output += u'  .u_type:     %s\n' % self.u_type
+        u_output += u'  .i_romsets:  %i\n' % self.i_romsets
+        u_output += u'  .i_roms:     %i\n' % self.i_roms
+
+        return u_output
+
+    def get_romsets_by_rom_crc32(self, ptu_crc32s):
+        """
+        Method to get the RomSets containing ROMs with certain CRC32s. The first search builds a sorted copy of the
+        CRC32 column, so every search is a binary search and only the RomSets found are built.
+
+        :param ptu_crc32s: CRC32s to search for. i.e. (u'a209fe80', u'01020304')
+        :type ptu_crc32s: tuple[unicode]
+
+        :return: The RomSets found, in the same order they have in the container.
+        :rtype list[dat_files.RomSet]
+        """
+        if not isinstance(ptu_crc32s, tuple):
+            raise ValueError('ERROR: ptu_crc32s must be a tuple. %s given instead' % type(ptu_crc32s))
+
+        if self._ai_sorted_crc32s is None:
+            self._sort_crc32s()
+
+        si_romsets = set()
+        for u_crc32 in ptu_crc32s:
+            u_crc32 = u_crc32.lower()
+            if _pack_hex(u_crc32, 4) is None:
+                continue
+
+            i_crc32 = int(u_crc32, 16)
+            i_found = bisect.bisect_left(self._ai_sorted_crc32s, i_crc32)
+            while (i_found < len(self._ai_sorted_crc32s)) and (self._ai_sorted_crc32s[i_found] == i_crc32):
+                i_rom = self._ai_sorted_crc32_roms[i_found]
+                si_romsets.add(bisect.bisect_right(self._ai_romset_starts, i_rom) - 1)
+                i_found += 1
+
+        return [self._get_romset(i_romset) for i_romset in sorted(si_romsets)]
+
+    def get_romsets_by_field(self, pu_field, pb_first=False, ptx_search_values=()):
+        """
+        Method to get the RomSets with certain content in a field, like RomSetContainer.get_romsets_by_field().
+
+        The first search by a field builds an index of all the RomSets by that field. Names, descriptions and authors
+        are read directly from the table of strings, other fields (e.g. compound hashes) need every RomSet to be built
+        once.
+
+        :param pu_field: Name of the field to use for the matching. i.e. 'u_ccrc32'
+        :type pu_field: unicode
+
+        :param pb_first: Whether the function will just return the first result or all of them.
+        :type pb_first: bool
+
+        :param ptx_search_values: Content of the field to search for. i.e. (u'a209fe80', u'01020304')
+        :type ptx_search_values: tuple
+
+        :return: The RomSets found, in the same order they have in the columns.
+        :rtype list[dat_files.RomSet]
+        """
+        if not isinstance(ptx_search_values, tuple):
+            raise ValueError('ERROR: ptx_search_values must be a tuple. %s given instead' % type(ptx_search_values))
+
+        if pu_field not in _tu_SEARCH_FIELDS:
+            raise ValueError('Error: pu_field must be one of %s' % str(_tu_SEARCH_FIELDS))
+
+        dli_index = self._get_index(pu_field)
+
+        li_positions = []
+        for x_value in ptx_search_values:
+            try:
+                li_positions.extend(dli_index.get(x_value, ()))
+            except TypeError:
+                li_positions.extend([i_romset for i_romset in xrange(len(self))
+                                     if self._get_field(i_romset, pu_field) == x_value])
+
+        # Several search values may find RomSets in any order (or even the same RomSet twice)
+        if len(ptx_search_values) > 1:
+            li_positions = sorted(set(li_positions))
+
+        if pb_first:
+            li_positions = li_positions[:1]
+
+        return [self._get_romset(i_romset) for i_romset in li_positions]
+
+    def get_duplicated_crc32(self):
+        """
+        Method to get the RomSets with duplicated compound CRC32, like RomSetContainer.get_duplicated_crc32().
+
+        :return: The RomSets keyed by their repeated CRC32.
+        :rtype dict[unicode, list[dat_files.RomSet]]
+        """
+        do_romset_collisions = {}
+        for u_ccrc32, li_positions in self._get_index('u_ccrc32').iteritems():
+            if len(li_positions) > 1:
+                do_romset_collisions[u_ccrc32] = [self._get_romset(i_romset) for i_romset in li_positions]
+
+        return do_romset_collisions
+
+    def to_container(self):
+        """
+        Method to build a normal RomSetContainer with all the RomSets.
+
+        :return: The container.
+        :rtype dat_files.RomSetContainer
+        """
+        o_container = dat_files.RomSetContainer()
+        o_container.copy_metadata_from(self)
+
+        for o_romset in self:
+            o_container.add_romset(o_romset)
+
+        return o_container
+
+    def _get_field(self, pi_romset, pu_field):
+        if pu_field in _ds_STRING_COLUMNS:
+            return self._o_strings.get(getattr(self, _ds_STRING_COLUMNS[pu_field])[pi_romset])
+
+        return getattr(self._get_romset(pi_romset), pu_field)
+
+    def _get_index(self, pu_field):
+        """
+        Method to get the index of the RomSets by a field, building it if needed. The columns are read only, so indexes
+        are never outdated.
+
+        :param pu_field: Name of the field. i.e. 'u_name'
+        :type pu_field: unicode
+
+        :return: The positions of the RomSets, keyed by the values of the field.
+        :rtype dict[x, list[int]]
+        """
+        if pu_field not in self._dli_indexes:
+            dli_index = {}
+            for i_romset in xrange(len(self)):
+                dli_index.setdefault(self._get_field(i_romset, pu_field), []).append(i_romset)
+
+            self._dli_indexes[pu_field] = dli_index
+
+        return self._dli_indexes[pu_field]
+
+    def _sort_crc32s(self):
+        """
+        Method to build the sorted CRC32 column used by get_romsets_by_rom_crc32(). ROMs without a valid CRC32 are not
+        included.
+
+        :return: Nothing
+        """
+        ai_crc32s = self._ai_rom_crc32s
+        ai_flags = self._ai_rom_flags
+
+        li_roms = [i_rom for i_rom in xrange(len(ai_crc32s)) if ai_flags[i_rom] & _i_FLAG_CRC32]
+        li_roms.sort(key=ai_crc32s.__getitem__)
+
+        self._ai_sorted_crc32s = array.array('I', [ai_crc32s[i_rom] for i_rom in li_roms])
+        self._ai_sorted_crc32_roms = array.array('I', li_roms)
+
+    def _get_romset(self, pi_romset):
+        o_strings = self._o_strings
+
+        o_romset = dat_files.RomSet(o_strings.get(self._ai_romset_names[pi_romset]),
+                                    o_strings.get(self._ai_romset_descs[pi_romset]))
+        o_romset.u_auth = o_strings.get(self._ai_romset_auths[pi_romset])
+
+        i_year = self._ai_romset_years[pi_romset]
+        if i_year != _i_NO_STRING:
+            o_romset.u_year = o_strings.get(i_year)
+
+        # The RomSet is new, so its ROMs are set directly instead of adding them one by one with add_rom()
+        i_first = self._ai_romset_starts[pi_romset]
+        i_last = self._ai_romset_starts[pi_romset + 1]
+        o_romset.lo_roms = [self._get_rom(i_rom) for i_rom in xrange(i_first, i_last)]
+
+        return o_romset
+
+    def _get_rom(self, pi_rom):
+        i_flags = self._ai_rom_flags[pi_rom]
+
+        o_rom = dat_files.Rom()
+        o_rom.b_bad = bool(i_flags & _i_FLAG_BAD)
+        o_rom.u_name = self._o_strings.get(self._ai_rom_names[pi_rom])
+        o_rom.i_size = self._ai_rom_sizes[pi_rom]
+
+        if i_flags & _i_FLAG_CRC32:
+            o_rom.u_crc32 = u'%08x' % self._ai_rom_crc32s[pi_rom]
+
+        if i_flags & _i_FLAG_MD5:
+            o_rom.u_md5 = _unpack_hex(self._as_rom_md5s, pi_rom, _i_MD5_BYTES)
+
+        if i_flags & _i_FLAG_SHA1:
+            o_rom.u_sha1 = _unpack_hex(self._as_rom_sha1s, pi_rom, _i_SHA1_BYTES)
+
+        for s_attribute, i_flag in _di_FLAGS_NONE.iteritems():
+            if i_flags & i_flag:
+                setattr(o_rom, s_attribute, None)
+
+        if self._dtx_irregular:
+            for s_attribute in ('u_crc32', 'u_md5', 'u_sha1', 'i_size'):
+                tx_key = (pi_rom, s_attribute)
+                if tx_key in self._dtx_irregular:
+                    setattr(o_rom, s_attribute, self._dtx_irregular[tx_key])
+
+        return o_rom
+
+    def _get_i_roms(self):
+        return len(self._ai_rom_names)
+
+    i_romsets = property(fget=__len__, fset=None)
+    i_roms = property(fget=_get_i_roms, fset=None)
+
+
+class _StringTable(object):
+    """
+    Class to store texts only once. While being built, texts are kept in a dictionary; once frozen, they are stored as a
+    single block of utf8 bytes plus the offset where each one starts.
+    """
+    def __init__(self):
+        self._di_positions = {}
+        self._lu_strings = []
+
+        self._as_data = None
+        self._ai_offsets = None
+
+    def add(self, pu_string):
+        """
+        Method to add a text to the table.
+
+        :param pu_string: Text. None is stored as a missing text.
+        :type pu_string: unicode
+
+        :return: Position of the text in the table.
+        :rtype int
+        """
+        if pu_string is None:
+            return _i_NO_STRING
+
+        try:
+            return self._di_positions[pu_string]
+        except KeyError:
+            i_position = len(self._lu_strings)
+            self._di_positions[pu_string] = i_position
+            self._lu_strings.append(pu_string)
+            return i_position
+
+    def freeze(self, pb_shared):
+        """
+        Method to store the texts in their final compact form. No more texts can be added afterwards.
+
+        :param pb_shared: Whether the texts are stored in shared memory.
+        :type pb_shared: bool
+
+        :return: The table itself.
+        :rtype _StringTable
+        """
+        ls_strings = [unicode(u_string).encode('utf8') for u_string in self._lu_strings]
+
+        li_offsets = [0]
+        for s_string in ls_strings:
+            li_offsets.append(li_offsets[-1] + len(s_string))
+
+        self._as_data = _new_bytes(''.join(ls_strings), pb_shared)
+        self._ai_offsets = _new_array(ctypes.c_uint64, li_offsets, pb_shared)
+
+        self._di_positions = None
+        self._lu_strings = None
+
+        return self
+
+    def get(self, pi_position):
+        """
+        :param pi_position: Position of the text in the table.
+        :type pi_position: int
+
+        :return: The text.
+        :rtype unicode
+        """
+        if pi_position == _i_NO_STRING:
+            return None
+
+        # Texts are available while the table is being built too
+        if self._lu_strings is not None:
+            return self._lu_strings[pi_position]
+
+        return self._as_data[self._ai_offsets[pi_position]:self._ai_offsets[pi_position + 1]].decode('utf8')
+
+
+# Helper Functions
+#=======================================================================================================================
+def _new_array(po_type, plx_values, pb_shared):
+    """
+    Function to create a ctypes array.
+
+    :param po_type: Type of the elements. i.e. ctypes.c_uint32
+
+    :param plx_values: Values of the array. Arrays with elements of the same size are copied directly.
+    :type plx_values: list, array.array
+
+    :param pb_shared: Whether the array is created in shared memory.
+    :type pb_shared: bool
+
+    :return: The array.
+    """
+    i_length = len(plx_values)
+
+    if pb_shared:
+        o_array = multiprocessing.sharedctypes.RawArray(po_type, i_length)
+    else:
+        o_array = (po_type * i_length)()
+
+    if isinstance(plx_values, array.array) and (plx_values.itemsize == ctypes.sizeof(po_type)):
+        ctypes.memmove(o_array, plx_values.buffer_info()[0], i_length * plx_values.itemsize)
+    else:
+        o_array[:] = plx_values
+
+    return o_array
+
+
+def _new_bytes(ps_data, pb_shared):
+    """
+    Function to create a ctypes array of bytes.
+
+    :param ps_data: Bytes of the array.
+    :type ps_data: str
+
+    :param pb_shared: Whether the array is created in shared memory.
+    :type pb_shared: bool
+
+    :return: The array.
+    """
+    if pb_shared:
+        o_array = multiprocessing.sharedctypes.RawArray(ctypes.c_char, len(ps_data))
+    else:
+        o_array = (ctypes.c_char * len(ps_data))()
+
+    ctypes.memmove(o_array, ps_data, len(ps_data))
+
+    return o_array
+
+
+def _reorder(pai_values, pli_order):
+    """
+    Function to reorder an array.
+
+    :param pai_values: Array.
+    :type pai_values: array.array
+
+    :param pli_order: Old positions of the values, in their new order.
+    :type pli_order: list[int]
+
+    :return: A new array with the values reordered.
+    :rtype array.array
+    """
+    return array.array(pai_values.typecode, [pai_values[i_value] for i_value in pli_order])
+
+
+def _reorder_bytes(pas_values, pli_order, pi_bytes):
+    """
+    Function to reorder a column of fixed width binary values.
+
+    :param pas_values: Column.
+    :type pas_values: bytearray
+
+    :param pli_order: Old positions of the values, in their new order.
+    :type pli_order: list[int]
+
+    :param pi_bytes: Length of each value in bytes.
+    :type pi_bytes: int
+
+    :return: A new column with the values reordered.
+    :rtype bytearray
+    """
+    return bytearray('').join([pas_values[i_value * pi_bytes:(i_value + 1) * pi_bytes] for i_value in pli_order])
+
+
+def _pack_hex(pu_hex, pi_bytes):
+    """
+    Function to convert a hex hash into binary.
+
+    :param pu_hex: Hash. i.e. u'a209fe80'
+    :type pu_hex: unicode
+
+    :param pi_bytes: Length of the hash in bytes.
+    :type pi_bytes: int
+
+    :return: The binary hash, or None if it's not a valid lowercase hex hash of the right length (so it wouldn't be
+             identical when converted back to hex).
+    :rtype str
+    """
+    if not isinstance(pu_hex, basestring) or len(pu_hex) != pi_bytes * 2 or pu_hex != pu_hex.lower():
+        return None
+
+    try:
+        return binascii.unhexlify(pu_hex)
+    except (TypeError, ValueError):
+        return None
+
+
+def _unpack_hex(pas_data, pi_position, pi_bytes):
+    """
+    Function to get a hex hash from a column of binary hashes.
+
+    :param pas_data: Column.
+
+    :param pi_position: Position of the hash in the column.
+    :type pi_position: int
+
+    :param pi_bytes: Length of each hash in bytes.
+    :type pi_bytes: int
+
+    :return: The hash. i.e. u'0123456789abcdef0123456789abcdef'
+    :rtype unicode
+    """
+    i_start = pi_position * pi_bytes
+    return binascii.hexlify(pas_data[i_start:i_start + pi_bytes]).decode('ascii')
@@ -7,22 +7,55 @@ Library to load data from .dat files (ClrMamePro and XML format only) for ROMset
 """
 
 import codecs
+import cPickle
+import gc
+import hashlib
+import mmap
 import xml.etree.cElementTree
 import os
 import re
+import threading
 
 import csv
-import files
 
 
 # Constants
 #=======================================================================================================================
 # Library version
-_u_VERSION = u'2019-10-14'
+_u_VERSION = u'2026-10-19'
 
 # List of ROM extensions to ignore when obtaining "clean" values (size, and hashes)
 _tu_IGNORE_EXTS = (u'cue',)
 
+# Directory for the cache of parsed dats (see RomSetContainer.read_from_dat())
+u_CACHE_DIR = os.path.join(os.path.expanduser(u'~'), u'.cache', u'hqtools', u'dats')
+
+# Version of the cache of parsed dats. Caches with a different version are ignored, so it must be increased every time
+# the parsers or the stored objects change.
+_i_CACHE_FORMAT = 3
+
+# Length of each type of hash in hex characters
+_di_HASH_LENGTHS = {'crc32': 8, 'md5': 32, 'sha1': 40}
+
+# XML elements containing RomSets (MAME -listxml dats use "machine" instead of "game")
+_ts_XML_ROMSET_TAGS = ('game', 'machine')
+
+# Lock for the sorting of RomSetContainers, which can't store their own lock because they are pickled (see
+# RomSetContainer._save_to_cache())
+_o_SORT_LOCK = threading.Lock()
+
+# ClrMamePro blocks containing the header and the RomSets
+_ts_CMP_HEADER_BLOCKS = ('clrmamepro', 'emulator')
+_ts_CMP_ROMSET_BLOCKS = ('game', 'machine')
+
+# Tokens of ClrMamePro dats: 1) quoted string, 2) block start, 3) block end, 4) bare word
+_o_CMP_TOKEN_REGEX = re.compile(r'"([^"]*)"|(\()|(\))|([^\s()"]+)')
+
+# ClrMamePro blocks written in a single line, and keys found inside them. Unquoted values (i.e. ROM names with spaces
+# and brackets) end where the next key starts.
+_ts_CMP_ITEM_BLOCKS = ('rom', 'disk', 'sample')
+_o_CMP_ITEM_KEY_REGEX = re.compile(r'\s(?:size|crc|md5|sha1|status|flags|serial|date|merge|region|offset)\s')
+
 
 # Classes
 #=======================================================================================================================
@@ -68,15 +101,13 @@ class RomSetContainer(object):
     disk ROM file objects.
     """
 
-    def __init__(self, u_file=None):
+    def __init__(self, u_file=None, pb_cache=False):
 
         # TODO: RomSetContainer should contain an internal registry with all the manipulations suffered by the object so
         #       when you export the file to disk you know the information is not coming directly from the RAW dat file.
         # I think that some "MODIFIED" flags would be enough like .db_flags{'added_sets': True, 'removed_sets': True...}
 
         # Variable definition
-        self._i_position = None   # RomSet position for the iterator
-
         self.u_name = u''         # internal name of the dat file.
         self.u_description = u''  # description of the dat file.
         self.u_version = u''      # version of the dat file (usually a date).
@@ -98,8 +129,23 @@ class RomSetContainer(object):
                                         'u_csha1', 'u_dsha1',
                                         'u_desc', 'u_name', 'u_auth')
 
+        # Lookup indexes for get_romsets_by_field(), built on demand: {field: {value: [position, ...]}}. Positions refer
+        # to the sorted lo_romsets, so the indexes are discarded every time the list or any of its RomSets (see
+        # RomSet.add_rom()) changes.
+        self._dli_indexes = {}
+        self._lo_indexed_romsets = None     # List and length the indexes were built for, to detect external changes
+        self._i_indexed_romsets = 0
+        self._o_changes = _ChangeCounter()  # Counter of ROMs added to the RomSets of this container
+        self._i_indexed_changes = 0         # Value of the counter when the indexes were built
+
+        # Sorting state of lo_romsets, so it's only sorted again when it changed (see _sort()). The empty list is sorted,
+        # so dats already sorted by description never need to be sorted.
+        self._b_sorted = True
+        self._lo_sorted_romsets = self.lo_romsets   # List and length that were sorted, to detect external changes
+        self._i_sorted_romsets = 0
+
         if u_file:
-            self.read_from_dat(u_file)
+            self.read_from_dat(u_file, pb_cache=pb_cache)
 
     def __str__(self):
         return str(unicode(self))
@@ -121,36 +167,32 @@ class RomSetContainer(object):
         return u_output
 
     def __iter__(self):
-        if self.i_romsets > 0:
-            self._i_position = 0
-
-            # If the list is not sorted, it's sorted before iterating over it.
-            self._sort()
+        # If the list is not sorted, it's sorted before iterating over it. The position is kept by each iterator, so
+        # nested or concurrent iterations don't interfere (as long as the container is not modified meanwhile).
+        self._sort()
 
-        return self
+        return iter(self.lo_romsets)
 
     def __len__(self):
         return self.i_romsets
 
-    def next(self):
-        """
-
-        :type :return RomSet
-        """
-        if (self._i_position is not None) and (self._i_position < self.i_romsets):
-            self._i_position += 1
-            return self.lo_romsets[self._i_position - 1]
-        else:
-            raise StopIteration()
-
     def add_romset(self, o_romset):
         """
         Internal method to add games to the container WITHOUT any kind of duplicity or other kind of check.
 
         :param o_romset:
         """
+        # ROMsets added in order (i.e. from an already sorted dat) keep the list sorted
+        b_sorted = self._is_sorted() and (not self.lo_romsets or
+                                          _get_romset_sort_key(self.lo_romsets[-1]) <= _get_romset_sort_key(o_romset))
 
         self.lo_romsets.append(o_romset)
+        self._dli_indexes = {}
+
+        if b_sorted:
+            self._i_sorted_romsets += 1
+        else:
+            self._b_sorted = False
 
     def del_romset(self, pu_field, px_check_value):
         """
@@ -167,7 +209,14 @@ class RomSetContainer(object):
                 lo_keep_romsets.append(o_romset)
 
         i_deleted = len(self.lo_romsets) - len(lo_keep_romsets)
+        b_sorted = self._is_sorted()
+
         self.lo_romsets = lo_keep_romsets
+        self._dli_indexes = {}
+
+        # Removing ROMsets doesn't change the order of the rest
+        if b_sorted:
+            self._set_sorted()
 
         return i_deleted
 
@@ -198,7 +247,7 @@ class RomSetContainer(object):
         #----------------------------------------------------------------------
         do_romset_collisions = {}
         for u_ccrc32 in lu_repeated_ccrc32:
-            do_romset_collisions[u_ccrc32] = self.get_romsets_by_field(u'u_ccrc32', False, u_ccrc32)
+            do_romset_collisions[u_ccrc32] = self.get_romsets_by_field(u'u_ccrc32', False, (u_ccrc32,))
 
         return do_romset_collisions
 
@@ -235,6 +284,8 @@ class RomSetContainer(object):
         :return: Nothing
         """
         self.lo_romsets = []
+        self._dli_indexes = {}
+        self._set_sorted()
 
     def copy_metadata_from(self, po_game_container):
         """
@@ -306,6 +357,14 @@ class RomSetContainer(object):
         """
         Method to get a list of MULTIPLE GAMES with certain content in a field.
 
+        The first search by a field builds an index of all the ROMsets by that field, so the next searches don't need to
+        check every ROMset. The ROMsets found are returned in the same (sorted) order they have in the container.
+
+        Indexes are rebuilt when ROMsets are added or removed, or when ROMs are added with RomSet.add_rom(). Fields
+        modified in any other way (e.g. o_romset.u_name = u'foo') are NOT detected, so they must not be modified after
+        adding the ROMset to the container, or the results will be outdated. Unhashable search values can't use the
+        indexes, so every ROMset is checked for them.
+
         :param pu_field: Name of the field to use for the matching. i.e. '_i_year'
         :type pu_field unicode
 
@@ -329,20 +388,40 @@ class RomSetContainer(object):
             raise ValueError('Error: pu_field must be one of %s' % str(self._tu_valid_search_fields))
 
         else:
-            for o_romset in self:
-                if getattr(o_romset, pu_field) in ptx_search_values:
-                    lo_romsets.append(o_romset)
-                    if pb_first:
-                        break
+            dli_index = self._get_index(pu_field)
+
+            li_positions = []
+            for x_value in ptx_search_values:
+                try:
+                    li_positions.extend(dli_index.get(x_value, ()))
+                except TypeError:
+                    li_positions.extend([i_position for i_position, o_romset in enumerate(self.lo_romsets)
+                                         if getattr(o_romset, pu_field) == x_value])
+
+            # Several search values may find ROMsets in any order (or even the same ROMset twice)
+            if len(ptx_search_values) > 1:
+                li_positions = sorted(set(li_positions))
+
+            if pb_first:
+                li_positions = li_positions[:1]
+
+            lo_romsets = [self.lo_romsets[i_position] for i_position in li_positions]
 
         return lo_romsets
 
-    def read_from_dat(self, pu_file):
+    def read_from_dat(self, pu_file, pb_cache=False):
         """
         Method to load Dat data from a file on disk.
 
+        When pb_cache is True, parsed dats are stored in a cache (see u_CACHE_DIR) together with the index by name, so
+        next loads of the same file don't need to parse it again. The cache is discarded when the size or the
+        modification time of the dat change, or when the version of this library or the cache format changes.
+
         :param pu_file: File containing the data. i.e. '/home/john/mame.dat'
 
+        :param pb_cache: Whether to use the cache of parsed dats. It's only used for empty containers.
+        :type pb_cache: bool
+
         :return: Nothing.
         """
 
@@ -350,29 +429,24 @@ class RomSetContainer(object):
         if not os.path.isfile(pu_file):
             raise ValueError('Can\'t find dat file "%s"' % pu_file)
 
-        o_file = codecs.open(pu_file, u'rb', u'utf8', u'ignore')
-
-        # We try to automatically identify it reading the beginning of the file.
-        u_first_line = o_file.readline()
-        o_file.close()
-
-        # Identifying ClrMamePro mode
-        if (u_first_line.find(u'clrmamepro') != -1) or (u_first_line.find(u'emulator') != -1):
-            u_format = 'cmp'
-
-        # Identifying Xml mode
-        elif u_first_line.find(u'<?xml') != -1:
-            u_format = 'xml'
-
-        # Unknown format error raise
-        else:
-            raise IOError('Unknown DAT format')
-
-        # Loading the file using the different readers depending on the format parameter
-        if u_format == 'cmp':
-            self._read_from_cmp(pu_file)
-        elif u_format == 'xml':
-            self._read_from_xml(pu_file)
+        b_cache = pb_cache and not self.lo_romsets
+        if b_cache and self._load_from_cache(pu_file):
+            return
+
+        u_format = get_dat_format(pu_file)
+
+        # Loading the file using the different readers depending on the format parameter. Millions of objects are
+        # created and none of them form cycles, so the garbage collector is paused to avoid its (long) pauses.
+        b_gc = gc.isenabled()
+        gc.disable()
+        try:
+            if u_format == 'cmp':
+                self._read_from_cmp(pu_file)
+            elif u_format == 'xml':
+                self._read_from_xml(pu_file)
+        finally:
+            if b_gc:
+                gc.enable()
 
         # After loading the games from disk, the list is sorted
         self._sort()
@@ -380,6 +454,9 @@ class RomSetContainer(object):
         # We alter the proper flag
         self._db_flags['from_dat'] = True
 
+        if b_cache:
+            self._save_to_cache(pu_file)
+
     def to_dict(self, ps_property):
         """
         Method to return a dictionary with all the romsets keyed by the desired property "ps_property". No checks will
@@ -394,175 +471,156 @@ class RomSetContainer(object):
 
         return do_output
 
-    def _read_from_cmp(self, u_file):
+    def _load_from_cache(self, pu_file):
         """
-        Method to process ClrMamePro DATs.
+        Method to load a parsed dat from the cache.
+
+        :param pu_file: Path of the dat.
+        :type pu_file: unicode
+
+        :return: True if the dat was found in the cache (and loaded), False otherwise.
+        :rtype bool
         """
-        self.u_type = u'ClrMamePro'
+        u_cache_file, tx_key = _get_cache_file_and_key(pu_file)
 
-        o_file = codecs.open(u_file, 'rb', 'utf8', 'ignore')
+        b_gc = gc.isenabled()
+        gc.disable()
+        try:
+            with open(u_cache_file, 'rb') as o_file:
+                o_unpickler = cPickle.Unpickler(o_file)
 
-        b_head_mode = False
-        b_game_mode = False
+                # The key is stored before the data, so outdated caches are detected without reading the whole file
+                if o_unpickler.load() != tx_key:
+                    return False
 
-        ls_head_strings = []    # List that will contain the multiple lines with data from the heading.
-        lu_game_strings = []    # List that will contain the multiple lines with data for a game.
+                self.__dict__.update(o_unpickler.load())
 
-        for u_line in o_file:
+        # Missing, corrupt or incompatible caches are just ignored
+        except Exception:
+            return False
 
-            # Detection of the start of the heading of the file
-            if (u_line.find(u'clrmamepro (') == 0) or (u_line.find('emulator (') == 0):
-                b_head_mode = True
-                continue
+        finally:
+            if b_gc:
+                gc.enable()
 
-            # If we are in "head-mode" and the first character of the line is ")", it means we have reached the end of
-            # the heading (so we have all its lines) and we can parse them.
-            if b_head_mode and u_line.find(')') == 0:
-                self.u_name = _dat_vertical_parse(ls_head_strings, 'name').decode('utf8')
-                self.u_description = _dat_vertical_parse(ls_head_strings, 'description').decode('utf8')
-                self.u_version = _dat_vertical_parse(ls_head_strings, 'version').decode('utf8')
-                self.u_comment = _dat_vertical_parse(ls_head_strings, 'comment').decode('utf8')
+        return True
 
-                ls_head_strings = []
-                b_head_mode = False
-                continue
+    def _save_to_cache(self, pu_file):
+        """
+        Method to store a parsed dat in the cache. The index by name is built before, so it doesn't need to be built
+        again after loading it. Compound hashes are only stored when they were already computed. Errors writing the
+        cache are ignored.
 
-            # If we are in "head-mode", we add the found lines to a list that will be parsed later" (look the code just
-            # above).
-            if b_head_mode:
-                ls_head_strings.append(u_line)
-                continue
+        :param pu_file: Path of the dat.
+        :type pu_file: unicode
 
-            # RomSet data
-            if u_line.find('game (') == 0:
-                b_game_mode = True
-                continue
+        :return: Nothing
+        """
+        self._get_index(u'u_name')
 
-            if b_game_mode and u_line.find(')') == 0:
-                u_romset_name = _dat_vertical_parse(lu_game_strings, 'name')
-                u_romset_description = _dat_vertical_parse(lu_game_strings, 'description')
-                u_romset_author = _dat_vertical_parse(lu_game_strings, 'manufacturer')
-                u_game_year = _dat_vertical_parse(lu_game_strings, 'year')
-                if u_game_year == u'':
-                    u_game_year = u'0'
-
-                lu_game_roms = _dat_vertical_parse(lu_game_strings, 'rom', 'multi')
-
-                o_dat_romset = RomSet(u_romset_name, u_romset_description)
-                o_dat_romset.u_year = u_game_year
-                o_dat_romset.u_auth = u_romset_author
-
-                for s_game_rom in lu_game_roms:
-                    # sometimes name has quotes " around and sometimes not, so it's safer to use size as end.
-                    u_rom_name = _dat_horizontal_parse(s_game_rom, 'name ', 'size')
-
-                    u_rom_size = _dat_horizontal_parse(s_game_rom, 'size ', ' ')
-                    u_rom_crc = _dat_horizontal_parse(s_game_rom, 'crc ', ' ')
-                    u_rom_md5 = _dat_horizontal_parse(s_game_rom, 'md5 ', ' ')
-                    u_rom_sha1 = _dat_horizontal_parse(s_game_rom, 'sha1 ', ' ')
-
-                    # So far, MAME is the only dat providing flags, and it's only one.
-                    u_rom_flags = _dat_horizontal_parse(s_game_rom, 'flags ', ' ')
-                    b_bad = False
-                    if u_rom_flags in ('baddump', 'nodump'):
-                        b_bad = True
-
-                    # create a rom object
-                    o_rom = Rom()
-                    o_rom.b_bad = b_bad
-                    o_rom.u_name = u_rom_name
-                    o_rom.i_size = int(u_rom_size)
-                    o_rom.u_crc32 = u_rom_crc.lower()
-                    o_rom.u_md5 = u_rom_md5.lower()
-                    o_rom.u_sha1 = u_rom_sha1.lower()
-
-                    # add the rom object to the list
-                    o_dat_romset.add_rom(o_rom)
-
-                # We add the game to the container without any kind of check, we will do it later.
-                self.add_romset(o_dat_romset)
-
-                lu_game_strings = []
-                b_game_mode = False
-                continue
+        u_cache_file, tx_key = _get_cache_file_and_key(pu_file)
+        u_temp_file = u'%s.%i.tmp' % (u_cache_file, os.getpid())
+
+        try:
+            if not os.path.isdir(u_CACHE_DIR):
+                os.makedirs(u_CACHE_DIR)
+
+            with open(u_temp_file, 'wb') as o_file:
+                o_pickler = cPickle.Pickler(o_file, cPickle.HIGHEST_PROTOCOL)
+                o_pickler.dump(tx_key)
+                o_pickler.dump(self.__dict__)
+
+            # The cache is replaced at once, so other programs never read half written files
+            if os.name == 'nt' and os.path.isfile(u_cache_file):
+                os.remove(u_cache_file)
+            os.rename(u_temp_file, u_cache_file)
+
+        except (IOError, OSError, cPickle.PicklingError):
+            if os.path.isfile(u_temp_file):
+                os.remove(u_temp_file)
+
+    def _read_from_cmp(self, u_file):
+        """
+        Method to process ClrMamePro DATs.
+        """
+        self.u_type = u'ClrMamePro'
 
-            # RomSet mode actions
-            if b_game_mode:
-                lu_game_strings.append(u_line)
-                pass
+        # We add the games to the container without any kind of check, we will do it later.
+        for o_dat_romset in iter_cmp_romsets(u_file, po_container=self):
+            self.add_romset(o_dat_romset)
 
     def _read_from_xml(self, u_file):
         self.u_type = u'XML'
 
-        o_xml_tree = xml.etree.cElementTree.parse(u_file)
-        o_xml_root = o_xml_tree.getroot()
+        # RomSets are read one by one, so only one of them is in memory before being added (see iter_xml_romsets())
+        for o_dat_game in iter_xml_romsets(u_file, po_container=self):
+            self.add_romset(o_dat_game)
 
-        # Header information
-        #-------------------
-        o_header = o_xml_root.find('header')
-        self.u_name = o_header.find('name').text
-        self.u_description = o_header.find('description').text
-        self.u_version = o_header.find('version').text
+    def _get_index(self, pu_field):
+        """
+        Method to get the index of the ROMsets by a field, building it if needed.
 
-        o_xelem_homepage = o_header.find('homepage')
-        if o_xelem_homepage:
-            self.u_homepage = o_xelem_homepage.text
+        :param pu_field: Name of the field. i.e. 'u_name'
+        :type pu_field: unicode
 
-        if o_header.find('author'):
-            self.u_author = o_header.find('author').text
-        else:
-            self.u_author = u'None'
+        :return: The positions of the ROMsets in the sorted list, keyed by the values of the field.
+        :rtype dict[x, list[int]]
+        """
+        # lo_romsets is public, so it can be replaced or modified without using the methods of the container
+        if ((self.lo_romsets is not self._lo_indexed_romsets)
+                or (len(self.lo_romsets) != self._i_indexed_romsets)
+                or (self._o_changes.i_changes != self._i_indexed_changes)):
+            self._dli_indexes = {}
 
-        # RomSet information
-        for o_xelem_game in o_xml_root.findall('game'):
-            u_game_name = o_xelem_game.attrib['name']
-            u_game_description = o_xelem_game.find('description').text
+        if pu_field not in self._dli_indexes:
+            self._sort()
 
-            o_dat_game = RomSet(u_game_name, u_game_description)
+            # The counter of the container is given to its RomSets here, so RomSets added to lo_romsets directly are
+            # watched too
+            dli_index = {}
+            for i_position, o_romset in enumerate(self.lo_romsets):
+                o_romset._watch(self._o_changes)
+                dli_index.setdefault(getattr(o_romset, pu_field), []).append(i_position)
 
-            for o_xelem_rom in o_xelem_game.findall('rom'):
-                    o_rom = Rom()
-                    try:
-                        o_rom.u_name = o_xelem_rom.attrib['name']
-                    except KeyError:
-                        pass
-
-                    try:
-                        o_rom.i_size = int(o_xelem_rom.attrib['size'])
-                    except KeyError:
-                        o_rom.b_bad = True
-
-                    try:
-                        o_rom.u_crc32 = o_xelem_rom.attrib['crc'].lower()
-                    except KeyError:
-                        o_rom.b_bad = True
-
-                    try:
-                        o_rom.u_md5 = o_xelem_rom.attrib['md5'].lower()
-                    except KeyError:
-                        o_rom.u_md5 = None
-
-                    try:
-                        o_rom.u_sha1 = o_xelem_rom.attrib['sha1'].lower()
-                    except KeyError:
-                        o_rom.u_sha1 = None
-
-                    # MAME XML (AFAIK) includes a status field which can contain "baddump" and "nodump"
-                    try:
-                        u_status = o_xelem_rom.attrib['status'].lower()
-                        if u_status in ('baddump', 'nodump'):
-                            o_rom.b_bad = True
-                    except KeyError:
-                        pass
-
-                    # Adding the rom object to the list
-                    o_dat_game.lo_roms.append(o_rom)
+            self._dli_indexes[pu_field] = dli_index
+            self._lo_indexed_romsets = self.lo_romsets
+            self._i_indexed_romsets = len(self.lo_romsets)
+            self._i_indexed_changes = self._o_changes.i_changes
 
-            self.add_romset(o_dat_game)
+        return self._dli_indexes[pu_field]
+
+    def _is_sorted(self):
+        """
+        Method to check whether lo_romsets is known to be sorted.
+
+        :return: True if it's sorted, False if it's not or if it changed without using the methods of the container.
+        :rtype bool
+        """
+        return (self._b_sorted
+                and (self.lo_romsets is self._lo_sorted_romsets)
+                and (len(self.lo_romsets) == self._i_sorted_romsets))
+
+    def _set_sorted(self):
+        self._b_sorted = True
+        self._lo_sorted_romsets = self.lo_romsets
+        self._i_sorted_romsets = len(self.lo_romsets)
 
     def _sort(self):
-        # Sorting of the list based on the game description (which is more reliable than the short name of the game)
-        self.lo_romsets.sort(key=lambda o_game: o_game.u_desc.encode('utf8', 'strict'), reverse=False)
+        if self._is_sorted():
+            return
+
+        # The list is sorted in place, so code keeping a reference to lo_romsets sees the sorted list. Threads starting
+        # to iterate at the same time wait for a single sort.
+        with _o_SORT_LOCK:
+            if self._is_sorted():
+                return
+
+            # Sorting of the list based on the game description (which is more reliable than the short name of the game)
+            self.lo_romsets.sort(key=_get_romset_sort_key, reverse=False)
+
+            # The indexes store positions, so they are not valid anymore
+            self._dli_indexes = {}
+            self._set_sorted()
 
     def _get_i_bads(self):
         i_bads = 0
@@ -591,14 +649,15 @@ class RomSet(object):
         self.lo_roms = []             # List containing all the ROM information objects.
         self.u_auth = u''             # Author, company that programmed the game (MAME dat support only, AFAIK).
 
-        # Properties: iterator
-        self._i_pos = None
+        # Properties: compound hashes already computed, keyed by (type, clean), see _get_hash()
+        self._du_hashes = {}
+        self._i_hashed_roms = 0       # Number of ROMs when the hashes were computed, to detect external changes
 
-    def __iter__(self):
-        if len(self.lo_roms) > 0:
-            self._i_pos = 0
+        # Change counters of the containers with indexes of this RomSet, see RomSetContainer._get_index()
+        self._lo_counters = []
 
-        return self
+    def __iter__(self):
+        return iter(self.lo_roms)
 
     def __str__(self):
         return str(unicode(self))
@@ -644,16 +703,26 @@ class RomSet(object):
         :return:
         """
         self.lo_roms.append(po_rom)
+        self._du_hashes = {}
 
-    def next(self):
+        # Containers indexing this RomSet must discard their indexes
+        for o_counter in self._lo_counters:
+            o_counter.i_changes += 1
+
+    def _watch(self, po_counter):
         """
-        :type :return Rom
+        Method to register the change counter of a container, so it's increased when ROMs are added.
+
+        :param po_counter: Counter.
+        :type po_counter: _ChangeCounter
+
+        :return: Nothing
         """
-        if (self._i_pos is not None) and (self._i_pos < len(self.lo_roms)):
-            self._i_pos += 1
-            return self.lo_roms[self._i_pos - 1]
-        else:
-            raise StopIteration()
+        for o_counter in self._lo_counters:
+            if o_counter is po_counter:
+                return
+
+        self._lo_counters.append(po_counter)
 
     def _get_hash(self, pu_type='crc32', pb_clean=False):
         """
@@ -689,53 +758,49 @@ class RomSet(object):
         :return: A keyed dictionary with 'crc32', 'md5', and 'sha1' hashes in hex-string format
         """
 
+        if pu_type not in _di_HASH_LENGTHS:
+            raise Exception('Invalid hash type "%s"' % pu_type)
+
+        # Compound hashes are computed only once. ROMs added with add_rom() discard them and lo_roms is checked too, in
+        # case it was modified directly.
+        if len(self.lo_roms) != self._i_hashed_roms:
+            self._du_hashes = {}
+            self._i_hashed_roms = len(self.lo_roms)
+
+        tx_key = (pu_type, pb_clean)
+        if tx_key in self._du_hashes:
+            return self._du_hashes[tx_key]
+
         # The first step is to create a list with the real ROMs, avoiding meta-data ones like .cue files
         lo_relevant_roms = []
 
         for o_rom in self.lo_roms:
-            o_rom_fp = files.FilePath(o_rom.u_name)
-
             # If discard is not activated, every ROM will be considered
             if not pb_clean:
                 lo_relevant_roms.append(o_rom)
 
-            # In other case, ROMs are filtered based on the file extension
+            # In other case, ROMs are filtered based on the file extension (of the file name, ignoring directories)
             else:
-                if not o_rom_fp.has_exts(*_tu_IGNORE_EXTS):
+                u_file = os.path.basename(o_rom.u_name)
+                u_ext = u_file.rpartition(u'.')[2].lower() if u'.' in u_file else u''
+                if u_ext not in _tu_IGNORE_EXTS:
                     lo_relevant_roms.append(o_rom)
 
         # Calculation ROMset "compound" hash (which is the sum of all the relevant ROMs hashes
         #-------------------------------------------------------------------------------------
-        lu_hexs = []
-        for o_rom in lo_relevant_roms:
-
-            if pu_type == 'crc32':
-                lu_hexs.append(o_rom.u_crc32)
-            elif pu_type == 'md5':
-                lu_hexs.append(o_rom.u_md5)
-            elif pu_type == 'sha1':
-                lu_hexs.append(o_rom.u_sha1)
-            else:
-                raise Exception('Invalid hash type "%s"' % pu_type)
+        s_attribute = 'u_%s' % pu_type
+        lu_hexs = [getattr(o_rom, s_attribute) for o_rom in lo_relevant_roms]
 
         u_hash = _compound_hash(lu_hexs)
 
         # Setting the proper length for each type of hash: crc32 = 8 chars, md5 = 32 chars, sha1 = 40 chars
         #--------------------------------------------------------------------------------------------------
         if u_hash:
-            i_hash_length = 0
-            if pu_type == 'crc32':
-                i_hash_length = 8
-            elif pu_type == 'md5':
-                i_hash_length = 32
-            elif pu_type == 'sha1':
-                i_hash_length = 40
-
+            i_hash_length = _di_HASH_LENGTHS[pu_type]
             u_hash = u_hash[-i_hash_length:]
             u_hash = u_hash.rjust(i_hash_length, u'0')
 
-        else:
-            pass
+        self._du_hashes[tx_key] = u_hash
 
         return u_hash
 
@@ -846,180 +911,495 @@ class Rom:
         return u_output.encode('utf8')
 
 
+class _ChangeCounter(object):
+    """
+    Class to count the ROMs added to the RomSets of a container. It's shared by the container and its RomSets, so it's
+    pickled together with them.
+    """
+    def __init__(self):
+        self.i_changes = 0
+
+
 # Functions
 #=======================================================================================================================
-# TODO: This function doesn't belong here. It should be in another library called rom_tools or something like that.
-def get_rom_header(pu_rom_file):
+def get_dat_format(pu_file):
     """
-    Function to return the year(s) found in a rom file.
+    Function to identify the format of a dat reading the beginning of the file.
 
-    Only the first bytes of the ROM are scanned and only years 19xx and 20xx are searched for.
+    :param pu_file: Path of the dat file. i.e. '/home/john/mame.dat'
+    :type pu_file: unicode
 
-    :param pu_rom_file: Name of the file to search in.
+    :return: 'cmp' for ClrMamePro dats or 'xml' for XML ones.
+    :rtype str
 
-    :return: A list with the found years as integers.
+    :raise IOError: When the format is unknown.
     """
+    o_file = codecs.open(pu_file, u'rb', u'utf8', u'ignore')
+    u_first_line = o_file.readline()
+    o_file.close()
 
-    i_bytes = 2048
-    i_min_year = 1970
-    i_max_year = 2020
+    # Identifying ClrMamePro mode
+    if (u_first_line.find(u'clrmamepro') != -1) or (u_first_line.find(u'emulator') != -1):
+        u_format = 'cmp'
 
-    li_years = []
-    li_years_clean = []
+    # Identifying Xml mode
+    elif u_first_line.find(u'<?xml') != -1:
+        u_format = 'xml'
 
-    o_file = open(pu_rom_file, mode='rb')
-    s_data_chunk = o_file.read(i_bytes)
-    o_file.close()
+    # Unknown format error raise
+    else:
+        raise IOError('Unknown DAT format')
 
-    o_match = re.search(r'(\d{4})', s_data_chunk)
+    return u_format
 
-    if o_match:
-        for s_year in o_match.groups():
-            li_years.append(int(s_year))
 
-    for i_year in li_years:
-        if i_min_year <= i_year <= i_max_year:
-            li_years_clean.append(i_year)
+def iter_dat_romsets(pu_file, po_container=None):
+    """
+    Generator to read the RomSets of a dat of any supported format one by one (see iter_cmp_romsets() and
+    iter_xml_romsets()). The type of the dat is stored in po_container too.
 
-    return li_years_clean
+    :param pu_file: Path of the dat file. i.e. '/home/john/mame.dat'
+    :type pu_file: unicode
 
+    :param po_container: RomSetContainer where the information of the header (name, description...) will be stored. The
+                         RomSets are NOT added to it.
+    :type po_container: RomSetContainer
 
-# Helper Functions
-#=======================================================================================================================
-def _dat_vertical_parse(ls_lines, s_section, s_mode='single'):
-    """Function to parse a group of lines which contains different information about the same item.
+    :return: The RomSets found in the dat, in the same order.
+    :rtype collections.Iterable[RomSet]
+    """
+    if get_dat_format(pu_file) == 'cmp':
+        u_type = u'ClrMamePro'
+        o_romsets = iter_cmp_romsets(pu_file, po_container=po_container)
+    else:
+        u_type = u'XML'
+        o_romsets = iter_xml_romsets(pu_file, po_container=po_container)
 
-    So, the information follows a pattern similar to:
+    if po_container is not None:
+        po_container.u_type = u_type
 
-        field_1 data_a
-        field_1 data_b
-        field_2 data_c
-        ...
+    return o_romsets
 
-        ls_lines: a list containing the individual lines as strings.
 
-        s_section: name of the section (in the above example s_section = field_1, for example).
+def iter_xml_romsets(pu_file, po_container=None):
+    """
+    Generator to read the RomSets of a XML dat one by one. The file is parsed incrementally and every element is
+    discarded once processed, so memory usage is proportional to one RomSet no matter the size of the dat. e.g.
 
-        s_mode: 'single', each field exists once and the function returns its data as a string.
-                'multi', each field exists several times and the function returns its data as a list of strings.
+        for o_romset in iter_xml_romsets(u'/home/john/mame.xml'):
+            print o_romset.u_desc
 
-        @rtype : string or list of strings
+    :param pu_file: Path of the dat file. i.e. '/home/john/mame.xml'
+    :type pu_file: unicode
+
+    :param po_container: RomSetContainer where the information of the header (name, description...) will be stored. The
+                         RomSets are NOT added to it.
+    :type po_container: RomSetContainer
+
+    :return: The RomSets found in the dat, in the same order.
+    :rtype collections.Iterable[RomSet]
     """
+    o_xml_root = None
+
+    for s_event, o_xelem in xml.etree.cElementTree.iterparse(pu_file, events=('start', 'end')):
+        if s_event == 'start':
+            if o_xml_root is None:
+                o_xml_root = o_xelem
+            continue
+
+        # Header information
+        #-------------------
+        if o_xelem.tag == 'header':
+            if po_container is not None:
+                _read_xml_header(o_xelem, po_container)
+            o_xml_root.clear()
+
+        # RomSet information
+        #-------------------
+        elif o_xelem.tag in _ts_XML_ROMSET_TAGS:
+            u_game_name = o_xelem.attrib['name']
+            u_game_description = o_xelem.find('description').text
 
-    ls_data = []
-    s_data = ''
+            o_dat_game = RomSet(u_game_name, u_game_description)
 
-    # Adding a space to the section because it has to exist a space between the section and the data.
-    s_section += ' '
+            for o_xelem_rom in o_xelem.findall('rom'):
+                o_dat_game.add_rom(_get_xml_rom(o_xelem_rom))
 
-    for s_line in ls_lines:
-        s_line = s_line.strip()
+            # Processed elements are removed from the tree to free their memory
+            o_xml_root.clear()
 
-        if s_line.find(s_section) == 0:
-            i_start_pos = len(s_section)
-            s_data = s_line[i_start_pos:]
-            s_data = s_data.strip()
-            s_data = s_data.strip('"')
-            ls_data.append(s_data)
+            yield o_dat_game
 
-    if s_mode == 'single':
-        x_output = s_data
-    elif s_mode == 'multi':
-        x_output = ls_data
-    else:
-        raise Exception('Error: %s mode for _dat_vertical_parse() NOT known.' % s_mode)
 
-    return x_output
+def iter_cmp_romsets(pu_file, po_container=None):
+    """
+    Generator to read the RomSets of a ClrMamePro dat one by one. The raw bytes of the file are split in tokens in a
+    single pass (see _iter_cmp_blocks()) and each game is built as soon as its block is closed.
+
+    :param pu_file: Path of the dat file. i.e. '/home/john/mame.dat'
+    :type pu_file: unicode
 
+    :param po_container: RomSetContainer where the information of the header (name, description...) will be stored. The
+                         RomSets are NOT added to it.
+    :type po_container: RomSetContainer
 
-def _dat_horizontal_parse(s_line, s_start, s_end):
+    :return: The RomSets found in the dat, in the same order.
+    :rtype collections.Iterable[RomSet]
+    """
+    with open(pu_file, 'rb') as o_file:
+        o_map = mmap.mmap(o_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    try:
+        for s_block, ltx_block in _iter_cmp_blocks(o_map):
+            # Header information
+            #-------------------
+            if s_block in _ts_CMP_HEADER_BLOCKS:
+                if po_container is not None:
+                    ds_header = dict(ltx_block)
+                    po_container.u_name = _decode_cmp_value(ds_header.get('name'))
+                    po_container.u_description = _decode_cmp_value(ds_header.get('description'))
+                    po_container.u_version = _decode_cmp_value(ds_header.get('version'))
+                    po_container.u_comment = _decode_cmp_value(ds_header.get('comment'))
+
+            # RomSet information
+            #-------------------
+            elif s_block in _ts_CMP_ROMSET_BLOCKS:
+                yield _get_cmp_romset(ltx_block)
+
+    finally:
+        o_map.close()
+
+
+def _iter_cmp_blocks(ps_data):
     """
-    Function to parse a SINGLE line containing information about a particular item.
+    Generator to split the data of a ClrMamePro dat in its top level blocks. e.g.
 
-    So, the information follows a pattern similar to:
+        game (
+            name "Actraiser (Japan)"
+            rom ( name "Actraiser (Japan).sfc" size 1048576 crc 6ee0a4ba )
+        )
 
-        a_start DATA_A a_end b_start DATA_B b_end...
+    is returned as ('game', [('name', 'Actraiser (Japan)'), ('rom', [('name', 'Actraiser (Japan).sfc'), ...])]).
 
-    :param s_line: string containing the line to be parsed.
+    The data is read token by token only once, quoted strings can contain spaces and brackets and blocks can be nested.
+    Values are returned as the original (utf8) bytes.
 
-    :param s_start: leading string for data. In the above example: "a_start", "b_start"...
+    Sometimes values have quotes around and sometimes not. Unquoted values take the rest of the line, or inside ROM
+    blocks, everything up to the next known key (see _o_CMP_ITEM_KEY_REGEX), so brackets inside them aren't taken as
+    blocks. e.g. 'rom ( name Actraiser (Japan).sfc size 1048576 crc 6ee0a4ba )'
 
-    :param s_end: ending string for data. In the above example: "a_end", "b_end"...
+    :param ps_data: Data of the dat. Any buffer supported by re (e.g. a mmap object).
 
-    Comment: Typically, all the items inside the line are unique, so there is no need to 'multi' parameter like in
-    _dat_vertical_parse() function.
+    :return: The name and the (key, value) pairs of each top level block. Values are strings or lists of pairs.
+    :rtype collections.Iterable[(str, list[(str, str|list)])]
+    """
+    ltx_stack = []      # Open blocks: (name, pairs of the parent block)
+    ltx_pairs = None    # Pairs of the current block, None at the top level
+    s_key = None
+
+    i_pos = 0
+    while True:
+        o_match = _o_CMP_TOKEN_REGEX.search(ps_data, i_pos)
+        if o_match is None:
+            break
+
+        i_pos = o_match.end()
+        i_token = o_match.lastindex
+
+        # Block start, the last key read is the name of the block
+        if i_token == 2:
+            ltx_stack.append((s_key, ltx_pairs))
+            ltx_pairs = []
+            s_key = None
+
+        # Block end, the block is added to its parent or returned when it's a top level one
+        elif i_token == 3:
+            if not ltx_stack:
+                continue
+
+            s_block, ltx_parent = ltx_stack.pop()
+            if ltx_parent is None:
+                yield s_block, ltx_pairs
+            else:
+                ltx_parent.append((s_block, ltx_pairs))
+
+            ltx_pairs = ltx_parent
+            s_key = None
+
+        # Keys and values, they always come in pairs inside the blocks
+        else:
+            s_token = o_match.group(i_token)
+            if (s_key is None) or (ltx_pairs is None):
+                s_key = s_token
+            else:
+                if i_token == 4:
+                    s_token, i_pos = _get_cmp_bare_value(ps_data, o_match, ltx_stack[-1][0] in _ts_CMP_ITEM_BLOCKS)
 
-        @rtype: string
+                ltx_pairs.append((s_key, s_token))
+                s_key = None
 
+
+def _get_cmp_bare_value(ps_data, po_match, pb_item):
     """
+    Function to get a complete unquoted value of a ClrMamePro dat, which can contain spaces and brackets.
 
-    s_output = ''
+    :param ps_data: Data of the dat.
 
-    if s_line.find(s_start) != -1:
-        i_start_pos = s_line.find(s_start) + len(s_start)
-        i_end_pos = s_line.find(s_end, i_start_pos)
+    :param po_match: Match of the first word of the value (see _o_CMP_TOKEN_REGEX).
 
-        if i_end_pos != -1:
-            s_output = s_line[i_start_pos:i_end_pos]
+    :param pb_item: Whether the value is inside a single line block (i.e. a ROM) or not.
+    :type pb_item: bool
 
-    # It shouldn't appear extra spaces around the real data but just in case...
-    s_output = s_output.strip()
-    s_output = s_output.strip('"')
-    s_output = s_output.strip()
+    :return: The value and the position where the parsing has to continue.
+    :rtype str, int
+    """
+    i_start = po_match.start()
+    i_eol = ps_data.find('\n', i_start)
+    if i_eol == -1:
+        i_eol = len(ps_data)
+
+    if pb_item:
+        o_key_match = _o_CMP_ITEM_KEY_REGEX.search(ps_data, i_start, i_eol)
+        if o_key_match:
+            i_end = o_key_match.start()
+        else:
+            # The last value of the block, the closing bracket of the block is the last one in the line
+            i_end = ps_data.rfind(')', i_start, i_eol)
+            if i_end == -1:
+                i_end = i_eol
+    else:
+        i_end = i_eol
 
-    return s_output
+    s_value = ps_data[i_start:i_end].strip()
 
+    # Unbalanced brackets mean the value is followed by the end of its block (e.g. 'year 1990 )'), so only the first
+    # word is taken.
+    if s_value.count('(') != s_value.count(')'):
+        return po_match.group(4), po_match.end()
 
-def _hex_add(pu_hex_a, pu_hex_b):
+    return s_value, i_end
+
+
+def _decode_cmp_value(ps_value):
     """
-    Function to add two hex digits
-    :param pu_hex_a:
-    :param pu_hex_b:
-    :return:
+    Function to decode a value of a ClrMamePro dat, missing values (None) are returned as empty strings.
+    :rtype unicode
     """
+    if ps_value is None:
+        u_value = u''
+    else:
+        u_value = ps_value.decode('utf8', 'ignore')
 
-    s_hex_a = str(pu_hex_a)
-    s_hex_b = str(pu_hex_b)
+    return u_value
 
-    # Padding the strings so they are LONGEST + 1 (the +1 is to keep the carryover)
-    i_length = max(len(s_hex_a), len(s_hex_b)) + 1
 
-    s_hex_a = s_hex_a.rjust(i_length, '0')
-    s_hex_b = s_hex_b.rjust(i_length, '0')
+def _get_cmp_romset(pltx_block):
+    """
+    Function to build a RomSet from the data of its block in a ClrMamePro dat.
 
-    # We start the addition process
-    #------------------------------
-    s_hex_result = ''
+    :param pltx_block: (key, value) pairs of the block (see _iter_cmp_blocks()).
 
-    i_carry_over = 0
+    :return: The RomSet.
+    :rtype RomSet
+    """
+    ds_romset = {}
+    ldts_roms = []
+    for s_key, x_value in pltx_block:
+        if s_key == 'rom':
+            ldts_roms.append(dict(x_value))
+        elif isinstance(x_value, str):
+            ds_romset[s_key] = x_value
+
+    o_dat_romset = RomSet(_decode_cmp_value(ds_romset.get('name')), _decode_cmp_value(ds_romset.get('description')))
+    o_dat_romset.u_year = _decode_cmp_value(ds_romset.get('year')) or u'0'
+    o_dat_romset.u_auth = _decode_cmp_value(ds_romset.get('manufacturer'))
+
+    for ds_rom in ldts_roms:
+        # create a rom object
+        o_rom = Rom()
+        o_rom.u_name = _decode_cmp_value(ds_rom.get('name'))
+        o_rom.u_crc32 = _decode_cmp_value(ds_rom.get('crc')).lower()
+        o_rom.u_md5 = _decode_cmp_value(ds_rom.get('md5')).lower()
+        o_rom.u_sha1 = _decode_cmp_value(ds_rom.get('sha1')).lower()
+
+        try:
+            o_rom.i_size = int(ds_rom['size'])
+        except (KeyError, ValueError):
+            o_rom.b_bad = True
+
+        # So far, MAME is the only dat providing flags, and it's only one.
+        if ds_rom.get('flags') in ('baddump', 'nodump'):
+            o_rom.b_bad = True
+
+        # add the rom object to the list
+        o_dat_romset.add_rom(o_rom)
+
+    return o_dat_romset
+
+
+def _read_xml_header(po_xelem_header, po_container):
+    """
+    Function to store the information of the header of a XML dat in a RomSetContainer.
 
-    for u_digit_a, u_digit_b in zip(s_hex_a[::-1], s_hex_b[::-1]):
-        i_digit_c = int(u_digit_a, 16) + int(u_digit_b, 16) + i_carry_over
-        s_digits_c = hex(i_digit_c).partition('x')[2]
+    :param po_xelem_header: Header element.
+
+    :param po_container: RomSetContainer.
+    :type po_container: RomSetContainer
+
+    :return: Nothing
+    """
+    po_container.u_name = po_xelem_header.find('name').text
+    po_container.u_description = po_xelem_header.find('description').text
+    po_container.u_version = po_xelem_header.find('version').text
+
+    # Elements without children are False, so they have to be compared with None
+    o_xelem_homepage = po_xelem_header.find('homepage')
+    if o_xelem_homepage is not None:
+        po_container.u_homepage = o_xelem_homepage.text
+
+    o_xelem_author = po_xelem_header.find('author')
+    if o_xelem_author is not None:
+        po_container.u_author = o_xelem_author.text
+    else:
+        po_container.u_author = u'None'
 
-        if len(s_digits_c) == 2:
-            i_carry_over = int(s_digits_c[0])
-            s_hex_result += s_digits_c[1]
-        else:
-            i_carry_over = 0
-            s_hex_result += s_digits_c[0]
 
-    s_hex_result = s_hex_result[::-1].lstrip('0')
+def _get_xml_rom(po_xelem_rom):
+    """
+    Function to build a Rom from its element in a XML dat.
 
-    return unicode(s_hex_result)
+    :param po_xelem_rom: Rom element.
+
+    :return: The ROM.
+    :rtype Rom
+    """
+    o_rom = Rom()
+    try:
+        o_rom.u_name = po_xelem_rom.attrib['name']
+    except KeyError:
+        pass
+
+    try:
+        o_rom.i_size = int(po_xelem_rom.attrib['size'])
+    except KeyError:
+        o_rom.b_bad = True
+
+    try:
+        o_rom.u_crc32 = po_xelem_rom.attrib['crc'].lower()
+    except KeyError:
+        o_rom.b_bad = True
+
+    try:
+        o_rom.u_md5 = po_xelem_rom.attrib['md5'].lower()
+    except KeyError:
+        o_rom.u_md5 = None
+
+    try:
+        o_rom.u_sha1 = po_xelem_rom.attrib['sha1'].lower()
+    except KeyError:
+        o_rom.u_sha1 = None
+
+    # MAME XML (AFAIK) includes a status field which can contain "baddump" and "nodump"
+    try:
+        u_status = po_xelem_rom.attrib['status'].lower()
+        if u_status in ('baddump', 'nodump'):
+            o_rom.b_bad = True
+    except KeyError:
+        pass
+
+    return o_rom
+
+
+# TODO: This function doesn't belong here. It should be in another library called rom_tools or something like that.
+def get_rom_header(pu_rom_file):
+    """
+    Function to return the year(s) found in a rom file.
+
+    Only the first bytes of the ROM are scanned and only years 19xx and 20xx are searched for.
+
+    :param pu_rom_file: Name of the file to search in.
+
+    :return: A list with the found years as integers.
+    """
+
+    i_bytes = 2048
+    i_min_year = 1970
+    i_max_year = 2020
+
+    li_years = []
+    li_years_clean = []
+
+    o_file = open(pu_rom_file, mode='rb')
+    s_data_chunk = o_file.read(i_bytes)
+    o_file.close()
+
+    o_match = re.search(r'(\d{4})', s_data_chunk)
+
+    if o_match:
+        for s_year in o_match.groups():
+            li_years.append(int(s_year))
+
+    for i_year in li_years:
+        if i_min_year <= i_year <= i_max_year:
+            li_years_clean.append(i_year)
+
+    return li_years_clean
+
+
+# Helper Functions
+#=======================================================================================================================
+def _get_cache_file_and_key(pu_file):
+    """
+    Function to get the cache file of a dat and the key that identifies the current version of the dat.
+
+    :param pu_file: Path of the dat.
+    :type pu_file: unicode
+
+    :return: The path of the cache file and the key: (absolute path, size, modification time, library version, cache
+             format).
+    :rtype unicode, tuple
+    """
+    u_file = os.path.abspath(pu_file)
+    o_stat = os.stat(u_file)
+
+    u_cache_file = os.path.join(u_CACHE_DIR, u'%s.pickle' % hashlib.sha1(u_file.encode('utf8')).hexdigest())
+    tx_key = (u_file, o_stat.st_size, o_stat.st_mtime, _u_VERSION, _i_CACHE_FORMAT)
+
+    return u_cache_file, tx_key
+
+
+def _get_romset_sort_key(po_romset):
+    """
+    Function to get the key used to sort the ROMsets of a RomSetContainer.
+
+    :param po_romset: ROMset.
+    :type po_romset: RomSet
+
+    :return: The description of the ROMset encoded as utf8.
+    :rtype str
+    """
+    return po_romset.u_desc.encode('utf8', 'strict')
 
 
 def _compound_hash(plu_hexs):
     """
-    Function to return the compound hex of a list of hexs
+    Function to return the compound hex of a list of hexs, their sum as integers. Empty hexs count as 0, a zero sum
+    gives u'', an empty list gives u'0' and any None hex gives None.
     :param plu_hexs:
     :return:
     """
-    if None not in plu_hexs:
+    if None in plu_hexs:
+        u_result = None
+
+    elif not plu_hexs:
         u_result = u'0'
-        for u_hex in plu_hexs:
-            u_result = _hex_add(u_result, u_hex)
+
     else:
-        u_result = None
+        i_result = 0
+        for u_hex in plu_hexs:
+            if u_hex:
+                i_result += int(u_hex, 16)
+
+        u_result = u'%x' % i_result if i_result else u''
 
     return u_result
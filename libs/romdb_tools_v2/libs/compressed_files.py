@@ -1,16 +1,56 @@
+import codecs
 import datetime
+import hashlib
+import mmap
+import multiprocessing
+import multiprocessing.pool
+import os
+import Queue
 import re
+import zipfile
+import zlib
 
 import cons
 import hash
+import rom_headers
 import shell
 
 
+# Constants
+#=======================================================================================================================
+# Maximum number of 7z files listed by each run of the 7z command line tool
+i_7Z_BATCH = 64
+
+# Limit for the length of the file names passed in a single command line (Windows limit is 8191 characters)
+_i_7Z_MAX_CMD_LENGTH = 7000
+
+# Characters taken as wildcards by 7z in the names of the archives. Files with them in their names would match other
+# archives, so they are not listed in batches.
+_u_7Z_WILDCARDS = u'*?['
+
+# Number of non-7z files scanned by each task of scan_many()
+_i_SCAN_CHUNK = 16
+
+# Maximum number of tasks of scan_many() queued or running per worker
+_i_SCAN_WINDOW = 2
+
+# Seconds scan_many() waits for a result before checking whether any task failed or any worker died
+_f_SCAN_POLL = 0.5
+
+# Persistent cache of scanned files (see set_cache())
+_o_cache = None
+
+# Regular expression to find the files referenced by a .cue file. e.g. 'FILE "MediEvil (Spain) (Track 1).bin" BINARY'
+_o_CUE_FILE_REGEX = re.compile(r'^\s*FILE\s+(?:"([^"]*)"|(\S+))\s+\S+\s*$', re.IGNORECASE | re.MULTILINE)
+
+
 # Classes
 #=======================================================================================================================
 class _CompressedFile:
     def __init__(self):
         self.u_crc32 = u''
+        self.u_md5 = None
+        self.u_sha1 = None
         self.u_name = u''
         self.i_real_size = 0
         self.i_comp_size = 0
@@ -105,6 +145,8 @@ class _Rom(object):
         self.u_file = u''
         self.i_crc32 = 0
         self.i_size = 0
+        self.u_md5 = None               # Only computed when asked for (see scan_file())
+        self.u_sha1 = None
 
     def __str__(self):
         return unicode(self).encode('utf8')
@@ -117,6 +159,8 @@ class _Rom(object):
         u_out += u'  .i_size:  %i\n' % self.i_size
         u_out += u'  .i_crc32: %s\n' % self.i_crc32
         u_out += u'  .u_crc32: %s\n' % self.u_crc32
+        u_out += u'  .u_md5:   %s\n' % self.u_md5
+        u_out += u'  .u_sha1:  %s\n' % self.u_sha1
         return u_out
 
     def _get_crc32(self):
@@ -133,15 +177,141 @@ class _Rom(object):
     u_ext = property(fget=_get_ext, fset=None)
 
 
+# Cache Functions
+#=======================================================================================================================
+def set_cache(po_cache):
+    """
+    Function to set the persistent cache consulted by the scan functions before opening any file. Unchanged files found
+    in the cache are not opened at all and the ROMsets of the rest are stored in it after being scanned.
+
+    :param po_cache: The cache, None to disable it.
+    :type po_cache: scan_cache.ScanCache, None
+
+    :return: Nothing
+    """
+    global _o_cache
+    _o_cache = po_cache
+
+
+def _get_cached_romset(pu_file, pb_headers, pb_hashes=False):
+    """
+    Function to get the ROMset of a file from the cache.
+    :return: The ROMset or None when there is no cache or the file is not in it (or it is, but without the MD5 and SHA1
+             hashes requested).
+    """
+    if _o_cache is None:
+        return None
+
+    ltx_roms = _o_cache.get(pu_file, pb_headers)
+    if ltx_roms is None:
+        return None
+
+    o_romset = _RomSet()
+    for u_name, i_crc32, i_size, u_md5, u_sha1 in ltx_roms:
+        if pb_hashes and ((u_md5 is None) or (u_sha1 is None)):
+            return None
+
+        o_rom = _Rom()
+        o_rom.u_file = u_name
+        o_rom.i_crc32 = i_crc32
+        o_rom.i_size = i_size
+        o_rom.u_md5 = u_md5
+        o_rom.u_sha1 = u_sha1
+
+        o_romset.add_rom(o_rom)
+
+    return o_romset
+
+
+def _set_cached_romset(pu_file, po_romset, pb_headers):
+    if _o_cache is not None:
+        _o_cache.set(pu_file,
+                     [(o_rom.u_file, o_rom.i_crc32, o_rom.i_size, o_rom.u_md5, o_rom.u_sha1)
+                      for o_rom in po_romset.lo_romfiles],
+                     pb_headers)
+
+
+# Hashing Functions
+#=======================================================================================================================
+def _hash_data(piss_chunks, pi_size, pu_name, pb_headers, pb_hashes):
+    """
+    Function to compute the CRC32 (and optionally MD5 and SHA1) of the data of a ROM in a single pass over it.
+
+    :param piss_chunks: Data of the ROM, in chunks (strings or buffers).
+    :type piss_chunks: collections.Iterable[str]
+
+    :param pi_size: Size of the ROM.
+    :type pi_size: int
+
+    :param pu_name: Name of the ROM.
+    :type pu_name: unicode
+
+    :param pb_headers: Whether to skip the header of the ROM (see rom_headers).
+    :type pb_headers: bool
+
+    :param pb_hashes: Whether to compute MD5 and SHA1.
+    :type pb_hashes: bool
+
+    :return: The CRC32, the size (without the header) and the MD5 and SHA1 hashes (None when not computed).
+    :rtype int, int, unicode, unicode
+
+    :raise IOError: When the data is shorter than pi_size.
+    """
+    lo_hashes = [hashlib.md5(), hashlib.sha1()] if pb_hashes else []
+
+    if pb_headers:
+        i_crc32, i_size = rom_headers.clean_crc32(piss_chunks, pi_size, pu_name, lo_hashes)
+
+    else:
+        i_crc32 = 0
+        i_read = 0
+        for o_chunk in piss_chunks:
+            i_crc32 = zlib.crc32(o_chunk, i_crc32)
+            for o_hash in lo_hashes:
+                o_hash.update(o_chunk)
+            i_read += len(o_chunk)
+
+        if i_read < pi_size:
+            raise IOError(u'Truncated data for "%s", %i of %i bytes read' % (pu_name, i_read, pi_size))
+
+        i_crc32 &= 0xffffffff
+        i_size = pi_size
+
+    if pb_hashes:
+        u_md5 = unicode(lo_hashes[0].hexdigest())
+        u_sha1 = unicode(lo_hashes[1].hexdigest())
+    else:
+        u_md5 = None
+        u_sha1 = None
+
+    return i_crc32, i_size, u_md5, u_sha1
+
+
 # 7z Functions
 #=======================================================================================================================
-def scan_7z_file(pu_file):
+def scan_7z_file(pu_file, pb_cache=True, pb_headers=False, pb_hashes=False):
     """
     Function that build the ROMset found in the 7z file
 
     :param pu_file:
+
+    :param pb_cache: Whether to use the persistent cache (see set_cache()).
+    :type pb_cache: bool
+
+    :param pb_headers: Whether to extract the files to compute their CRC32 without headers (see rom_headers). It
+                       requires the 7z command line tool.
+    :type pb_headers: bool
+
+    :param pb_hashes: Whether to extract the files to compute their MD5 and SHA1 hashes. It requires the 7z command line
+                      tool.
+    :type pb_hashes: bool
+
     :return:
     """
+    if pb_cache:
+        o_romset = _get_cached_romset(pu_file, pb_headers, pb_hashes)
+        if o_romset is not None:
+            return o_romset
 
     # Obtaining ROMset data from content of 7z file
     #----------------------------------------------
@@ -149,18 +319,132 @@ def scan_7z_file(pu_file):
     # output data from the 7z command line tool.
     lo_7z_files = _parse_7z_cli_output(pu_file)
 
+    if pb_headers or pb_hashes:
+        _hash_7z_files(pu_file, lo_7z_files, pb_headers, pb_hashes)
+
+    o_romset = _build_7z_romset(lo_7z_files)
+
+    if pb_cache:
+        _set_cached_romset(pu_file, o_romset, pb_headers)
+
+    return o_romset
+
+
+def scan_7z_files(plu_files, pi_batch=i_7Z_BATCH, pb_cache=True, pb_headers=False, pb_hashes=False):
+    """
+    Generator that builds the ROMsets found in several 7z files. Instead of running 7z once per file, the files are
+    listed in batches by a single 7z process whose output is parsed while it's produced.
+
+    :param plu_files: Paths of the 7z files.
+    :type plu_files: list[unicode]
+
+    :param pi_batch: Maximum number of files listed by each 7z process.
+    :type pi_batch: int
+
+    :param pb_cache: Whether to use the persistent cache (see set_cache()).
+    :type pb_cache: bool
+
+    :param pb_headers: Whether to compute the CRC32 of the files without headers (see scan_7z_file()). Every 7z file has
+                       to be extracted, so they are not listed in batches.
+    :type pb_headers: bool
+
+    :param pb_hashes: Whether to compute the MD5 and SHA1 of the files (see scan_7z_file()). Every 7z file has to be
+                      extracted, so they are not listed in batches.
+    :type pb_hashes: bool
+
+    :return: The path of each file and its ROMset, None when the file couldn't be read.
+    :rtype collections.Iterable[(unicode, _RomSet)]
+    """
+    lu_files = []
+    lu_single_files = []
+    for u_file in plu_files:
+        o_romset = _get_cached_romset(u_file, pb_headers, pb_hashes) if pb_cache else None
+        if o_romset is not None:
+            yield u_file, o_romset
+        elif pb_headers or pb_hashes or _has_7z_wildcards(u_file):
+            lu_single_files.append(u_file)
+        else:
+            lu_files.append(u_file)
+
+    for u_file in lu_single_files:
+        try:
+            o_romset = scan_7z_file(u_file, pb_cache=pb_cache, pb_headers=pb_headers, pb_hashes=pb_hashes)
+        except Exception:
+            o_romset = None
+        yield u_file, o_romset
+
+    for lu_batch in _get_7z_batches(lu_files, pi_batch):
+        # 7z reports the absolute path of each archive it lists
+        du_batch = dict((os.path.abspath(u_file), u_file) for u_file in lu_batch)
+
+        for u_archive, lo_7z_files in _parse_7z_cli_lines(_get_7z_cli_lines(du_batch.keys())):
+            u_file = du_batch.pop(os.path.abspath(u_archive), None)
+            if u_file is not None:
+                o_romset = _build_7z_romset(lo_7z_files)
+                if pb_cache:
+                    _set_cached_romset(u_file, o_romset, False)
+                yield u_file, o_romset
+
+        # Archives not found in the output couldn't be opened by 7z
+        for u_file in lu_batch:
+            if os.path.abspath(u_file) in du_batch:
+                yield u_file, None
+
+
+def _build_7z_romset(plo_7z_files):
     o_romset = _RomSet()
-    for o_file in lo_7z_files:
+    for o_file in plo_7z_files:
         o_rom = _Rom()
         o_rom.u_file = o_file.u_name
-        o_rom.i_crc32 = int(o_file.u_crc32, 16)
+        o_rom.i_crc32 = int(o_file.u_crc32 or u'0', 16)
         o_rom.i_size = o_file.i_real_size
+        o_rom.u_md5 = o_file.u_md5
+        o_rom.u_sha1 = o_file.u_sha1
 
         o_romset.add_rom(o_rom)
 
     return o_romset
 
 
+def _get_7z_batches(plu_files, pi_batch):
+    """
+    Generator to split a list of files in batches small enough to fit in a single command line.
+    """
+    lu_batch = []
+    i_length = 0
+    for u_file in plu_files:
+        if lu_batch and ((len(lu_batch) >= pi_batch) or (i_length + len(u_file) > _i_7Z_MAX_CMD_LENGTH)):
+            yield lu_batch
+            lu_batch = []
+            i_length = 0
+
+        lu_batch.append(u_file)
+        i_length += len(u_file) + 8
+
+    if lu_batch:
+        yield lu_batch
+
+
+def _has_7z_wildcards(pu_file):
+    """
+    Function to check whether the name of a file contains characters that 7z would take as wildcards.
+    """
+    return any(u_char in pu_file for u_char in _u_7Z_WILDCARDS)
+
+
+def _get_7z_cli_lines(plu_files):
+    """
+    Generator to list the contents of several 7z files with a single run of the 7z command line tool. The output is
+    yielded line by line, as soon as 7z produces it.
+    """
+
+    # The archive name field is disabled (-an) and each archive is included with -ai!, whose names are still parsed as
+    # wildcards. scan_7z_files() doesn't pass files whose names contain them.
+    u_cmd = u'7z l -slt -an %s' % u' '.join([u'-ai!"%s"' % u_file for u_file in plu_files])
+    o_cmd = shell.Command(u_cmd)
+    return o_cmd.execute_lines()
+
+
 def _parse_7z_cli_output(pu_file):
     """
     Function to parse the information output of 7z about the contents of a compressed file.
@@ -170,30 +454,42 @@ def _parse_7z_cli_output(pu_file):
 
     # The current support for 7z files in python is very limited at the moment, so I get the content
     # of the file by using the command line tool for 7z and then I pare its output.
-    u_cmd = u'7z l -slt "%s"' % pu_file
+    u_path = os.path.abspath(pu_file)
+    u_cmd = u'7z l -slt "%s"' % u_path
     o_cmd = shell.Command(u_cmd)
-    o_cmd.execute()
 
-    # Files data will come after a line with "----------" and there is an empty line between the information of two
-    # files
-    u_elements_data = o_cmd.u_stdout.partition(u'----------')[2]
-
-    lu_elements_data = u_elements_data.split(u'\n\n')
-
-    lo_files = []
-    for u_elem_data in lu_elements_data:
-        o_file = _parse_7z_cli_file_chunk(u_elem_data)
-        if o_file:
-            lo_files.append(o_file)
+    # When the name contains wildcards, 7z also lists any other archive matching it
+    ltx_archives = list(_parse_7z_cli_lines(o_cmd.execute_lines()))
+    lo_files = ltx_archives[-1][1] if len(ltx_archives) == 1 else []
+    for u_archive, lo_archive_files in ltx_archives:
+        if os.path.abspath(u_archive) == u_path:
+            lo_files = lo_archive_files
 
     return lo_files
 
 
-def _parse_7z_cli_file_chunk(pu_chunk):
+def _parse_7z_cli_lines(piu_lines):
     """
-    Function to parse the chunk of text of 7z about a particular file.
+    Generator to parse the information output of 7z about the contents of one or more compressed files. Lines are
+    parsed one by one, so the output doesn't need to be kept in memory.
+
+    Example output:
 
-    Example chunk:
+        Listing archive: /home/john/MediEvil (Spain).7z
+
+        --
+        Path = /home/john/MediEvil (Spain).7z
+        Type = 7z
+        Physical Size = 4758066
+        Headers Size = 278
+        Method = LZMA:25
+        Solid = +
+        Blocks = 1
+
+        ----------
+        Path = MediEvil (Spain) (Track 1).bin
+        Size = 541678128
+        ...
 
         Path = MediEvil (Spain) (Track 2).bin
         Size = 32989152
@@ -205,37 +501,155 @@ def _parse_7z_cli_file_chunk(pu_chunk):
         Method = LZMA:25
         Block = 0
 
-    :param pu_chunk:
-    :return:
+    Each archive starts with a "Listing archive" line, followed by the information of the archive itself and then, after
+    a line with "----------", the information of each file separated by empty lines.
+
+    :param piu_lines: Lines of the 7z output.
+
+    :return: The path of each archive and the files found inside it.
+    :rtype collections.Iterable[(unicode, list[_CompressedFile])]
     """
+    u_archive = None
+    lo_files = []
+    o_file = None
+    b_files = False
+    b_folder = False
+
+    for u_line in piu_lines:
+        if u_line.startswith(u'Listing archive: '):
+            # The last file of the previous archive could be not followed by an empty line
+            if b_files:
+                if o_file and not b_folder:
+                    lo_files.append(o_file)
+                yield u_archive, lo_files
+
+            u_archive = u_line.partition(u':')[2].strip()
+            lo_files = []
+            o_file = None
+            b_files = False
+            b_folder = False
+
+        elif u_line == u'----------':
+            b_files = True
+
+        elif b_files:
+            if not u_line:
+                if o_file and not b_folder:
+                    lo_files.append(o_file)
+                o_file = None
+                b_folder = False
+
+            # Folders are not part of the ROMset, so the rest of their lines are ignored
+            elif not b_folder:
+                if o_file is None:
+                    o_file = _CompressedFile()
+                b_folder = not _parse_7z_cli_line(o_file, u_line)
+
+    # The last file could be not followed by an empty line. Archives that 7z couldn't open never reach the files
+    # section, so they are not yielded.
+    if b_files:
+        if o_file and not b_folder:
+            lo_files.append(o_file)
+        yield u_archive, lo_files
 
-    lu_lines = pu_chunk.splitlines()
 
-    o_file = _CompressedFile()
+def _parse_7z_cli_line(po_file, pu_line):
+    """
+    Function to parse a line of text of 7z about a particular file.
 
-    for u_line in lu_lines:
-        if u_line.startswith(u'Path ='):
-            o_file.u_name = u_line.partition(u'=')[2].strip()
+    :param po_file: File object to store the information in.
+    :type po_file: _CompressedFile
 
-        elif u_line.startswith(u'Size ='):
-            o_file.i_real_size = int(u_line.partition(u'=')[2])
-        elif u_line.startswith(u'Packed Size ='):
-            # Apparently, using maximum compression, 7z doesn't inform you abut the uncompressed size of the file.
-            try:
-                o_file.i_comp_size = int(u_line.partition(u'=')[2])
-            except ValueError:
-                o_file.i_comp_size = 0
+    :param pu_line: e.g. u'Size = 32989152'
+    :type pu_line: unicode
 
-        elif u_line.startswith(u'CRC ='):
-            o_file.u_crc32 = u_line.partition(u'=')[2].strip().lower()
+    :return: False when the line shows the file is a folder, True otherwise.
+    :rtype bool
+    """
+    b_file = True
+    u_key, u_sep, u_value = pu_line.partition(u' = ')
+
+    if u_key == u'Path':
+        po_file.u_name = u_value.strip()
+    elif u_key == u'Size':
+        po_file.i_real_size = int(u_value)
+    elif u_key == u'Packed Size':
+        # Apparently, using maximum compression, 7z doesn't inform you abut the uncompressed size of the file.
+        try:
+            po_file.i_comp_size = int(u_value)
+        except ValueError:
+            po_file.i_comp_size = 0
+    elif u_key == u'CRC':
+        po_file.u_crc32 = u_value.strip().lower()
+    elif (u_key == u'Folder') and (u_value.strip() == u'+'):
+        b_file = False
+    elif (u_key == u'Attributes') and u_value.startswith(u'D'):
+        b_file = False
+
+    return b_file
+
+
+def _hash_7z_files(pu_file, plo_files, pb_headers, pb_hashes):
+    """
+    Function to compute again the hashes of the files inside a 7z file from their data (see _hash_data()). All the files
+    are extracted by a single 7z process to its standard output, in the same order they are listed, and the stream is
+    split using their sizes. Nothing is written to disk and solid blocks are only decompressed once.
 
-    return o_file
+    :param pu_file: Path of the 7z file.
+    :type pu_file: unicode
+
+    :param plo_files: Files inside the 7z file, in the order listed by 7z.
+    :type plo_files: list[_CompressedFile]
+
+    :return: Nothing
+    """
+    u_cmd = u'7z e -so "%s"' % pu_file
+    o_cmd = shell.Command(u_cmd)
+    o_cmd.execute_stdout(_hash_7z_stream, plo_files, pb_headers, pb_hashes)
+
+
+def _hash_7z_stream(po_stream, plo_files, pb_headers, pb_hashes):
+    """
+    Function to read the data of several files, one after the other, from a stream and replace their hashes and size by
+    the ones computed from the data.
+    """
+    for o_file in plo_files:
+        i_crc32, i_size, u_md5, u_sha1 = _hash_data(rom_headers.read_chunks(po_stream, o_file.i_real_size),
+                                                    o_file.i_real_size,
+                                                    o_file.u_name,
+                                                    pb_headers,
+                                                    pb_hashes)
+        o_file.u_crc32 = u'%08x' % i_crc32
+        o_file.i_real_size = i_size
+        o_file.u_md5 = u_md5
+        o_file.u_sha1 = u_sha1
 
 
 # zip Functions
 #=======================================================================================================================
-def scan_zip_file(pu_file):
-    lo_zip_files = _parse_zip_cli_output(pu_file)
+def scan_zip_file(pu_file, pb_cache=True, pb_headers=False, pb_hashes=False):
+    """
+    Function that build the ROMset found in the zip file.
+
+    :param pu_file:
+
+    :param pb_cache: Whether to use the persistent cache (see set_cache()).
+    :type pb_cache: bool
+
+    :param pb_headers: Whether to decompress the files to compute their CRC32 without headers (see rom_headers).
+    :type pb_headers: bool
+
+    :param pb_hashes: Whether to decompress the files to compute their MD5 and SHA1 hashes.
+    :type pb_hashes: bool
+
+    :return:
+    """
+    if pb_cache:
+        o_romset = _get_cached_romset(pu_file, pb_headers, pb_hashes)
+        if o_romset is not None:
+            return o_romset
+
+    lo_zip_files = _read_zip_central_dir(pu_file, pb_headers, pb_hashes)
 
     o_romset = _RomSet()
     for o_file in lo_zip_files:
@@ -243,57 +657,514 @@ def scan_zip_file(pu_file):
         o_rom.u_file = o_file.u_name
         o_rom.i_crc32 = int(o_file.u_crc32, 16)
         o_rom.i_size = o_file.i_real_size
+        o_rom.u_md5 = o_file.u_md5
+        o_rom.u_sha1 = o_file.u_sha1
 
         o_romset.add_rom(o_rom)
 
+    if pb_cache:
+        _set_cached_romset(pu_file, o_romset, pb_headers)
+
     return o_romset
 
 
-def _parse_zip_cli_output(pu_file):
-    u_cmd = u'unzip -v "%s"' % pu_file
-    o_cmd = shell.Command(u_cmd)
-    o_cmd.execute()
+def _read_zip_central_dir(pu_file, pb_headers=False, pb_hashes=False):
+    """
+    Function to read the information about the contents of a zip file.
+
+    Only the central directory at the end of the file is read (CRC32, sizes and names are stored there), so nothing is
+    decompressed and no external process is spawned. When headers have to be removed or MD5 and SHA1 hashes are needed,
+    each file is decompressed once, in small chunks, to compute all of them (see _hash_data()).
+
+    :param pu_file:
 
-    # Command output is something like
-    #
-    #   Archive:  snt_Actraiser (Japan).zip
-    #   TORRENTZIPPED-48567FAD
-    #    Length   Method    Size  Cmpr    Date    Time   CRC-32   Name
-    #   --------  ------  ------- ---- ---------- ----- --------  ----
-    #    1048576  Defl:X   677852  35% 1996-12-24 23:32 bee9b30c  Actraiser (Japan).sfc
-    #   --------          -------  ---                            -------
-    #    1048576           677852  35%                            1 file
+    :param pb_headers:
+    :type pb_headers: bool
 
-    lu_lines = o_cmd.u_stdout.splitlines()[4:-2]
+    :param pb_hashes:
+    :type pb_hashes: bool
 
+    :return:
+    """
     lo_files = []
-    for u_line in lu_lines:
-        o_compressed_file = _parse_zip_cli_line(u_line)
-        if o_compressed_file is not None:
+
+    with zipfile.ZipFile(pu_file, 'r') as o_zip:
+        for o_info in o_zip.infolist():
+            o_compressed_file = _get_zip_compressed_file(o_info)
+            if o_compressed_file is None:
+                continue
+
+            if pb_headers or pb_hashes:
+                with o_zip.open(o_info) as o_member:
+                    i_crc32, i_size, u_md5, u_sha1 = _hash_data(rom_headers.read_chunks(o_member, o_info.file_size),
+                                                                o_info.file_size,
+                                                                o_compressed_file.u_name,
+                                                                pb_headers,
+                                                                pb_hashes)
+                o_compressed_file.u_crc32 = u'%08x' % i_crc32
+                o_compressed_file.i_real_size = i_size
+                o_compressed_file.u_md5 = u_md5
+                o_compressed_file.u_sha1 = u_sha1
+
             lo_files.append(o_compressed_file)
 
     return lo_files
 
 
-def _parse_zip_cli_line(pu_line):
+def _get_zip_compressed_file(po_info):
+    """
+    Function to convert the information of a zip member to a _CompressedFile.
 
-    # For each word we also get the real position inside the original string (we will se later why)
-    ltu_pos_word = []
-    for o_match in re.finditer(r'\S+', pu_line):
-        i_pos, u_word = o_match.start(), o_match.group()
-        ltu_pos_word.append((i_pos, u_word))
+    :param po_info:
+    :type po_info: zipfile.ZipInfo
 
-    o_file = _CompressedFile()
-    o_file.i_real_size = int(ltu_pos_word[0][1])
-    o_file.i_comp_size = int(ltu_pos_word[2][1])
-    o_file.o_date = datetime.datetime.strptime(u'%s %s' % (ltu_pos_word[4][1], ltu_pos_word[5][1]), u'%Y-%m-%d %H:%M')
-    o_file.u_crc32 = ltu_pos_word[6][1]
+    :return: The _CompressedFile object, None for directories.
+    """
 
-    # Because file names can contain more than one space, we need to do a manual cut of the name
-    o_file.u_name = pu_line[ltu_pos_word[7][0]:]
+    # Without the UTF-8 flag, zip file names are stored in CP437 and zipfile keeps them as byte strings
+    u_name = po_info.filename
+    if not isinstance(u_name, unicode):
+        u_name = u_name.decode('cp437')
 
     # Directory names finish with a slash.
-    if o_file.u_name.endswith(u'/'):
+    if u_name.endswith(u'/'):
         o_file = None
 
+    else:
+        o_file = _CompressedFile()
+        o_file.u_name = u_name
+        o_file.i_real_size = po_info.file_size
+        o_file.i_comp_size = po_info.compress_size
+        o_file.u_crc32 = u'%08x' % po_info.CRC
+
+        try:
+            o_file.o_date = datetime.datetime(*po_info.date_time)
+        except ValueError:
+            o_file.o_date = None
+
     return o_file
+
+
+# Raw Functions
+#=======================================================================================================================
+def scan_raw_file(pu_file, pb_cache=True, pb_headers=False, pb_hashes=False):
+    """
+    Function that build the ROMset of an uncompressed ROM file. e.g. u'/home/john/roms/Actraiser (Japan).sfc'
+
+    :param pu_file:
+
+    :param pb_cache: Whether to use the persistent cache (see set_cache()).
+    :type pb_cache: bool
+
+    :param pb_headers: Whether to compute the CRC32 without headers (see rom_headers).
+    :type pb_headers: bool
+
+    :param pb_hashes: Whether to compute the MD5 and SHA1 hashes too.
+    :type pb_hashes: bool
+
+    :return:
+    """
+    if pb_cache:
+        o_romset = _get_cached_romset(pu_file, pb_headers, pb_hashes)
+        if o_romset is not None:
+            return o_romset
+
+    o_romset = _RomSet()
+    o_romset.add_rom(_get_raw_rom(pu_file, os.path.basename(pu_file), pb_headers, pb_hashes))
+
+    if pb_cache:
+        _set_cached_romset(pu_file, o_romset, pb_headers)
+
+    return o_romset
+
+
+def scan_dir(pu_dir, pb_headers=False, pb_hashes=False):
+    """
+    Function that build the ROMset of a directory, considering all the files inside it (and its sub-directories) as the
+    ROMs of a single ROMset. e.g. a directory with the tracks of a CD.
+
+    Directories are never stored in the persistent cache because their modification time doesn't change when the files
+    inside are modified.
+
+    :param pu_dir:
+
+    :param pb_headers: Whether to compute the CRC32 without headers (see rom_headers).
+    :type pb_headers: bool
+
+    :param pb_hashes: Whether to compute the MD5 and SHA1 hashes too.
+    :type pb_hashes: bool
+
+    :return:
+    """
+    o_romset = _RomSet()
+
+    for u_root, lu_dirs, lu_files in os.walk(pu_dir):
+        lu_dirs.sort()
+        for u_file in sorted(lu_files):
+            u_path = os.path.join(u_root, u_file)
+            u_name = os.path.relpath(u_path, pu_dir).replace(os.sep, u'/')
+            o_romset.add_rom(_get_raw_rom(u_path, u_name, pb_headers, pb_hashes))
+
+    return o_romset
+
+
+def scan_cue_file(pu_file, pb_headers=False, pb_hashes=False):
+    """
+    Function that build the ROMset of a .cue file and the track files referenced by it. The .cue file itself is part of
+    the ROMset, so it's considered by the dirty CRC32 but ignored by the clean one (see cons.tu_IGNORE_EXTENSIONS).
+
+    .cue sets are never stored in the persistent cache because track files can be modified without modifying the .cue
+    file.
+
+    :param pu_file: e.g. u'/home/john/roms/MediEvil (Spain).cue'
+
+    :param pb_headers: Whether to compute the CRC32 without headers (see rom_headers).
+    :type pb_headers: bool
+
+    :param pb_hashes: Whether to compute the MD5 and SHA1 hashes too.
+    :type pb_hashes: bool
+
+    :return:
+    """
+    o_romset = _RomSet()
+    o_romset.add_rom(_get_raw_rom(pu_file, os.path.basename(pu_file), pb_headers, pb_hashes))
+
+    u_dir = os.path.dirname(pu_file)
+    for u_track in _get_cue_tracks(pu_file):
+        o_romset.add_rom(_get_raw_rom(os.path.join(u_dir, u_track), u_track, pb_headers, pb_hashes))
+
+    return o_romset
+
+
+def _get_cue_tracks(pu_file):
+    """
+    Function to get the files referenced by a .cue file, in order and without repetitions.
+    :return:
+    """
+    with open(pu_file, 'rb') as o_file:
+        s_data = o_file.read()
+
+    # .cue files are usually plain ASCII, but old tools wrote them in the local encoding
+    try:
+        u_data = s_data.decode('utf8')
+    except UnicodeDecodeError:
+        u_data = s_data.decode('latin1')
+
+    lu_tracks = []
+    for o_match in _o_CUE_FILE_REGEX.finditer(u_data.lstrip(codecs.BOM_UTF8.decode('utf8'))):
+        u_track = o_match.group(1) if o_match.group(1) is not None else o_match.group(2)
+        if u_track not in lu_tracks:
+            lu_tracks.append(u_track)
+
+    return lu_tracks
+
+
+def _get_raw_rom(pu_file, pu_name, pb_headers, pb_hashes):
+    """
+    Function to build a _Rom from an uncompressed file. The file is memory-mapped and hashed in big blocks without
+    copying them, so the speed is limited by the disk.
+
+    :param pu_file: Path of the file.
+    :type pu_file: unicode
+
+    :param pu_name: Name of the ROM inside the ROMset.
+    :type pu_name: unicode
+
+    :return:
+    :rtype _Rom
+    """
+    with open(pu_file, 'rb') as o_file:
+        i_size = os.fstat(o_file.fileno()).st_size
+
+        # Empty files can't be mapped
+        if i_size:
+            o_map = mmap.mmap(o_file.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                tx_hashes = _hash_data(_get_map_chunks(o_map), i_size, pu_name, pb_headers, pb_hashes)
+            finally:
+                o_map.close()
+        else:
+            tx_hashes = _hash_data((), 0, pu_name, pb_headers, pb_hashes)
+
+    o_rom = _Rom()
+    o_rom.u_file = pu_name
+    o_rom.i_crc32, o_rom.i_size, o_rom.u_md5, o_rom.u_sha1 = tx_hashes
+
+    return o_rom
+
+
+def _get_map_chunks(po_map):
+    """
+    Generator to read a memory-mapped file in blocks. The blocks are buffer objects pointing to the mapped memory, so
+    the data is never copied.
+    """
+    for i_pos in xrange(0, len(po_map), rom_headers.i_CHUNK_SIZE):
+        yield buffer(po_map, i_pos, rom_headers.i_CHUNK_SIZE)
+
+
+# Generic Functions
+#=======================================================================================================================
+def scan_file(pu_file, pb_cache=True, pb_headers=False, pb_hashes=False):
+    """
+    Function that build the ROMset found in a file, whatever its type is: 7z and zip files, .cue files (with their track
+    files), directories (with all the files inside) or any other uncompressed ROM file.
+
+    :param pu_file: Path of the file. e.g. u'/home/john/roms/Actraiser (Japan).zip'
+    :type pu_file: unicode
+
+    :param pb_cache: Whether to use the persistent cache (see set_cache()).
+    :type pb_cache: bool
+
+    :param pb_headers: Whether to compute the CRC32 of the ROMs without headers (see rom_headers). It's much slower for
+                       compressed files because they have to be decompressed.
+    :type pb_headers: bool
+
+    :param pb_hashes: Whether to compute the MD5 and SHA1 hashes of the ROMs. Compressed files have to be decompressed.
+    :type pb_hashes: bool
+
+    :return: The ROMset.
+    :rtype _RomSet
+    """
+    u_type = _get_file_type(pu_file)
+
+    if u_type == u'7z':
+        o_romset = scan_7z_file(pu_file, pb_cache=pb_cache, pb_headers=pb_headers, pb_hashes=pb_hashes)
+    elif u_type == u'zip':
+        o_romset = scan_zip_file(pu_file, pb_cache=pb_cache, pb_headers=pb_headers, pb_hashes=pb_hashes)
+    elif u_type == u'dir':
+        o_romset = scan_dir(pu_file, pb_headers=pb_headers, pb_hashes=pb_hashes)
+    elif u_type == u'cue':
+        o_romset = scan_cue_file(pu_file, pb_headers=pb_headers, pb_hashes=pb_hashes)
+    else:
+        o_romset = scan_raw_file(pu_file, pb_cache=pb_cache, pb_headers=pb_headers, pb_hashes=pb_hashes)
+
+    return o_romset
+
+
+def scan_many(plu_files, pi_workers=None, pb_processes=True, pb_cache=True, pb_headers=False, pb_hashes=False):
+    """
+    Generator that builds the ROMsets found in many files using several workers in parallel. Results are yielded as soon
+    as they are ready, so they don't keep the order of the input files.
+
+    Files are read from plu_files only when there is room for new tasks, so memory usage doesn't depend on the number
+    of files and plu_files can be a generator (e.g. walking a whole ROM library). When files don't need to be
+    decompressed, 7z files are grouped in batches listed by a single 7z process (see scan_7z_files()).
+
+    The persistent cache (see set_cache()) is only used by the calling process: files found in it are yielded without
+    being sent to the workers, and the ROMsets scanned by the workers are stored in it when received.
+
+    Errors of single files are yielded with them, but a failed task (e.g. a result that can't be sent back) or a worker
+    process that dies is raised here, instead of waiting forever for its results.
+
+    :param plu_files: Paths of the files (any type supported by scan_file()).
+    :type plu_files: collections.Iterable[unicode]
+
+    :param pi_workers: Number of workers. By default, the number of CPUs.
+    :type pi_workers: int, None
+
+    :param pb_processes: Whether workers are processes (faster for CPU bound work) or threads (lighter, good enough when
+                         the disk is the bottleneck).
+    :type pb_processes: bool
+
+    :param pb_cache: Whether to use the persistent cache.
+    :type pb_cache: bool
+
+    :param pb_headers: Whether to compute the CRC32 of the ROMs without headers (see scan_file()).
+    :type pb_headers: bool
+
+    :param pb_hashes: Whether to compute the MD5 and SHA1 hashes of the ROMs (see scan_file()).
+    :type pb_hashes: bool
+
+    :return: The path of each file, its ROMset (None on error) and the error found (None on success).
+    :rtype collections.Iterable[(unicode, _RomSet, unicode)]
+
+    :raise RuntimeError: When a worker process dies.
+    """
+    if pi_workers is None:
+        pi_workers = multiprocessing.cpu_count()
+
+    if pb_processes:
+        o_pool = multiprocessing.Pool(pi_workers)
+    else:
+        o_pool = multiprocessing.pool.ThreadPool(pi_workers)
+
+    # Python 2 pools only call back on success, so the tasks are kept to find the failed ones. A dead worker process is
+    # silently replaced by the pool and its task never finishes, so the workers are kept too.
+    o_results = Queue.Queue()
+    lo_tasks = []
+    su_workers = _get_worker_pids(o_pool)
+    i_running = 0
+    o_chunks = _get_scan_chunks(plu_files, pb_cache, pb_headers, pb_hashes)
+    b_exhausted = False
+
+    try:
+        while True:
+            # Only a few tasks per worker are queued, so the pending files stay in the input iterable
+            while (not b_exhausted) and (i_running < pi_workers * _i_SCAN_WINDOW):
+                try:
+                    lu_chunk, tx_cached = next(o_chunks)
+                except StopIteration:
+                    b_exhausted = True
+                else:
+                    if tx_cached is not None:
+                        yield tx_cached
+                    else:
+                        lo_tasks.append(o_pool.apply_async(_scan_chunk, (lu_chunk, pb_headers, pb_hashes),
+                                                           callback=o_results.put))
+                        i_running += 1
+
+            if not i_running:
+                break
+
+            try:
+                ltx_results = o_results.get(timeout=_f_SCAN_POLL)
+            except Queue.Empty:
+                _check_scan_tasks(o_pool, lo_tasks, su_workers)
+                continue
+
+            i_running -= 1
+
+            for tx_result in ltx_results:
+                if pb_cache and (tx_result[1] is not None) and _is_cacheable(tx_result[0]):
+                    _set_cached_romset(tx_result[0], tx_result[1], pb_headers)
+                yield tx_result
+
+    finally:
+        o_pool.terminate()
+        o_pool.join()
+
+
+def _get_worker_pids(po_pool):
+    """
+    Function to get the process ids of the workers of a pool (an empty set for thread pools).
+    :rtype set[int]
+    """
+    return set([o_worker.pid for o_worker in po_pool._pool if isinstance(o_worker, multiprocessing.Process)])
+
+
+def _check_scan_tasks(po_pool, plo_tasks, psi_workers):
+    """
+    Function to find the failures of the tasks of scan_many(). Finished tasks are removed from plo_tasks and the
+    exception of a failed one is raised.
+
+    :param po_pool: Pool running the tasks.
+    :type po_pool: multiprocessing.pool.Pool
+
+    :param plo_tasks: Tasks sent to the pool.
+    :type plo_tasks: list[multiprocessing.pool.ApplyResult]
+
+    :param psi_workers: Process ids of the workers when the tasks were sent.
+    :type psi_workers: set[int]
+
+    :return: Nothing
+
+    :raise RuntimeError: When a worker process died.
+    """
+    for o_task in list(plo_tasks):
+        if o_task.ready():
+            plo_tasks.remove(o_task)
+            if not o_task.successful():
+                o_task.get()
+
+    if _get_worker_pids(po_pool) != psi_workers:
+        raise RuntimeError(u'A scan worker process died unexpectedly')
+
+
+def _get_file_type(pu_file):
+    """
+    Function to get the type of a ROM file as used by scan_file().
+
+    :return: u'7z', u'zip', u'cue', u'dir' or u'raw'
+    :rtype unicode
+    """
+    if os.path.isdir(pu_file):
+        u_type = u'dir'
+    else:
+        u_type = pu_file.rpartition(u'.')[2].lower()
+        if u_type not in (u'7z', u'zip', u'cue'):
+            u_type = u'raw'
+
+    return u_type
+
+
+def _is_cacheable(pu_file):
+    """
+    Function to check whether the ROMset of a file can be stored in the persistent cache. Directories and .cue files
+    can't, because the files they include can be modified without modifying them.
+    """
+    return _get_file_type(pu_file) not in (u'dir', u'cue')
+
+
+def _get_scan_chunks(plu_files, pb_cache, pb_headers, pb_hashes):
+    """
+    Generator to group the files to scan in the chunks processed by each task of scan_many(). 7z files listed with the
+    command line tool are grouped in bigger batches because each batch runs a single 7z process.
+
+    Files found in the cache are not grouped but returned immediately as a final result.
+
+    :return: A chunk of files to scan and None, or None and the result (u_file, o_romset, None) of a cached file.
+    :rtype collections.Iterable[(list[unicode], tuple)]
+    """
+    lu_7z_files = []
+    lu_files = []
+
+    for u_file in plu_files:
+        u_type = _get_file_type(u_file)
+
+        o_romset = None
+        if pb_cache and _is_cacheable(u_file):
+            o_romset = _get_cached_romset(u_file, pb_headers, pb_hashes)
+
+        if o_romset is not None:
+            yield None, (u_file, o_romset, None)
+
+        elif (not pb_headers) and (not pb_hashes) and (u_type == u'7z'):
+            lu_7z_files.append(u_file)
+            if len(lu_7z_files) >= i_7Z_BATCH:
+                yield lu_7z_files, None
+                lu_7z_files = []
+        else:
+            lu_files.append(u_file)
+            if len(lu_files) >= _i_SCAN_CHUNK:
+                yield lu_files, None
+                lu_files = []
+
+    for lu_chunk in (lu_7z_files, lu_files):
+        if lu_chunk:
+            yield lu_chunk, None
+
+
+def _scan_chunk(plu_files, pb_headers=False, pb_hashes=False):
+    """
+    Function to scan a chunk of files inside a worker of scan_many(). Errors are returned instead of raised, so one bad
+    file doesn't stop the rest.
+
+    :return: A list [(u_file, o_romset, u_error), ...]
+    :rtype list[(unicode, _RomSet, unicode)]
+    """
+    ltx_results = []
+
+    if (not pb_headers) and (not pb_hashes) and (_get_file_type(plu_files[0]) == u'7z'):
+        try:
+            for u_file, o_romset in scan_7z_files(plu_files, pb_cache=False):
+                if o_romset is None:
+                    ltx_results.append((u_file, None, u'Cannot open file as 7z archive'))
+                else:
+                    ltx_results.append((u_file, o_romset, None))
+
+        except Exception as o_exception:
+            u_error = u'%s' % o_exception
+            su_done = set([tx_result[0] for tx_result in ltx_results])
+            for u_file in plu_files:
+                if u_file not in su_done:
+                    ltx_results.append((u_file, None, u_error))
+
+    else:
+        for u_file in plu_files:
+            try:
+                o_romset = scan_file(u_file, pb_cache=False, pb_headers=pb_headers, pb_hashes=pb_hashes)
+                ltx_results.append((u_file, o_romset, None))
+            except Exception as o_exception:
+                ltx_results.append((u_file, None, u'%s' % o_exception))
+
+    return ltx_results
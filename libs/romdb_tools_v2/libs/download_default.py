@@ -4,6 +4,7 @@ import urllib2
 from PIL import Image
 
 from common_libs import files
+import downloads
 
 
 # Constants
@@ -35,15 +36,12 @@ class Downloader(object):
         b_download = False
 
         try:
-            o_data = urllib2.urlopen(pu_url).read()
+            o_response = urllib2.urlopen(pu_url)
         except (urllib2.HTTPError, AttributeError):
-            o_data = None
+            o_response = None
 
-        if o_data is not None:
-            with open(pu_local_path, 'wb') as o_file:
-                o_data = urllib2.urlopen(pu_url).read()
-                o_file.write(o_data)
-                b_download = True
+        if o_response is not None:
+            b_download = downloads.save_response(o_response, pu_local_path) == 'downloaded'
 
         return b_download
 
@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+
+"""
+Library with HTTP download helpers for ROMdb images.
+"""
+
+import codecs
+import json
+import os
+import sys
+import tempfile
+import urllib2
+
+
+# Constants
+#=======================================================================================================================
+# Name of the sidecar file, stored in the root of the images directory, that keeps the HTTP validators of each image
+u_INDEX_FILE = u'.romdb_validators.json'
+
+# Number of changes after which the validator index is saved to disk, so an interrupted run doesn't lose all of them
+i_INDEX_SAVE_EVERY = 50
+
+# Size of the blocks read from the network and written to disk
+i_CHUNK_SIZE = 64 * 1024
+
+# PNG files always start with a fixed signature and finish with an empty IEND chunk (length + type + CRC)
+s_PNG_SIGNATURE = '\x89PNG\r\n\x1a\n'
+s_PNG_IEND = '\x00\x00\x00\x00IEND\xaeB`\x82'
+
+
+# Classes
+#=======================================================================================================================
+class ValidatorIndex(object):
+    """
+    Class to store the HTTP validators (ETag and Last-Modified headers) of downloaded files so they can be revalidated
+    later with conditional requests instead of being downloaded again.
+
+    Paths are stored relative to the directory of the index file, so the whole images directory can be moved around
+    without losing the information. The index is saved to disk every pi_save_every changes; call save() at the end to
+    store the last ones.
+    """
+    def __init__(self, pu_file, pi_save_every=i_INDEX_SAVE_EVERY):
+        self.u_file = pu_file
+        self._u_root = os.path.dirname(pu_file)
+        self._dlu_entries = {}
+        self._b_modified = False
+        self._i_changes = 0
+        self._i_save_every = pi_save_every
+
+        self._load()
+
+    def __len__(self):
+        return len(self._dlu_entries)
+
+    def __str__(self):
+        return unicode(self).encode('utf8')
+
+    def __unicode__(self):
+        u_out = u'<ValidatorIndex>\n'
+        u_out += u'  .u_file:    %s\n' % self.u_file
+        u_out += u'  .i_entries: %i\n' % len(self)
+        return u_out
+
+    def _get_key(self, pu_path):
+        return os.path.relpath(pu_path, self._u_root).replace(os.sep, u'/')
+
+    def _load(self):
+        """
+        Method to load the index from disk. A missing or damaged index is simply considered empty; the only consequence
+        is that the next run will download the images again.
+        :return: Nothing
+        """
+        if os.path.isfile(self.u_file):
+            try:
+                with codecs.open(self.u_file, 'r', 'utf8') as o_file:
+                    self._dlu_entries = json.load(o_file)
+            except (IOError, ValueError):
+                self._dlu_entries = {}
+
+    def get(self, pu_path):
+        """
+        Method to get the validators stored for a local file.
+
+        :param pu_path: Path of the local file. e.g. u'/home/john/images/snt-crt/titles/Actraiser (Japan).png'
+        :type pu_path: unicode
+
+        :return: The ETag and the Last-Modified values, None when they are unknown.
+        :rtype unicode, unicode
+        """
+        lu_validators = self._dlu_entries.get(self._get_key(pu_path), (None, None))
+        return lu_validators[0], lu_validators[1]
+
+    def set(self, pu_path, pu_etag, pu_last_modified):
+        """
+        Method to store the validators of a local file. When the server doesn't provide any validator, the entry is
+        removed.
+
+        :param pu_path: Path of the local file.
+        :type pu_path: unicode
+
+        :param pu_etag: ETag header received from the server.
+        :type pu_etag: unicode, None
+
+        :param pu_last_modified: Last-Modified header received from the server.
+        :type pu_last_modified: unicode, None
+
+        :return: Nothing
+        """
+        if (pu_etag is None) and (pu_last_modified is None):
+            self.remove(pu_path)
+        else:
+            self._dlu_entries[self._get_key(pu_path)] = [pu_etag, pu_last_modified]
+            self._set_modified()
+
+    def remove(self, pu_path):
+        if self._dlu_entries.pop(self._get_key(pu_path), None) is not None:
+            self._set_modified()
+
+    def _set_modified(self):
+        self._b_modified = True
+        self._i_changes += 1
+        if self._i_save_every and (self._i_changes >= self._i_save_every):
+            self.save()
+
+    def save(self):
+        """
+        Method to save the index to disk. Nothing is written when the index hasn't changed.
+        :return: Nothing
+        """
+        if self._b_modified:
+            with codecs.open(self.u_file, 'w', 'utf8') as o_file:
+                json.dump(self._dlu_entries, o_file, ensure_ascii=False, sort_keys=True)
+            self._b_modified = False
+            self._i_changes = 0
+
+
+# Functions
+#=======================================================================================================================
+def conditional_urlopen(pu_url, pu_etag=None, pu_last_modified=None):
+    """
+    Function to open a URL using a conditional GET request. When validators are given, the server is asked to send the
+    file only if it changed.
+
+    :param pu_url: URL to open.
+    :type pu_url: unicode
+
+    :param pu_etag: ETag of the local copy of the file.
+    :type pu_etag: unicode, None
+
+    :param pu_last_modified: Last-Modified date of the local copy of the file.
+    :type pu_last_modified: unicode, None
+
+    :return: The response object, or None when the remote file didn't change (HTTP 304).
+    """
+    o_request = urllib2.Request(pu_url)
+    if pu_etag is not None:
+        o_request.add_header('If-None-Match', pu_etag)
+    if pu_last_modified is not None:
+        o_request.add_header('If-Modified-Since', pu_last_modified)
+
+    try:
+        o_response = urllib2.urlopen(o_request)
+    except urllib2.HTTPError as o_error:
+        if o_error.code == 304:
+            o_response = None
+        else:
+            raise
+
+    return o_response
+
+
+def get_validators(po_response):
+    """
+    Function to get the validators (ETag and Last-Modified headers) from a response.
+
+    :param po_response: Response object returned by urllib2.urlopen().
+
+    :return: The ETag and the Last-Modified values, None when they are not present.
+    :rtype unicode, unicode
+    """
+    o_headers = po_response.info()
+    return o_headers.getheader('ETag'), o_headers.getheader('Last-Modified')
+
+
+def save_response(po_response, pu_destination):
+    """
+    Function to save the body of a response to disk.
+
+    The data is streamed in small chunks to a temporary file in the destination directory, so memory usage doesn't
+    depend on the size of the file. Only when the whole body has been received and verified (against Content-Length
+    header and, for PNG images, the final IEND chunk) the temporary file replaces the destination. That way, an
+    interrupted download never leaves a truncated file that would look complete to later runs.
+
+    :param po_response: Response object returned by urllib2.urlopen().
+
+    :param pu_destination: Path of the file to write. e.g. u'/home/john/images/snt-crt/titles/Actraiser (Japan).png'
+    :type pu_destination: unicode
+
+    :return: 'downloaded', 'download_error' (incomplete or corrupt data) or 'write_error'.
+    :rtype str
+    """
+    try:
+        i_expected = int(po_response.info().getheader('Content-Length'))
+    except (TypeError, ValueError):
+        i_expected = None
+
+    try:
+        i_fd, u_tmp_file = tempfile.mkstemp(prefix=u'.', suffix=u'.part', dir=os.path.dirname(pu_destination))
+    except (IOError, OSError):
+        return 'write_error'
+
+    s_result = 'downloaded'
+    i_received = 0
+    s_head = ''
+    s_tail = ''
+
+    # Errors closing the file (e.g. a full disk only noticed when the buffer is flushed) must be caught as well, so
+    # the file is closed inside the try block instead of leaving it to a with statement.
+    o_file = os.fdopen(i_fd, 'wb')
+    try:
+        while True:
+            try:
+                s_chunk = po_response.read(i_CHUNK_SIZE)
+            except IOError:
+                s_result = 'download_error'
+                break
+
+            if not s_chunk:
+                break
+
+            if i_received < len(s_PNG_SIGNATURE):
+                s_head = (s_head + s_chunk)[:len(s_PNG_SIGNATURE)]
+            s_tail = (s_tail + s_chunk)[-len(s_PNG_IEND):]
+            i_received += len(s_chunk)
+
+            o_file.write(s_chunk)
+
+        # The data must be on disk before the temporary file replaces the destination
+        if s_result == 'downloaded':
+            o_file.flush()
+            os.fsync(o_file.fileno())
+        o_file.close()
+    except (IOError, OSError):
+        s_result = 'write_error'
+        try:
+            o_file.close()
+        except (IOError, OSError):
+            pass
+
+    # Verification of the received data
+    #-----------------------------------
+    if s_result == 'downloaded':
+        if (i_expected is not None) and (i_received != i_expected):
+            s_result = 'download_error'
+        elif (s_head == s_PNG_SIGNATURE) and (s_tail != s_PNG_IEND):
+            s_result = 'download_error'
+
+    if s_result == 'downloaded':
+        try:
+            _replace(u_tmp_file, pu_destination)
+        except OSError:
+            s_result = 'write_error'
+
+    if s_result != 'downloaded':
+        try:
+            os.remove(u_tmp_file)
+        except OSError:
+            pass
+
+    return s_result
+
+
+# Helper functions
+#=======================================================================================================================
+def _replace(pu_src, pu_dst):
+    """
+    Function to rename a file overwriting the destination if it exists. On POSIX systems os.rename() already does it
+    atomically, but Windows refuses to rename over an existing file so it has to be removed first.
+    """
+    if (sys.platform == 'win32') and os.path.isfile(pu_dst):
+        os.remove(pu_dst)
+    os.rename(pu_src, pu_dst)
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+
+"""
+Library to check the integrity of downloaded images (PNG and JPEG) without decoding their pixels.
+"""
+
+import os
+import struct
+import zlib
+
+
+# Constants
+#=======================================================================================================================
+s_PNG_SIGNATURE = '\x89PNG\r\n\x1a\n'
+s_JPEG_SOI = '\xff\xd8'
+s_JPEG_EOI = '\xff\xd9'
+
+# Extensions of the image files to check
+tu_IMAGE_EXTS = (u'png', u'jpg', u'jpeg')
+
+# Sub-directories where images are stored inside each platform directory (see romdb_screenshot_downloader.pyw)
+tu_IMAGE_DIRS = (u'titles', u'ingame')
+
+# PNG chunks can't be longer than 2^31 - 1 bytes
+_i_PNG_MAX_CHUNK = 0x7fffffff
+
+
+# Functions
+#=======================================================================================================================
+def check_image(pu_file):
+    """
+    Function to check the integrity of an image file. The type of the image is identified by its content and not by its
+    extension, so a JPEG saved as .png is still properly checked.
+
+    :param pu_file: Path of the image. e.g. u'/home/john/images/snt-crt/titles/Actraiser (Japan).png'
+    :type pu_file: unicode
+
+    :return: The path of the image and the error found, None when the image is correct.
+    :rtype unicode, unicode
+    """
+    try:
+        with open(pu_file, 'rb') as o_file:
+            s_signature = o_file.read(len(s_PNG_SIGNATURE))
+            o_file.seek(0)
+
+            if s_signature == s_PNG_SIGNATURE:
+                u_error = _check_png(o_file)
+            elif s_signature.startswith(s_JPEG_SOI):
+                u_error = _check_jpeg(o_file)
+            elif not s_signature:
+                u_error = u'Empty file'
+            else:
+                u_error = u'Unknown image format'
+
+    except (IOError, OSError) as o_error:
+        u_error = u'Read error: %s' % o_error
+
+    return pu_file, u_error
+
+
+def get_image_files(pu_root):
+    """
+    Generator to obtain all the images stored in a screenshots directory with the structure <platform>/titles and
+    <platform>/ingame.
+
+    :param pu_root: Root of the screenshots. e.g. u'/home/john/images'
+    :type pu_root: unicode
+
+    :return: The paths of the images.
+    :rtype collections.Iterable[unicode]
+    """
+    for u_dir, lu_dirs, lu_files in os.walk(pu_root):
+        lu_dirs.sort()
+
+        if os.path.basename(u_dir) not in tu_IMAGE_DIRS:
+            continue
+
+        for u_file in sorted(lu_files):
+            if u_file.rpartition(u'.')[2].lower() in tu_IMAGE_EXTS:
+                yield os.path.join(u_dir, u_file)
+
+
+# Helper functions
+#=======================================================================================================================
+def _check_png(po_file):
+    """
+    Function to check the structure of a PNG file. Every chunk is read and its CRC is verified, but the image data is
+    never decompressed.
+
+    :param po_file: File object positioned at the beginning of the PNG.
+
+    :return: The description of the error found, None when the file is correct.
+    :rtype unicode, None
+    """
+    po_file.seek(len(s_PNG_SIGNATURE))
+
+    i_chunk = 0
+    u_error = None
+    b_iend = False
+
+    while not b_iend:
+        s_chunk_head = po_file.read(8)
+        if len(s_chunk_head) < 8:
+            u_error = u'Truncated file, IEND chunk not found'
+            break
+
+        i_length, s_type = struct.unpack('>I4s', s_chunk_head)
+        if i_length > _i_PNG_MAX_CHUNK:
+            u_error = u'Invalid length for chunk #%i' % i_chunk
+            break
+
+        if (i_chunk == 0) and (s_type != 'IHDR'):
+            u_error = u'First chunk is not IHDR'
+            break
+
+        s_data = po_file.read(i_length)
+        s_crc = po_file.read(4)
+        if (len(s_data) < i_length) or (len(s_crc) < 4):
+            u_error = u'Truncated file, chunk #%i "%s" incomplete' % (i_chunk, s_type.decode('latin1'))
+            break
+
+        i_crc = zlib.crc32(s_data, zlib.crc32(s_type)) & 0xffffffff
+        if i_crc != struct.unpack('>I', s_crc)[0]:
+            u_error = u'Bad CRC in chunk #%i "%s"' % (i_chunk, s_type.decode('latin1'))
+            break
+
+        b_iend = (s_type == 'IEND')
+        i_chunk += 1
+
+    return u_error
+
+
+def _check_jpeg(po_file):
+    """
+    Function to check the structure of a JPEG file. The segments of the header are walked until the start of the image
+    data and then the end of image marker is checked at the end of the file.
+
+    :param po_file: File object positioned at the beginning of the JPEG.
+
+    :return: The description of the error found, None when the file is correct.
+    :rtype unicode, None
+    """
+    po_file.seek(len(s_JPEG_SOI))
+
+    u_error = None
+    b_sos = False
+
+    while not b_sos:
+        s_marker = po_file.read(2)
+        if len(s_marker) < 2:
+            u_error = u'Truncated file, image data not found'
+            break
+
+        if s_marker[0] != '\xff':
+            u_error = u'Invalid segment marker at byte %i' % (po_file.tell() - 2)
+            break
+
+        # Markers can be preceded by any number of 0xff fill bytes
+        if s_marker[1] == '\xff':
+            po_file.seek(-1, os.SEEK_CUR)
+            continue
+
+        # Stand-alone markers (TEM and RSTn) don't have any payload
+        if (s_marker[1] == '\x01') or ('\xd0' <= s_marker[1] <= '\xd7'):
+            continue
+
+        s_length = po_file.read(2)
+        if len(s_length) < 2:
+            u_error = u'Truncated file, segment incomplete'
+            break
+
+        i_length = struct.unpack('>H', s_length)[0]
+        if i_length < 2:
+            u_error = u'Invalid segment length at byte %i' % (po_file.tell() - 2)
+            break
+
+        po_file.seek(i_length - 2, os.SEEK_CUR)
+        b_sos = (s_marker[1] == '\xda')
+
+    if u_error is None:
+        po_file.seek(0, os.SEEK_END)
+        i_size = po_file.tell()
+        po_file.seek(max(0, i_size - 2))
+        if po_file.read(2) != s_JPEG_EOI:
+            u_error = u'Truncated file, EOI marker not found'
+
+    return u_error
@@ -0,0 +1,29 @@
+"""
+Library to decode json data with the fastest decoder available. ujson (https://pypi.org/project/ujson/) is several times
+faster than the json module of the standard library, so it's used when installed. Otherwise, the standard library is
+used.
+"""
+
+try:
+    import ujson as _json
+    u_DECODER = u'ujson'
+except ImportError:
+    import json as _json
+    u_DECODER = u'json'
+
+
+# Functions
+#=======================================================================================================================
+def decode(ps_data):
+    """
+    Function to decode json data. The data is decoded straight from the bytes received (utf8 encoded), without building
+    an intermediate unicode string first.
+
+    :param ps_data: Json data. e.g. '{"s_romset_title": "Actraiser (Japan)"}'
+    :type ps_data: str
+
+    :return: The decoded data.
+
+    :raise ValueError: When the data is not valid json.
+    """
+    return _json.loads(ps_data)
@@ -0,0 +1,162 @@
+"""
+Library with a small thread-safe LRU (least recently used) cache for the results of slow functions, like queries to
+ROMdb.
+"""
+
+import collections
+import threading
+
+
+# Classes
+#=======================================================================================================================
+class LruCache(object):
+    """
+    Class to store a limited number of computed values. When the cache is full, the least recently used value is
+    discarded.
+
+    Computations are single-flight: when several threads ask for the same missing key at the same time, only the first
+    one computes the value and the rest wait for it and get the same result (or the same exception).
+
+    :ivar i_size: Maximum number of values stored.
+    :ivar i_hits: Number of requests answered without computing the value (including the ones waiting for another
+                  thread computing it).
+    :ivar i_misses: Number of requests that had to compute the value.
+    """
+    def __init__(self, pi_size):
+        self.i_size = pi_size
+        self.i_hits = 0
+        self.i_misses = 0
+
+        self._dx_entries = collections.OrderedDict()
+        self._do_flights = {}
+        self._o_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._dx_entries)
+
+    def __str__(self):
+        return unicode(self).encode('utf8')
+
+    def __unicode__(self):
+        u_out = u'<LruCache>\n'
+        u_out += u'  .i_size:   %i\n' % self.i_size
+        u_out += u'  .i_len:    %i\n' % len(self)
+        u_out += u'  .i_hits:   %i\n' % self.i_hits
+        u_out += u'  .i_misses: %i\n' % self.i_misses
+        return u_out
+
+    def _store(self, px_key, px_value):
+        """
+        Method to store a value, discarding the oldest ones if needed. The lock must be already acquired.
+        """
+        self._dx_entries.pop(px_key, None)
+        self._dx_entries[px_key] = px_value
+        while len(self._dx_entries) > self.i_size:
+            self._dx_entries.popitem(last=False)
+
+    def clear(self):
+        """
+        Method to remove all the values and reset the counters.
+        :return: Nothing
+        """
+        with self._o_lock:
+            self._dx_entries.clear()
+            self.i_hits = 0
+            self.i_misses = 0
+
+    def get(self, px_key, pf_compute, *px_args):
+        """
+        Method to get a value from the cache, computing it when it's not present.
+
+        :param px_key: Key of the value. It must be hashable.
+
+        :param pf_compute: Function to compute the value.
+
+        :param px_args: Arguments for pf_compute.
+
+        :return: The value.
+        """
+        with self._o_lock:
+            if px_key in self._dx_entries:
+                self.i_hits += 1
+                x_value = self._dx_entries.pop(px_key)
+                self._dx_entries[px_key] = x_value
+                return x_value
+
+            o_flight = self._do_flights.get(px_key)
+            b_owner = o_flight is None
+            if b_owner:
+                self.i_misses += 1
+                o_flight = _Flight()
+                self._do_flights[px_key] = o_flight
+            else:
+                self.i_hits += 1
+
+        if b_owner:
+            try:
+                o_flight.x_value = pf_compute(*px_args)
+            except Exception as o_exception:
+                o_flight.o_error = o_exception
+
+            with self._o_lock:
+                if o_flight.o_error is None:
+                    self._store(px_key, o_flight.x_value)
+                del self._do_flights[px_key]
+
+            o_flight.o_done.set()
+
+        else:
+            o_flight.o_done.wait()
+
+        if o_flight.o_error is not None:
+            raise o_flight.o_error
+
+        return o_flight.x_value
+
+    def lookup(self, px_key):
+        """
+        Method to check whether a value is already stored, without computing it.
+
+        :param px_key: Key of the value.
+
+        :return: Whether the value was found and the value itself (None when not found).
+        :rtype bool, x
+        """
+        with self._o_lock:
+            if px_key in self._dx_entries:
+                self.i_hits += 1
+                x_value = self._dx_entries.pop(px_key)
+                self._dx_entries[px_key] = x_value
+                b_found = True
+            else:
+                x_value = None
+                b_found = False
+
+        return b_found, x_value
+
+    def put(self, px_key, px_value, pb_replace=True):
+        """
+        Method to store a value computed somewhere else.
+
+        :param px_key: Key of the value.
+
+        :param px_value: Value to store.
+
+        :param pb_replace: Whether an already stored value will be replaced.
+        :type pb_replace: bool
+
+        :return: Nothing
+        """
+        with self._o_lock:
+            if pb_replace or (px_key not in self._dx_entries):
+                self._store(px_key, px_value)
+
+
+class _Flight(object):
+    """
+    Class to store the state of a value being computed by one thread while other threads wait for it.
+    """
+    def __init__(self):
+        self.o_done = threading.Event()
+        self.x_value = None
+        self.o_error = None
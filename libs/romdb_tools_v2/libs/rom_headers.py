@@ -0,0 +1,141 @@
+"""
+Library to detect and skip the headers added to some ROM dumps (iNES and FDS headers, Lynx headers and SNES copier
+headers). ROMdb, like No-Intro, identifies those ROMs by the CRC32 of the data without the header, so it can't be read
+from the CRC32 stored in a compressed file and it must be computed again from the data.
+
+All the functions work over streams of data read in small chunks, so big files are never fully loaded in memory.
+"""
+
+import zlib
+
+
+# Constants
+#=======================================================================================================================
+# Size of the blocks of data read
+i_CHUNK_SIZE = 1024 * 1024
+
+# Headers identified by their first bytes: (signature, header size)
+ttx_MAGIC_HEADERS = (('NES\x1a', 16),           # iNES and NES 2.0
+                     ('FDS\x1a', 16),           # fwNES Famicom Disk System
+                     ('LYNX\x00', 64))          # Atari Lynx (Handy)
+
+# SNES copier headers don't have any signature. They are 512 bytes long, so the size of the file is 512 bytes over a
+# multiple of 1 KB. Only files with SNES extensions are checked to avoid false positives in other platforms.
+tu_SNES_EXTS = (u'sfc', u'smc', u'swc', u'fig')
+i_SNES_HEADER_SIZE = 512
+
+# Number of bytes needed to identify any header
+_i_HEAD_SIZE = 512
+
+
+# Functions
+#=======================================================================================================================
+def get_header_size(ps_head, pi_size, pu_name):
+    """
+    Function to get the size of the header of a ROM.
+
+    :param ps_head: First bytes of the ROM (at least 512 bytes unless the ROM is smaller).
+    :type ps_head: str
+
+    :param pi_size: Total size of the ROM.
+    :type pi_size: int
+
+    :param pu_name: Name of the ROM file. e.g. u'Actraiser (Japan).smc'
+    :type pu_name: unicode
+
+    :return: The size of the header, 0 when the ROM doesn't have any.
+    :rtype int
+    """
+    i_header = 0
+
+    for s_magic, i_size in ttx_MAGIC_HEADERS:
+        if ps_head.startswith(s_magic) and (pi_size >= i_size):
+            i_header = i_size
+            break
+
+    else:
+        if (pu_name.rpartition(u'.')[2].lower() in tu_SNES_EXTS) and (pi_size % 1024 == i_SNES_HEADER_SIZE):
+            i_header = i_SNES_HEADER_SIZE
+
+    return i_header
+
+
+def clean_crc32(piss_chunks, pi_size, pu_name, plo_hashes=()):
+    """
+    Function to compute the CRC32 of a ROM without its header. The CRC32 is computed incrementally, chunk by chunk, so
+    only the first bytes of the ROM are kept in memory to identify the header.
+
+    :param piss_chunks: The data of the ROM, in chunks of any size (see read_chunks()). Buffer objects are valid too.
+    :type piss_chunks: collections.Iterable[str]
+
+    :param pi_size: Total size of the ROM.
+    :type pi_size: int
+
+    :param pu_name: Name of the ROM file.
+    :type pu_name: unicode
+
+    :param plo_hashes: Other hashlib objects to update with the same data. e.g. [hashlib.md5()]
+
+    :return: The CRC32 and the size of the data without the header.
+    :rtype int, int
+
+    :raise IOError: When the data is shorter than pi_size.
+    """
+    s_head = ''
+    i_header = None
+    i_crc32 = 0
+    i_read = 0
+
+    for s_chunk in piss_chunks:
+        i_read += len(s_chunk)
+
+        if i_header is None:
+            s_head += str(s_chunk)
+            if len(s_head) < min(_i_HEAD_SIZE, pi_size):
+                continue
+
+            i_header = get_header_size(s_head, pi_size, pu_name)
+            s_chunk = s_head[i_header:]
+            s_head = ''
+
+        i_crc32 = zlib.crc32(s_chunk, i_crc32)
+        for o_hash in plo_hashes:
+            o_hash.update(s_chunk)
+
+    if i_read < pi_size:
+        raise IOError(u'Truncated data for "%s", %i of %i bytes read' % (pu_name, i_read, pi_size))
+
+    # Files smaller than the identification block
+    if i_header is None:
+        i_header = get_header_size(s_head, pi_size, pu_name)
+        i_crc32 = zlib.crc32(s_head[i_header:])
+        for o_hash in plo_hashes:
+            o_hash.update(s_head[i_header:])
+
+    return i_crc32 & 0xffffffff, pi_size - i_header
+
+
+def read_chunks(po_file, pi_size=None):
+    """
+    Generator to read a file in chunks.
+
+    :param po_file: File object opened in binary mode.
+
+    :param pi_size: Number of bytes to read, None to read until the end of the file.
+    :type pi_size: int, None
+
+    :return: The chunks of data.
+    :rtype collections.Iterable[str]
+    """
+    i_left = pi_size
+
+    while (i_left is None) or (i_left > 0):
+        i_chunk = i_CHUNK_SIZE if i_left is None else min(i_CHUNK_SIZE, i_left)
+        s_chunk = po_file.read(i_chunk)
+        if not s_chunk:
+            break
+
+        if i_left is not None:
+            i_left -= len(s_chunk)
+
+        yield s_chunk
@@ -5,12 +5,47 @@
 _File to define the classes representing the contents of ROMdb website.
 """
 
+import weakref
+
 import string_operators
 
 
+# Constants
+# =======================================================================================================================
+# Version of the format produced by Version.to_dict(). Increase it whenever the format changes.
+i_DICT_FORMAT = 1
+
+# Keys of the ROMdb json only decoded when the matching property of a Version is accessed
+_ts_LAZY_KEYS = ('as_mdata_screen_titles', 's_mdata_differences', 'ao_sibling_versions', 'ao_parent_games')
+
+
+# Intern tables
+# =======================================================================================================================
+# Many versions share the same parent games and sagas. To avoid parsing and storing them again and again, they are
+# interned by their nid while any version uses them (see get_game(), get_saga() and clear_interned()). The tables only
+# keep weak references, so they don't grow beyond the games and sagas still in use.
+_do_games = weakref.WeakValueDictionary()
+_do_sagas = weakref.WeakValueDictionary()
+
+
 # Version classes
 # =======================================================================================================================
-class Version:
+class Version(object):
+    """
+    Class to store a version (a ROMset) of ROMdb.
+
+    Screen titles, differences, sibling versions and parent games are only parsed from the json data the first time
+    they are accessed. Most of the times just a few basic fields are needed and building the whole tree of objects for
+    every sibling and parent game would be a waste of time and memory. Only the raw json of those four fields is kept,
+    and each one is forgotten as soon as it's decoded.
+    """
+    __slots__ = ('u_dat_name', 'u_dat_version', 'u_dat_updated',
+                 'u_romset_platform', 'u_romset_title', 'u_romset_crc32', 'i_romset_size',
+                 'u_mdata_date', 'u_serial_number', 'lu_mdata_language_text', 'lu_mdata_language_voice',
+                 'lu_mdata_views', 'o_mdata_overscan', 'o_mdata_media', 'o_mdata_multiplayer', 'o_mdata_rating',
+                 'u_screenshot_title', 'u_screenshot_ingame',
+                 '_dx_lazy_json', '_o_mdata_screen_titles', '_lo_mdata_differences', '_lo_siblings', '_lo_parent_games')
+
     def __init__(self):
         self.u_dat_name = None
         self.u_dat_version = None
@@ -20,7 +55,6 @@ class Version:
         self.u_romset_crc32 = None
         self.i_romset_size = None
 
-        self.o_mdata_screen_titles = _ScreenTitles()
         self.u_mdata_date = None
         self.u_serial_number = None
         self.lu_mdata_language_text = []
@@ -30,14 +64,24 @@ class Version:
         self.o_mdata_media = None
         self.o_mdata_multiplayer = None
         self.o_mdata_rating = None
-        self.lo_mdata_differences = None
-
-        self.lo_siblings = []
-        self.lo_parent_games = []
 
         self.u_screenshot_title = None
         self.u_screenshot_ingame = None
 
+        # Lazy properties, built from the json data when accessed for the first time
+        self._dx_lazy_json = None
+        self._o_mdata_screen_titles = None
+        self._lo_mdata_differences = None
+        self._lo_siblings = None
+        self._lo_parent_games = None
+
+    def __getstate__(self):
+        return self.to_dict()
+
+    def __setstate__(self, pdx_state):
+        self.__init__()
+        self.from_dict(pdx_state)
+
     def __str__(self):
         return unicode(self).encode('utf8')
 
@@ -91,34 +135,196 @@ class Version:
             pass
 
         self.o_mdata_overscan = _Overscan(pdx_json['s_mdata_overscan'])
-
-        for u_entry in pdx_json['as_mdata_screen_titles']:
-            self.o_mdata_screen_titles.add_title(u_entry)
-
         self.u_mdata_date = pdx_json['s_mdata_date']
         self.o_mdata_media = _Media(pdx_json['s_mdata_media_type'], pdx_json['i_mdata_media_number'])
         self.o_mdata_multiplayer = _Multiplayer(pdx_json['ai_mdata_players'], pdx_json['as_mdata_multiplayer'])
         self.o_mdata_rating = _Rating(pdx_json['f_mdata_rating_value'], pdx_json['i_mdata_rating_votes'])
-        self.lo_mdata_differences = _Differences(pdx_json['s_mdata_differences'])
         self.lu_mdata_language_text = pdx_json['as_mdata_lang_text']
         self.lu_mdata_language_voice = pdx_json['as_mdata_lang_voice']
         self.lu_mdata_views = pdx_json['as_mdata_views']
         self.u_screenshot_title = pdx_json['s_screenshot_title']
         self.u_screenshot_ingame = pdx_json['s_screenshot_ingame']
 
-        # Siblings
-        #---------
-        for dx_entry in pdx_json['ao_sibling_versions']:
-            o_sibling_version = Version()
-            o_sibling_version.from_json(dx_entry)
-            self.lo_siblings.append(o_sibling_version)
+        # Screen titles, differences, siblings and parent games are parsed later, on demand. Only their raw json is kept
+        # (not the whole json of the version) and a missing key is still detected here.
+        self._dx_lazy_json = {}
+        for s_key in _ts_LAZY_KEYS:
+            self._dx_lazy_json[s_key] = pdx_json[s_key]
+
+        self._o_mdata_screen_titles = None
+        self._lo_mdata_differences = None
+        self._lo_siblings = None
+        self._lo_parent_games = None
+
+    def _has_lazy_json(self, ps_key):
+        return (self._dx_lazy_json is not None) and (ps_key in self._dx_lazy_json)
+
+    def _pop_lazy_json(self, ps_key):
+        """
+        Method to get the raw json of a lazy property and forget it, so it's not kept in memory together with the
+        decoded objects. Once all the lazy properties are decoded, the json data is dropped completely.
+
+        :param ps_key: Key of the lazy property in the ROMdb json.
+        :type ps_key: str
+
+        :return: The raw json of the property, or None if there is nothing to decode.
+        """
+        x_json = None
+        if self._dx_lazy_json is not None:
+            x_json = self._dx_lazy_json.pop(ps_key, None)
+            if not self._dx_lazy_json:
+                self._dx_lazy_json = None
+
+        return x_json
+
+    def _get_mdata_screen_titles(self):
+        if self._o_mdata_screen_titles is None:
+            self._o_mdata_screen_titles = _ScreenTitles()
+            for u_entry in self._pop_lazy_json('as_mdata_screen_titles') or []:
+                self._o_mdata_screen_titles.add_title(u_entry)
 
-        # Parent Games
-        #-------------
-        for dx_entry in pdx_json['ao_parent_games']:
-            o_parent_game = Game()
-            o_parent_game.from_json(dx_entry)
-            self.lo_parent_games.append(o_parent_game)
+        return self._o_mdata_screen_titles
+
+    def _set_mdata_screen_titles(self, po_screen_titles):
+        self._pop_lazy_json('as_mdata_screen_titles')
+        self._o_mdata_screen_titles = po_screen_titles
+
+    def _get_mdata_differences(self):
+        if (self._lo_mdata_differences is None) and self._has_lazy_json('s_mdata_differences'):
+            self._lo_mdata_differences = _Differences(self._pop_lazy_json('s_mdata_differences'))
+
+        return self._lo_mdata_differences
+
+    def _set_mdata_differences(self, po_differences):
+        self._pop_lazy_json('s_mdata_differences')
+        self._lo_mdata_differences = po_differences
+
+    def _get_siblings(self):
+        if self._lo_siblings is None:
+            self._lo_siblings = []
+            for dx_entry in self._pop_lazy_json('ao_sibling_versions') or []:
+                o_sibling_version = Version()
+                o_sibling_version.from_json(dx_entry)
+                self._lo_siblings.append(o_sibling_version)
+
+        return self._lo_siblings
+
+    def _set_siblings(self, plo_siblings):
+        self._pop_lazy_json('ao_sibling_versions')
+        self._lo_siblings = plo_siblings
+
+    def _get_parent_games(self):
+        if self._lo_parent_games is None:
+            ldx_entries = self._pop_lazy_json('ao_parent_games') or []
+            self._lo_parent_games = tuple([get_game(dx_entry) for dx_entry in ldx_entries])
+
+        return self._lo_parent_games
+
+    def _set_parent_games(self, plo_parent_games):
+        self._pop_lazy_json('ao_parent_games')
+        self._lo_parent_games = plo_parent_games
+
+    def to_json(self):
+        """
+        Method to build the ROMdb json data of the Version, the opposite of from_json(). The data is built from the
+        current values of the object, but sibling versions and parent games that haven't been accessed yet are just
+        copied from the original json instead of being parsed and rebuilt.
+
+        :return: The json data of the Version.
+        :rtype dict
+        """
+        dx_json = {
+            's_dat_name': self.u_dat_name,
+            's_dat_version': self.u_dat_version,
+            's_dat_outdated': self.u_dat_updated,
+            's_romset_platform': self.u_romset_platform,
+            's_romset_title': self.u_romset_title,
+            's_romset_crc32': self.u_romset_crc32,
+            'i_romset_size': self.i_romset_size,
+            's_mdata_overscan': None,
+            's_mdata_date': self.u_mdata_date,
+            's_mdata_media_type': None,
+            'i_mdata_media_number': None,
+            'ai_mdata_players': [],
+            'as_mdata_multiplayer': [],
+            'f_mdata_rating_value': None,
+            'i_mdata_rating_votes': None,
+            'as_mdata_lang_text': self.lu_mdata_language_text,
+            'as_mdata_lang_voice': self.lu_mdata_language_voice,
+            'as_mdata_views': self.lu_mdata_views,
+            's_screenshot_title': self.u_screenshot_title,
+            's_screenshot_ingame': self.u_screenshot_ingame,
+            }
+
+        if self.o_mdata_overscan is not None:
+            dx_json['s_mdata_overscan'] = self.o_mdata_overscan.to_oneline()
+
+        if self.o_mdata_media is not None:
+            dx_json['s_mdata_media_type'] = self.o_mdata_media.u_type
+            dx_json['i_mdata_media_number'] = self.o_mdata_media.i_number
+
+        if self.o_mdata_multiplayer is not None:
+            dx_json['ai_mdata_players'] = self.o_mdata_multiplayer.lu_players
+            dx_json['as_mdata_multiplayer'] = self.o_mdata_multiplayer.lu_multiplayer_type
+
+        if self.o_mdata_rating is not None:
+            dx_json['f_mdata_rating_value'] = self.o_mdata_rating.f_average
+            dx_json['i_mdata_rating_votes'] = self.o_mdata_rating.i_votes
+
+        # Lazy properties
+        #----------------
+        if self._has_lazy_json('as_mdata_screen_titles'):
+            dx_json['as_mdata_screen_titles'] = self._dx_lazy_json['as_mdata_screen_titles']
+        else:
+            dx_json['as_mdata_screen_titles'] = self.o_mdata_screen_titles.to_list()
+
+        if self._has_lazy_json('s_mdata_differences'):
+            dx_json['s_mdata_differences'] = self._dx_lazy_json['s_mdata_differences']
+        elif self._lo_mdata_differences is None:
+            dx_json['s_mdata_differences'] = None
+        else:
+            dx_json['s_mdata_differences'] = unicode(self._lo_mdata_differences)
+
+        if self._has_lazy_json('ao_sibling_versions'):
+            dx_json['ao_sibling_versions'] = self._dx_lazy_json['ao_sibling_versions']
+        else:
+            dx_json['ao_sibling_versions'] = [o_sibling.to_json() for o_sibling in self.lo_siblings]
+
+        if self._has_lazy_json('ao_parent_games'):
+            dx_json['ao_parent_games'] = self._dx_lazy_json['ao_parent_games']
+        else:
+            dx_json['ao_parent_games'] = [o_game.to_json() for o_game in self.lo_parent_games]
+
+        return dx_json
+
+    def to_dict(self):
+        """
+        Method to serialise the Version to a dictionary made only of basic types (so it can be stored as json, msgpack,
+        pickle...). The dictionary includes the version of the format so old serialisations can be detected.
+
+        :return: The serialised Version.
+        :rtype dict
+        """
+        return {'i_format': i_DICT_FORMAT, 'dx_version': self.to_json()}
+
+    def from_dict(self, pdx_dict):
+        """
+        Method to load the data serialised by to_dict().
+
+        :param pdx_dict: Serialised Version.
+        :type pdx_dict: dict
+
+        :return: Nothing
+        """
+        if pdx_dict.get('i_format') != i_DICT_FORMAT:
+            raise ValueError('Invalid Version serialisation format "%s"' % pdx_dict.get('i_format'))
+
+        self.from_json(pdx_dict['dx_version'])
+
+    o_mdata_screen_titles = property(fget=_get_mdata_screen_titles, fset=_set_mdata_screen_titles)
+    lo_mdata_differences = property(fget=_get_mdata_differences, fset=_set_mdata_differences)
+    lo_siblings = property(fget=_get_siblings, fset=_set_siblings)
+    lo_parent_games = property(fget=_get_parent_games, fset=_set_parent_games)
 
     def nice_text(self, ps_format='short'):
         if ps_format == 'short':
@@ -198,7 +404,9 @@ class Version:
         return u_out
 
 
-class _Media:
+class _Media(object):
+    __slots__ = ('u_type', 'i_number')
+
     def __init__(self, pu_type, pi_number):
         self.u_type = pu_type
         self.i_number = pi_number
@@ -211,7 +419,9 @@ class _Media:
         return u_out
 
 
-class _Multiplayer:
+class _Multiplayer(object):
+    __slots__ = ('lu_players', 'lu_multiplayer_type')
+
     def __init__(self, plu_players, plu_multiplayer_type):
         self.lu_players = []
         self.lu_multiplayer_type = []
@@ -236,7 +446,9 @@ class _Multiplayer:
         return u_out
 
 
-class _Overscan:
+class _Overscan(object):
+    __slots__ = ('i_top', 'i_bottom', 'i_left', 'i_right')
+
     def __init__(self, pu_line):
         self.i_top = 0
         self.i_bottom = 0
@@ -273,11 +485,13 @@ class _Overscan:
         return u_out
 
 
-class _Rating:
+class _Rating(object):
     """
     Class to store a rating field
     """
 
+    __slots__ = ('f_average', 'i_votes')
+
     def __init__(self, pf_average, pi_votes):
         try:
             self.f_average = float(pf_average)
@@ -297,7 +511,9 @@ class _Rating:
         return u_out
 
 
-class _ScreenTitles:
+class _ScreenTitles(object):
+    __slots__ = ('_lo_titles',)
+
     def __init__(self):
         self._lo_titles = []
 
@@ -315,6 +531,12 @@ class _ScreenTitles:
         o_new_title = _ScreenTitle(pu_title)
         self._lo_titles.append(o_new_title)
 
+    def to_list(self):
+        lu_out = []
+        for o_screen_title in self._lo_titles:
+            lu_out.append(o_screen_title.to_oneline())
+        return lu_out
+
     def to_oneline(self, pi_indentation=0):
         lu_out = []
         for i_index, o_screen_title in enumerate(self._lo_titles):
@@ -326,7 +548,9 @@ class _ScreenTitles:
         return u'\n'.join(lu_out)
 
 
-class _ScreenTitle:
+class _ScreenTitle(object):
+    __slots__ = ('u_country', 'u_title_original', 'u_title_western')
+
     def __init__(self, pu_line):
         self.u_country = None  # Country where the title appears
         self.u_title_original = None  # Title written with original characters (kanjis, for example)
@@ -357,7 +581,9 @@ class _ScreenTitle:
         return u_line
 
 
-class _Differences:
+class _Differences(object):
+    __slots__ = ('lo_differences',)
+
     def __init__(self, pu_differences):
         self.lo_differences = []
 
@@ -389,7 +615,9 @@ class _Differences:
         return u'\n'.join(lu_lines)
 
 
-class _Difference:
+class _Difference(object):
+    __slots__ = ('u_type', 'u_description')
+
     def __init__(self, pu_difference):
         self.u_type = pu_difference[0]
         self.u_description = pu_difference[2:].strip()
@@ -404,25 +632,48 @@ class _Difference:
 
 # Game classes
 # =======================================================================================================================
-class Game:
+class Game(object):
+    """
+    Class to store a game of ROMdb. Games are shared by several versions (see get_game()), so genres and sagas are
+    stored as tuples to avoid modifying all of them at once by mistake.
+    """
+    __slots__ = ('i_nid', 'u_title', 'u_synopsis', 'u_years', 'lu_genres', 'lo_sagas', '__weakref__')
+
     def __init__(self):
         self.i_nid = u''
         self.u_title = u''
         self.u_synopsis = u''
         self.u_years = u''
-        self.lu_genres = []
-        self.lo_sagas = []
+        self.lu_genres = ()
+        self.lo_sagas = ()
 
     def from_json(self, pdx_json):
         self.i_nid = pdx_json['i_nid']
         self.u_title = pdx_json['s_title']
         self.u_years = pdx_json['s_years']
         self.u_synopsis = pdx_json['s_synopsis']
-        self.lu_genres = pdx_json['as_genres']
+        self.lu_genres = tuple(pdx_json['as_genres'])
+        self.lo_sagas = tuple([get_saga(dx_entry) for dx_entry in pdx_json['ao_sagas']])
 
-        for dx_entry in pdx_json['ao_sagas']:
-            o_saga = Saga(dx_entry)
-            self.lo_sagas.append(o_saga)
+    def to_json(self):
+        """
+        Method to build the ROMdb json data of the Game, the opposite of from_json().
+        :return:
+        :rtype dict
+        """
+        return {'i_nid': self.i_nid,
+                's_title': self.u_title,
+                's_years': self.u_years,
+                's_synopsis': self.u_synopsis,
+                'as_genres': list(self.lu_genres),
+                'ao_sagas': [o_saga.to_json() for o_saga in self.lo_sagas]}
+
+    def __getstate__(self):
+        return self.to_json()
+
+    def __setstate__(self, pdx_state):
+        self.__init__()
+        self.from_json(pdx_state)
 
     def nice_text(self, ps_format='short'):
         if ps_format == 'short':
@@ -454,7 +705,9 @@ class Game:
         return u_out
 
 
-class Saga:
+class Saga(object):
+    __slots__ = ('i_nid', 'u_title', 'u_synopsis', 'u_years', '__weakref__')
+
     def __init__(self, pdx_json):
         self.i_nid = None
         self.u_title = u'---'
@@ -469,6 +722,23 @@ class Saga:
         self.u_synopsis = pdx_json['s_synopsis']
         self.u_years = pdx_json['s_years']
 
+    def to_json(self):
+        """
+        Method to build the ROMdb json data of the Saga, the opposite of _from_json().
+        :return:
+        :rtype dict
+        """
+        return {'i_nid': self.i_nid,
+                's_title': self.u_title,
+                's_synopsis': self.u_synopsis,
+                's_years': self.u_years}
+
+    def __getstate__(self):
+        return self.to_json()
+
+    def __setstate__(self, pdx_state):
+        self._from_json(pdx_state)
+
     def nice_text(self, ps_format='short'):
         if ps_format == 'short':
             u_out = self._nice_text_short()
@@ -491,6 +761,63 @@ class Saga:
         return u_out
 
 
+# Functions
+# =======================================================================================================================
+def get_game(pdx_json):
+    """
+    Function to get the Game object for a ROMdb json. Games are interned by their nid, so the json of a game is only
+    parsed once while any version uses it and all the versions pointing to it share the same object. Because of that,
+    the returned object must be considered read-only.
+
+    :param pdx_json: Json data of the game.
+    :type pdx_json: dict
+
+    :return: The Game object.
+    :rtype Game
+    """
+    i_nid = pdx_json['i_nid']
+    o_game = _do_games.get(i_nid) if i_nid is not None else None
+    if o_game is None:
+        o_game = Game()
+        o_game.from_json(pdx_json)
+        if i_nid is not None:
+            _do_games[i_nid] = o_game
+
+    return o_game
+
+
+def get_saga(pdx_json):
+    """
+    Function to get the Saga object for a ROMdb json. Sagas are interned by their nid the same way games are (see
+    get_game()), so the returned object must be considered read-only.
+
+    :param pdx_json: Json data of the saga.
+    :type pdx_json: dict
+
+    :return: The Saga object.
+    :rtype Saga
+    """
+    i_nid = pdx_json['i_nid']
+    o_saga = _do_sagas.get(i_nid) if i_nid is not None else None
+    if o_saga is None:
+        o_saga = Saga(pdx_json)
+        if i_nid is not None:
+            _do_sagas[i_nid] = o_saga
+
+    return o_saga
+
+
+def clear_interned():
+    """
+    Function to empty the intern tables of games and sagas, so their data will be parsed again from the next answers of
+    ROMdb.
+
+    :return: Nothing
+    """
+    _do_games.clear()
+    _do_sagas.clear()
+
+
 # Helper Functions
 # =======================================================================================================================
 def _lines_indent(pu_start, plu_lines, pu_indent):
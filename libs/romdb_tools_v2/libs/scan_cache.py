@@ -0,0 +1,161 @@
+"""
+Library with a persistent cache of the contents of scanned ROM files (names, hashes and sizes of their ROMs), stored in
+a SQLite database. ROM libraries rarely change, so files whose path, size, modification time and inode didn't change
+since the last scan don't need to be opened again.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+
+import json_decoder
+
+
+# Constants
+#=======================================================================================================================
+# Default location of the cache
+u_DEFAULT_FILE = os.path.join(os.path.expanduser(u'~'), u'.cache', u'romdb_tools', u'scan_cache.sqlite')
+
+# Version of the database structure. Databases with a different version are emptied when opened.
+_i_FORMAT = 3
+
+# Number of changes after which they are automatically written to disk
+_i_COMMIT_EVERY = 1000
+
+
+# Classes
+#=======================================================================================================================
+class ScanCache(object):
+    """
+    Class to store the ROMs found in scanned files.
+
+    Entries are keyed by the absolute path of the file and validated against its size, modification time and inode
+    (always 0 on Windows), so a file replaced or modified in any way is scanned again. ROMsets with and without headers
+    (see rom_headers) are stored separately.
+
+    The same object can be used from several threads, but not from several processes.
+    """
+    def __init__(self, pu_file):
+        self.u_file = pu_file
+        self._i_changes = 0
+        self._o_lock = threading.Lock()
+
+        u_dir = os.path.dirname(pu_file)
+        if u_dir and not os.path.isdir(u_dir):
+            os.makedirs(u_dir)
+
+        self._o_db = sqlite3.connect(pu_file, check_same_thread=False)
+
+        if self._o_db.execute('PRAGMA user_version').fetchone()[0] != _i_FORMAT:
+            self._o_db.execute('DROP TABLE IF EXISTS files')
+            self._o_db.execute('PRAGMA user_version = %i' % _i_FORMAT)
+
+        self._o_db.execute('CREATE TABLE IF NOT EXISTS files ('
+                           'path TEXT NOT NULL, '
+                           'headers INTEGER NOT NULL, '
+                           'size INTEGER NOT NULL, '
+                           'mtime REAL NOT NULL, '
+                           'inode INTEGER NOT NULL, '
+                           'roms TEXT NOT NULL, '
+                           'PRIMARY KEY (path, headers))')
+        self._o_db.commit()
+
+    def __len__(self):
+        with self._o_lock:
+            return self._o_db.execute('SELECT COUNT(*) FROM files').fetchone()[0]
+
+    def __str__(self):
+        return unicode(self).encode('utf8')
+
+    def __unicode__(self):
+        u_out = u'<ScanCache>\n'
+        u_out += u'  .u_file:    %s\n' % self.u_file
+        u_out += u'  .i_entries: %i\n' % len(self)
+        return u_out
+
+    def close(self):
+        """
+        Method to write pending changes to disk and close the database.
+        :return: Nothing
+        """
+        with self._o_lock:
+            self._o_db.commit()
+            self._o_db.close()
+
+    def get(self, pu_file, pb_headers=False):
+        """
+        Method to get the ROMs stored for a file.
+
+        :param pu_file: Path of the file. e.g. u'/home/john/roms/Actraiser (Japan).zip'
+        :type pu_file: unicode
+
+        :param pb_headers: Whether to get the ROMs scanned without headers.
+        :type pb_headers: bool
+
+        :return: A list [(u_name, i_crc32, i_size, u_md5, u_sha1), ...], or None when the file is unknown, it changed or
+                 doesn't exist. MD5 and SHA1 hashes are None when they weren't computed.
+        :rtype list[(unicode, int, int, unicode, unicode)], None
+        """
+        try:
+            o_stat = os.stat(pu_file)
+        except OSError:
+            return None
+
+        with self._o_lock:
+            tx_row = self._o_db.execute('SELECT size, mtime, inode, roms FROM files WHERE path = ? AND headers = ?',
+                                        (os.path.abspath(pu_file), int(pb_headers))).fetchone()
+
+        if (tx_row is None) or (tx_row[0:3] != (o_stat.st_size, o_stat.st_mtime, o_stat.st_ino)):
+            return None
+
+        return [tuple(lx_rom) for lx_rom in json_decoder.decode(tx_row[3])]
+
+    def remove(self, pu_file):
+        with self._o_lock:
+            self._o_db.execute('DELETE FROM files WHERE path = ?', (os.path.abspath(pu_file),))
+            self._count_change()
+
+    def save(self):
+        """
+        Method to write pending changes to disk.
+        :return: Nothing
+        """
+        with self._o_lock:
+            self._o_db.commit()
+            self._i_changes = 0
+
+    def set(self, pu_file, pltx_roms, pb_headers=False):
+        """
+        Method to store the ROMs found in a file. The current size, modification time and inode of the file are stored
+        with them, so the file must exist.
+
+        :param pu_file: Path of the file.
+        :type pu_file: unicode
+
+        :param pltx_roms: A list [(u_name, i_crc32, i_size, u_md5, u_sha1), ...]
+        :type pltx_roms: list[(unicode, int, int, unicode, unicode)]
+
+        :param pb_headers: Whether the ROMs were scanned without headers.
+        :type pb_headers: bool
+
+        :return: Nothing
+        """
+        o_stat = os.stat(pu_file)
+
+        with self._o_lock:
+            self._o_db.execute('INSERT OR REPLACE INTO files (path, headers, size, mtime, inode, roms) '
+                               'VALUES (?, ?, ?, ?, ?, ?)',
+                               (os.path.abspath(pu_file), int(pb_headers), o_stat.st_size, o_stat.st_mtime,
+                                o_stat.st_ino, json.dumps(pltx_roms)))
+            self._count_change()
+
+    def _count_change(self):
+        """
+        Method to count a change and write the changes to disk when there are many of them. The lock must be already
+        acquired.
+        """
+        self._i_changes += 1
+        if self._i_changes >= _i_COMMIT_EVERY:
+            self._o_db.commit()
+            self._i_changes = 0
@@ -1,4 +1,5 @@
 import subprocess
+import tempfile
 
 
 class Command:
@@ -57,6 +58,68 @@ class Command:
             self.u_stdout = u_stdout.decode('utf8')
             self.u_stderr = u_stderr.decode('utf8')
 
+    def execute_lines(self):
+        """
+        Generator to execute the command and get its standard output line by line, as soon as it's produced, instead of
+        waiting for the command to finish. Lines are yielded without the line break and .u_stdout is not filled.
+        Standard error is buffered in a temporary file (so a chatty command can't block) and it's stored in .u_stderr
+        once all the output has been read.
+        :return:
+        """
+        if not self.b_executed:
+            self.b_executed = True
+            o_stderr = tempfile.TemporaryFile()
+            o_process = subprocess.Popen(self.u_cmd.encode('utf8'),
+                                         stdout=subprocess.PIPE,
+                                         stderr=o_stderr,
+                                         shell=True)
+
+            # readline() is used instead of iterating the file because file iteration reads ahead in big blocks
+            try:
+                for s_line in iter(o_process.stdout.readline, ''):
+                    yield s_line.decode('utf8').rstrip(u'\r\n')
+            finally:
+                o_process.stdout.close()
+                o_process.wait()
+
+                o_stderr.seek(0)
+                self.u_stderr = o_stderr.read().decode('utf8')
+                o_stderr.close()
+
+    def execute_stdout(self, pf_reader, *px_args):
+        """
+        Method to execute the command passing its standard output, as a binary file object, to a function that reads it
+        while the command runs. It's meant for outputs too big to be kept in memory (e.g. data extracted from a
+        compressed file), so .u_stdout is not filled. Standard error is stored in .u_stderr as usual.
+
+        :param pf_reader: Function receiving the file object as first argument.
+
+        :param px_args: Extra arguments for pf_reader.
+
+        :return: The value returned by pf_reader.
+        """
+        x_result = None
+
+        if not self.b_executed:
+            self.b_executed = True
+            o_stderr = tempfile.TemporaryFile()
+            o_process = subprocess.Popen(self.u_cmd.encode('utf8'),
+                                         stdout=subprocess.PIPE,
+                                         stderr=o_stderr,
+                                         shell=True)
+
+            try:
+                x_result = pf_reader(o_process.stdout, *px_args)
+            finally:
+                o_process.stdout.close()
+                o_process.wait()
+
+                o_stderr.seek(0)
+                self.u_stderr = o_stderr.read().decode('utf8')
+                o_stderr.close()
+
+        return x_result
+
     def execute_bg(self):
         if not self.b_executed:
             self.b_executed = True
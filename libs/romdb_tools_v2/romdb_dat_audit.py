@@ -0,0 +1,345 @@
+#!/usr/bin/env python
+
+"""
+Script to audit a ROM collection against a .dat file (e.g. No-Intro or Redump dats). Every file of the collection is
+decompressed once to compute the CRC32, MD5 and SHA1 of its ROMs at the same time, and the ROMs are matched against the
+ones in the dat by their hashes, so renamed or misplaced ROMs are recognised too. The status of each ROMset (have,
+misnamed, bad or missing) is written to a report.
+"""
+
+import argparse
+import datetime
+import multiprocessing
+import os
+import sys
+
+from libs.common_libs import csv
+from libs.common_libs import dat_files
+from libs import compressed_files
+from libs import scan_cache
+
+
+# Constants
+#=======================================================================================================================
+u_PRG_NAME = u'ROMdb Tools - Dat Auditor v1.0 - 2026-10-19'
+
+# Status of the ROMsets
+u_HAVE = u'have'                # All the ROMs found in the file named like the ROMset, with the right names
+u_MISNAMED = u'misnamed'        # All the ROMs found, but in other files or with other names
+u_BAD = u'bad'                  # The file named like the ROMset exists but some ROMs are missing or wrong
+u_MISSING = u'missing'          # The file named like the ROMset doesn't exist and not all the ROMs were found
+
+tu_STATUSES = (u_HAVE, u_MISNAMED, u_BAD, u_MISSING)
+
+
+# Helper functions
+#=======================================================================================================================
+def _get_cmd_args():
+    """
+    Function to get and validate the command line arguments.
+    :return:
+    :rtype dict
+    """
+    o_parser = argparse.ArgumentParser()
+    o_parser.add_argument('dat',
+                          action='store',
+                          help='Dat file (ClrMamePro or XML format). e.g. "/home/john/dats/Nintendo - NES.dat"')
+    o_parser.add_argument('roms_dir',
+                          action='store',
+                          help='Directory of the ROM collection, one file or directory per ROMset. e.g. '
+                               '"/home/john/roms/nes"')
+    o_parser.add_argument('report',
+                          action='store',
+                          help='File to write the status of the ROMsets. e.g. "/home/john/nes_audit.txt"')
+    o_parser.add_argument('-workers',
+                          action='store',
+                          type=int,
+                          default=multiprocessing.cpu_count(),
+                          help='Number of processes used to scan the files. Default is the number of CPUs')
+    o_parser.add_argument('-headers',
+                          action='store_true',
+                          help='Skip ROM headers (e.g. iNES) when computing the hashes, as No-Intro dats do')
+
+    o_args = o_parser.parse_args()
+
+    u_dat = unicode(o_args.dat)
+    if not os.path.isfile(u_dat):
+        print u'ERROR: cannot find dat file "%s"' % u_dat
+        sys.exit()
+
+    u_roms_dir = unicode(o_args.roms_dir)
+    if not os.path.isdir(u_roms_dir):
+        print u'ERROR: cannot find ROMs directory "%s"' % u_roms_dir
+        sys.exit()
+
+    return {'u_dat': u_dat,
+            'u_roms_dir': u_roms_dir,
+            'u_report': unicode(o_args.report),
+            'i_workers': max(1, o_args.workers),
+            'b_headers': o_args.headers}
+
+
+def _get_dat_rom_key(po_rom):
+    """
+    Function to get the key used to find a ROM of a dat. The strongest hash available in the dat is used, so dats without
+    MD5 or SHA1 hashes can be audited too.
+
+    :param po_rom: ROM of the dat.
+    :type po_rom: dat_files.Rom
+
+    :return: The key, or None when the ROM can't be verified (bad dumps or ROMs without hashes).
+    :rtype tuple, None
+    """
+    if po_rom.b_bad:
+        tx_key = None
+    elif po_rom.u_sha1:
+        tx_key = (u'sha1', po_rom.u_sha1.lower())
+    elif po_rom.u_md5:
+        tx_key = (u'md5', po_rom.u_md5.lower())
+    elif po_rom.u_crc32:
+        tx_key = (u'crc32', po_rom.u_crc32.lower(), po_rom.i_size)
+    else:
+        tx_key = None
+
+    return tx_key
+
+
+def _get_scanned_rom_keys(po_rom):
+    """
+    Function to get all the keys a scanned ROM can be found with (see _get_dat_rom_key()).
+
+    :param po_rom: Scanned ROM.
+    :type po_rom: compressed_files._Rom
+
+    :return: The keys.
+    :rtype list[tuple]
+    """
+    return [(u'sha1', po_rom.u_sha1),
+            (u'md5', po_rom.u_md5),
+            (u'crc32', po_rom.u_crc32, po_rom.i_size)]
+
+
+def _get_container_name(pu_file):
+    """
+    Function to get the ROMset name a file of the collection belongs to. e.g. u'/roms/Actraiser (Japan).zip' ->
+    u'Actraiser (Japan)'. Directories keep their full name.
+
+    :param pu_file: Path of the file.
+    :type pu_file: unicode
+
+    :rtype unicode
+    """
+    u_name = os.path.basename(pu_file)
+    if not os.path.isdir(pu_file):
+        u_name = os.path.splitext(u_name)[0]
+
+    return u_name
+
+
+def _get_scan_files(pu_dir):
+    """
+    Generator of the files and directories of a ROM collection (only the first level, each one is a ROMset). Hidden files
+    are ignored.
+
+    :param pu_dir: Directory of the collection.
+    :type pu_dir: unicode
+
+    :rtype collections.Iterable[unicode]
+    """
+    for u_name in sorted(os.listdir(pu_dir)):
+        if not u_name.startswith(u'.'):
+            yield os.path.join(pu_dir, u_name)
+
+
+def _get_romset_status(po_romset, pdltu_found, pdu_errors, pdi_members):
+    """
+    Function to get the status of a ROMset of the dat.
+
+    :param po_romset: ROMset of the dat.
+    :type po_romset: dat_files.RomSet
+
+    :param pdltu_found: Places each ROM key was found in, as (container name, ROM name).
+    :type pdltu_found: dict[tuple, list[(unicode, unicode)]]
+
+    :param pdu_errors: Errors found scanning the collection, by container name.
+    :type pdu_errors: dict[unicode, unicode]
+
+    :param pdi_members: Number of ROMs scanned in each container, by container name.
+    :type pdi_members: dict[unicode, int]
+
+    :return: The status, the number of ROMs found, the number of verifiable ROMs and some details.
+    :rtype unicode, int, int, unicode
+    """
+    i_required = 0
+    i_found = 0
+    i_exact = 0
+    u_other = None
+
+    for o_rom in po_romset.lo_roms:
+        tx_key = _get_dat_rom_key(o_rom)
+        if tx_key is None:
+            continue
+
+        i_required += 1
+        ltu_places = pdltu_found.get(tx_key, [])
+        if ltu_places:
+            i_found += 1
+            if (po_romset.u_name, o_rom.u_name) in ltu_places:
+                i_exact += 1
+            elif u_other is None:
+                u_other = u'%s / %s' % ltu_places[0]
+
+    b_container = (po_romset.u_name in pdi_members) or (po_romset.u_name in pdu_errors)
+
+    if po_romset.u_name in pdu_errors:
+        u_status = u_BAD
+        u_details = pdu_errors[po_romset.u_name]
+
+    # ROMsets with only bad dumps can't be verified, they are only expected to exist
+    elif i_required == 0:
+        u_status = u_HAVE if b_container else u_MISSING
+        u_details = u'no verifiable ROMs'
+    elif i_exact == i_required:
+        u_status = u_HAVE
+        u_details = u''
+        if pdi_members.get(po_romset.u_name, 0) > i_required:
+            u_details = u'%i unknown ROMs' % (pdi_members[po_romset.u_name] - i_required)
+    elif i_found == i_required:
+        u_status = u_MISNAMED
+        u_details = u'e.g. found as %s' % u_other
+    elif b_container:
+        u_status = u_BAD
+        u_details = u'%i of %i ROMs right' % (i_exact, i_required)
+    else:
+        u_status = u_MISSING
+        u_details = u'' if not i_found else u'%i of %i ROMs found elsewhere' % (i_found, i_required)
+
+    return u_status, i_found, i_required, u_details
+
+
+# Main functions
+#=======================================================================================================================
+def audit(pu_dat, pu_roms_dir, pu_report, pi_workers=1, pb_headers=False, pb_print=False):
+    """
+    Function to audit a ROM collection against a dat file.
+
+    :param pu_dat: Path of the dat file. e.g. u'/home/john/dats/Nintendo - NES.dat'
+    :type pu_dat: unicode
+
+    :param pu_roms_dir: Directory of the ROM collection. Each file or directory inside is a ROMset (see
+                        compressed_files.scan_file()). e.g. u'/home/john/roms/nes'
+    :type pu_roms_dir: unicode
+
+    :param pu_report: Path of the report to write. e.g. u'/home/john/nes_audit.txt'
+    :type pu_report: unicode
+
+    :param pi_workers: Number of processes to use.
+    :type pi_workers: int
+
+    :param pb_headers: Whether to skip ROM headers when computing the hashes (see rom_headers).
+    :type pb_headers: bool
+
+    :param pb_print: Whether to print progress information.
+    :type pb_print: bool
+
+    :return: Number of ROMsets with each status.
+    :rtype dict[unicode, int]
+    """
+    # [1/4] Index of the ROMs of the dat by their hashes
+    #---------------------------------------------------
+    o_dat = dat_files.RomSetContainer(pu_dat)
+
+    # ROMs without a key (bad dumps) or with a key not found will have no places
+    dltu_found = {}
+    for o_romset in o_dat:
+        for o_rom in o_romset.lo_roms:
+            tx_key = _get_dat_rom_key(o_rom)
+            if tx_key is not None:
+                dltu_found[tx_key] = []
+
+    if pb_print:
+        print u'%i ROMsets read from dat' % len(o_dat)
+
+    # [2/4] Scanning of the collection, each file is decompressed only once to get all the hashes
+    #--------------------------------------------------------------------------------------------
+    du_errors = {}
+    di_members = {}
+    i_scanned = 0
+
+    for u_file, o_scanned, u_error in compressed_files.scan_many(_get_scan_files(pu_roms_dir),
+                                                                 pi_workers=pi_workers,
+                                                                 pb_headers=pb_headers,
+                                                                 pb_hashes=True):
+        i_scanned += 1
+        u_container = _get_container_name(u_file)
+
+        if u_error is not None:
+            du_errors[u_container] = u_error
+            if pb_print:
+                print u'ERROR | %s | %s' % (u_file, u_error)
+            continue
+
+        di_members[u_container] = len(o_scanned.lo_romfiles)
+
+        for o_rom in o_scanned.lo_romfiles:
+            for tx_key in _get_scanned_rom_keys(o_rom):
+                if tx_key in dltu_found:
+                    dltu_found[tx_key].append((u_container, o_rom.u_file))
+
+        if pb_print and (i_scanned % 1000 == 0):
+            print u'%i files scanned' % i_scanned
+
+    # [3/4] Status of each ROMset
+    #----------------------------
+    o_csv = csv.ParsedCsv()
+    o_csv.lu_headings = [u'ROMset', u'Status', u'Found', u'ROMs', u'Details']
+
+    di_statuses = dict((u_status, 0) for u_status in tu_STATUSES)
+
+    for o_romset in o_dat:
+        u_status, i_found, i_required, u_details = _get_romset_status(o_romset, dltu_found, du_errors, di_members)
+        di_statuses[u_status] += 1
+        o_csv.append_row([o_romset.u_name, u_status, i_found, i_required, u_details])
+
+    # [4/4] Report
+    #-------------
+    u_summary = u', '.join([u'%i %s' % (di_statuses[u_status], u_status) for u_status in tu_STATUSES])
+
+    o_csv.lu_comments = [
+        u'Created with: %s' % u_PRG_NAME,
+        u'Date: %s' % datetime.datetime.now(),
+        u'Dat: %s (%s)' % (pu_dat, o_dat.u_version),
+        u'Directory: %s' % pu_roms_dir,
+        u'Files: %i scanned, %i errors' % (i_scanned, len(du_errors)),
+        u'ROMsets: %s' % u_summary,
+        ]
+    o_csv.save_to_disk(pu_file=pu_report, pu_sep=u'\t', pu_com=u'#')
+
+    if pb_print:
+        u_out = u'%s\n' % (u'-' * len(u_PRG_NAME))
+        u_out += u'%i files scanned, %i errors\n' % (i_scanned, len(du_errors))
+        u_out += u'ROMsets: %s' % u_summary
+        print u_out
+
+    return di_statuses
+
+
+# Main code
+#=======================================================================================================================
+if __name__ == '__main__':
+    print u'%s\n%s' % (u_PRG_NAME, u'=' * len(u_PRG_NAME))
+
+    dx_args = _get_cmd_args()
+
+    o_scan_cache = scan_cache.ScanCache(scan_cache.u_DEFAULT_FILE)
+    compressed_files.set_cache(o_scan_cache)
+
+    try:
+        audit(dx_args['u_dat'],
+              dx_args['u_roms_dir'],
+              dx_args['u_report'],
+              pi_workers=dx_args['i_workers'],
+              pb_headers=dx_args['b_headers'],
+              pb_print=True)
+    finally:
+        o_scan_cache.close()
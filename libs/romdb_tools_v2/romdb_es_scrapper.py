@@ -273,7 +273,8 @@ def scrape(pu_rom_path, pu_platform, pu_dat_path, pu_gamelist, pu_img_dir, pb_pr
     # [1/?] Reading the dat
     #----------------------
     try:
-        o_dat = dat_files.RomSetContainer(pu_dat_path)
+        # The same dats are read on every run, so they are cached once parsed
+        o_dat = dat_files.RomSetContainer(pu_dat_path, pb_cache=True)
     except ValueError:
         o_dat = None
 
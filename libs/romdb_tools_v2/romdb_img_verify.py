@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+
+"""
+Script to verify the integrity of a directory of screenshots previously downloaded from ROMdb (with the structure
+<platform>/titles and <platform>/ingame). Truncated or corrupt images are written to a report and, optionally, they can
+be queued to be downloaded again.
+"""
+
+import argparse
+import datetime
+import multiprocessing
+import os
+import sys
+
+from libs.common_libs import csv
+from libs import image_check
+
+
+# Constants
+#=======================================================================================================================
+u_PRG_NAME = u'ROMdb Tools - Image Verifier v1.0 - 2026-10-19'
+
+# Extension added to bad images to queue them for download. The downloaders only check whether the final image exists,
+# so once renamed they will download it again in the next run.
+u_REQUEUE_EXT = u'bad'
+
+
+# Helper functions
+#=======================================================================================================================
+def _get_cmd_args():
+    """
+    Function to get and validate the command line arguments.
+    :return:
+    :rtype dict
+    """
+    o_parser = argparse.ArgumentParser()
+    o_parser.add_argument('img_dir',
+                          action='store',
+                          help='Directory of the downloaded images. e.g. "/home/john/downloaded_images"')
+    o_parser.add_argument('report',
+                          action='store',
+                          help='File to write the list of bad images. e.g. "/home/john/bad_images.txt"')
+    o_parser.add_argument('-workers',
+                          action='store',
+                          type=int,
+                          default=multiprocessing.cpu_count(),
+                          help='Number of processes used to check the images. Default is the number of CPUs')
+    o_parser.add_argument('-requeue',
+                          action='store_true',
+                          help='Rename bad images to *.%s so they are downloaded again' % u_REQUEUE_EXT)
+
+    o_args = o_parser.parse_args()
+
+    u_img_dir = unicode(o_args.img_dir)
+    if not os.path.isdir(u_img_dir):
+        print u'ERROR: cannot find images directory "%s"' % u_img_dir
+        sys.exit()
+
+    return {'u_img_dir': u_img_dir,
+            'u_report': unicode(o_args.report),
+            'i_workers': max(1, o_args.workers),
+            'b_requeue': o_args.requeue}
+
+
+def _requeue_image(pu_file):
+    """
+    Function to queue a bad image for download by moving it out of the way.
+
+    :param pu_file: Path of the image.
+    :type pu_file: unicode
+
+    :return: True if the image was queued, False otherwise.
+    :rtype bool
+    """
+    try:
+        os.rename(pu_file, u'%s.%s' % (pu_file, u_REQUEUE_EXT))
+        b_queued = True
+    except OSError:
+        b_queued = False
+
+    return b_queued
+
+
+# Main functions
+#=======================================================================================================================
+def verify(pu_img_dir, pu_report, pi_workers=1, pb_requeue=False, pb_print=False):
+    """
+    Function to verify all the images of a screenshots directory.
+
+    :param pu_img_dir: Root directory of the screenshots. e.g. u'/home/john/downloaded_images'
+    :type pu_img_dir: unicode
+
+    :param pu_report: Path of the report to write. e.g. u'/home/john/bad_images.txt'
+    :type pu_report: unicode
+
+    :param pi_workers: Number of processes to use.
+    :type pi_workers: int
+
+    :param pb_requeue: Whether bad images will be queued to be downloaded again.
+    :type pb_requeue: bool
+
+    :param pb_print: Whether to print progress information.
+    :type pb_print: bool
+
+    :return: Number of images checked and number of bad images.
+    :rtype int, int
+    """
+    o_csv = csv.ParsedCsv()
+    o_csv.lu_headings = [u'Image', u'Error', u'Requeued']
+
+    o_pool = multiprocessing.Pool(pi_workers)
+
+    # Images are sent to the processes in chunks to keep the inter-process communication low
+    i_checked = 0
+    try:
+        for u_file, u_error in o_pool.imap_unordered(image_check.check_image,
+                                                      image_check.get_image_files(pu_img_dir),
+                                                      chunksize=256):
+            i_checked += 1
+
+            if u_error is not None:
+                b_queued = pb_requeue and _requeue_image(u_file)
+                o_csv.append_row([os.path.relpath(u_file, pu_img_dir), u_error, b_queued])
+
+                if pb_print:
+                    print u'BAD | %s | %s' % (u_file, u_error)
+
+            if pb_print and (i_checked % 10000 == 0):
+                print u'%i images checked' % i_checked
+    finally:
+        o_pool.close()
+        o_pool.join()
+
+    o_csv.llu_rows.sort()
+    o_csv.lu_comments = [
+        u'Created with: %s' % u_PRG_NAME,
+        u'Date: %s' % datetime.datetime.now(),
+        u'Directory: %s' % pu_img_dir,
+        u'Images: %i checked, %i bad' % (i_checked, len(o_csv.llu_rows)),
+        ]
+    o_csv.save_to_disk(pu_file=pu_report, pu_sep=u'\t', pu_com=u'#')
+
+    if pb_print:
+        u_out = u'%s\n' % (u'-' * len(u_PRG_NAME))
+        u_out += u'%i images checked, %i bad' % (i_checked, len(o_csv.llu_rows))
+        print u_out
+
+    return i_checked, len(o_csv.llu_rows)
+
+
+# Main code
+#=======================================================================================================================
+if __name__ == '__main__':
+    print u'%s\n%s' % (u_PRG_NAME, u'=' * len(u_PRG_NAME))
+
+    dx_args = _get_cmd_args()
+
+    verify(dx_args['u_img_dir'],
+           dx_args['u_report'],
+           pi_workers=dx_args['i_workers'],
+           pb_requeue=dx_args['b_requeue'],
+           pb_print=True)
@@ -1,19 +1,37 @@
 """
-Small script to query ROMdb for information about a ROMSET providing the platform for it and a compressed file as
-parameters. By now, the program is compatible with 7z, and zip format and only recognizes ROMs without headers (so, for
-example, NES ROMs are incompatible yet).
+Small script to query ROMdb for information about a ROMSET providing the platform for it and a ROM file as parameters.
+The program is compatible with 7z and zip files, uncompressed ROMs, .cue files and directories. Headered ROMs (e.g. NES
+ROMs) are recognised when the -headers option is used.
 """
 
 import argparse
-import json
+import collections
+import multiprocessing.pool
 import os
+import Queue
 import sys
 import urllib
 
 
 from libs import compressed_files
 from libs import cons
+from libs import json_decoder
+from libs import lru_cache
 from libs import romdb_data
+from libs import scan_cache
+
+
+# Constants
+#=======================================================================================================================
+# Default number of simultaneous queries to ROMdb for batch functions. Please, keep it low to be kind with the server.
+i_WORKERS = 4
+
+# Maximum number of versions kept in memory by the query functions
+i_CACHE_SIZE = 4096
+
+# In-memory cache of the versions queried by the current process, keyed by platform alias and CRC32. Romsets not found in
+# ROMdb are cached too (as None), but failed queries are not. Its hit/miss counters show how many queries were saved.
+o_VERSION_CACHE = lru_cache.LruCache(i_CACHE_SIZE)
 
 
 # Classes
@@ -29,65 +47,106 @@ def _get_args():
     """
     o_parser = argparse.ArgumentParser()
     o_parser.add_argument('platform', action='store', help='Platform alias')
-    o_parser.add_argument('file', action='store', help='_File to query in ROMdb')
+    o_parser.add_argument('file', action='store', help='_File (compressed, uncompressed, .cue or directory) to query in ROMdb')
     o_parser.add_argument('-format', action='store', help='Parent games and sagas format. s=short, m=medium, f=full')
+    o_parser.add_argument('-headers', action='store_true', help='Remove ROM headers (NES, FDS, Lynx, SNES copiers)')
 
     o_arguments = o_parser.parse_args()
 
     # Arguments validation
     #---------------------
     u_file = o_arguments.file
-    if not os.path.isfile(u_file):
+    if not os.path.exists(u_file):
         print 'ERROR: Can\'t open file "%s"' % u_file
         sys.exit()
 
     u_platform = o_arguments.platform
 
-    return {'u_file': u_file, 'u_platform': u_platform}
+    return {'u_file': u_file, 'u_platform': u_platform, 'b_headers': o_arguments.headers}
 
 
-def _get_file_romset(pu_file):
+def _get_file_romset(pu_file, pb_headers=False):
     """
     Function to get information from a ROM file.
     :return:
     """
-    u_ext = pu_file.rpartition(u'.')[2]
+    return compressed_files.scan_file(pu_file, pb_headers=pb_headers)
 
-    if u_ext == u'7z':
-        o_romset = compressed_files.scan_7z_file(pu_file)
-    elif u_ext == u'zip':
-        o_romset = compressed_files.scan_zip_file(pu_file)
-    else:
-        print 'ERROR: Invalid ROM file extension "%s"' % u_ext
-        sys.exit()
 
-    return o_romset
+def _get_sibling_versions(po_version):
+    """
+    Function to get the sibling versions embedded in a Version keyed by their platform alias and CRC32. ROMdb includes
+    the full data of every sibling in the answer for a version, so they can be used instead of querying them again.
 
+    :param po_version: Version received from ROMdb.
+    :type po_version: romdb_data.Version
 
-def query_romset_by_crc32(pu_platform, pu_crc32):
+    :return: A dictionary {(u_platform, u_crc32): o_sibling_version}
+    :rtype dict[(unicode, unicode), romdb_data.Version]
     """
-    Function to query a Version by the platform name (standard alias recognised by the library can be found in
-    libs/cons.py) and the (clean, not considering headers or other non-data file, e.g. .cue files) CRC32 of the ROMset.
+    dto_siblings = {}
+    for o_sibling in po_version.lo_siblings:
+        if (o_sibling.u_romset_platform is not None) and (o_sibling.u_romset_crc32 is not None):
+            dto_siblings[(o_sibling.u_romset_platform, o_sibling.u_romset_crc32.lower())] = o_sibling
 
-    :param pu_platform: Alias of the platform, they can be found in libs/cons.py. e.g. u'snt-crt' for SNES cartridges.
+    return dto_siblings
+
+
+def _query_key(ptu_key):
+    """
+    Function to query a Version from a platform and CRC32 pair, used by the batch functions. Errors are returned instead
+    of raised so they can be re-raised in the thread consuming the results.
+
+    :param ptu_key: Platform alias and clean CRC32 of the ROMset. e.g. (u'snt-crt', u'01a34b67')
+    :type ptu_key: (unicode, unicode)
+
+    :return: The key, the Version found (or None) and the error raised during the query (or None).
+    :rtype (unicode, unicode), romdb_data.Version, Exception
+    """
+    u_platform, u_crc32 = ptu_key
+    o_version = None
+    o_error = None
+    try:
+        o_version = query_romset_by_crc32(u_platform, u_crc32)
+    except Exception as o_exception:
+        o_error = o_exception
+
+    return ptu_key, o_version, o_error
+
+
+def _fetch_version(pu_platform, pu_crc32):
+    """
+    Function to query ROMdb about a Version, without using the in-memory cache. See query_romset_by_crc32().
+
+    :param pu_platform: Alias of the platform. e.g. u'snt-crt' for SNES cartridges.
     :type pu_platform: unicode
 
-    :param pu_crc32: Clean CRC32 of the ROMset (if several ROMs, the resulting summ of all the ROMs is used), not
-                     including headers or non-data files like .cue files. e.g. u'01a34b67'
+    :param pu_crc32: Clean CRC32 of the ROMset. e.g. u'01a34b67'
     :type pu_crc32: unicode
 
     :return: A ROMset object with all the relevant data or None when no romset is found in ROMdb.
     :rtype romdb_data.Version, None
+
+    :raise IOError: When ROMdb answers with an HTTP error other than 404 (e.g. a 5xx server error).
+    :raise ValueError: When the answer is not valid json (e.g. an HTML error page or a truncated answer).
     """
     u_url = u'%s/api/version/%s/%s' % (cons.u_URL, pu_platform, pu_crc32)
 
     # [2/?] Querying ROMdb about the romset
     #--------------------------------------
+    # urllib doesn't raise for HTTP errors, so they are checked here. Only a real "not found" answer can be cached as a
+    # missing romset, other errors are raised so the romset is queried again later.
     o_response = urllib.urlopen(u_url)
     try:
-        dx_json = json.loads(o_response.read())
-    except ValueError:
-        dx_json = {}
+        i_status = o_response.getcode()
+        if i_status == 404:
+            return None
+        elif (i_status is not None) and (i_status >= 400):
+            raise IOError(u'ROMdb answered HTTP %i for "%s"' % (i_status, u_url))
+
+        dx_json = json_decoder.decode(o_response.read())
+    finally:
+        o_response.close()
 
     # [3/?] Parsing the json and building a full Version object with all the information
     #-----------------------------------------------------------------------------------
@@ -101,7 +160,97 @@ def query_romset_by_crc32(pu_platform, pu_crc32):
     return o_romdb_version
 
 
-def query_romset_by_file(pu_platform, pu_file):
+def query_romset_by_crc32(pu_platform, pu_crc32):
+    """
+    Function to query a Version by the platform name (standard alias recognised by the library can be found in
+    libs/cons.py) and the (clean, not considering headers or other non-data file, e.g. .cue files) CRC32 of the ROMset.
+
+    Results are kept in memory (see o_VERSION_CACHE) so querying the same romset again doesn't reach ROMdb, and
+    simultaneous queries for the same romset from several threads only make one request.
+
+    :param pu_platform: Alias of the platform, they can be found in libs/cons.py. e.g. u'snt-crt' for SNES cartridges.
+    :type pu_platform: unicode
+
+    :param pu_crc32: Clean CRC32 of the ROMset (if several ROMs, the resulting summ of all the ROMs is used), not
+                     including headers or non-data files like .cue files. e.g. u'01a34b67'
+    :type pu_crc32: unicode
+
+    :return: A ROMset object with all the relevant data or None when no romset is found in ROMdb.
+    :rtype romdb_data.Version, None
+    """
+    return o_VERSION_CACHE.get((pu_platform, pu_crc32.lower()), _fetch_version, pu_platform, pu_crc32)
+
+
+def query_romset_by_crc32_many(pitu_keys, pi_workers=i_WORKERS):
+    """
+    Generator to query several Versions at once by their platform and clean CRC32 (see query_romset_by_crc32()). The
+    queries are done concurrently and repeated keys are only queried once. Results are yielded as soon as they are
+    received, so they don't keep the order of the input keys.
+
+    Versions already in the in-memory cache (see query_romset_by_crc32()) are yielded without querying ROMdb. Besides,
+    every answer from ROMdb contains the full data of the sibling versions (other regional versions of the same game).
+    When those siblings are still pending in the batch, they are yielded immediately instead of being queried, so one
+    single query can satisfy a whole family of versions. Notice the sibling data doesn't include its own siblings, so
+    they are NOT added to the cache and later calls to query_romset_by_crc32() still get the full Version from ROMdb.
+    Siblings already being queried when the answer arrives are queried anyway.
+
+    ROMdb doesn't offer any multi-key endpoint, so every other key is a single query to the /api/version/ endpoint.
+
+    :param pitu_keys: Iterable of platform alias and clean CRC32 pairs. e.g. [(u'snt-crt', u'01a34b67'), ...]
+    :type pitu_keys: collections.Iterable[(unicode, unicode)]
+
+    :param pi_workers: Number of simultaneous queries.
+    :type pi_workers: int
+
+    :return: The platform alias, the CRC32 and the Version found (or None when no romset is found in ROMdb).
+    :rtype collections.Iterable[(unicode, unicode, romdb_data.Version)]
+    """
+    # Pending keys are kept in order and without repetitions
+    dtb_pending = collections.OrderedDict()
+    for u_platform, u_crc32 in pitu_keys:
+        dtb_pending[(u_platform, u_crc32.lower())] = True
+
+    if dtb_pending:
+        o_results = Queue.Queue()
+        o_pool = multiprocessing.pool.ThreadPool(min(pi_workers, len(dtb_pending)))
+        i_running = 0
+
+        try:
+            while dtb_pending or i_running:
+                # Keys are only sent to the pool when there is a free worker. That way, siblings found in the answers
+                # can still be removed from the queue before they are queried.
+                while dtb_pending and (i_running < pi_workers):
+                    tu_key = dtb_pending.popitem(last=False)[0]
+                    b_cached, o_version = o_VERSION_CACHE.lookup(tu_key)
+                    if b_cached:
+                        yield tu_key[0], tu_key[1], o_version
+                    else:
+                        o_pool.apply_async(_query_key, (tu_key,), callback=o_results.put)
+                        i_running += 1
+
+                if not i_running:
+                    continue
+
+                tu_key, o_version, o_error = o_results.get()
+                i_running -= 1
+
+                if o_error is not None:
+                    raise o_error
+
+                yield tu_key[0], tu_key[1], o_version
+
+                if o_version is not None:
+                    for tu_sibling_key, o_sibling in _get_sibling_versions(o_version).iteritems():
+                        if tu_sibling_key in dtb_pending:
+                            del dtb_pending[tu_sibling_key]
+                            yield tu_sibling_key[0], tu_sibling_key[1], o_sibling
+        finally:
+            # If the caller stops consuming results, pending queries are discarded
+            o_pool.terminate()
+            o_pool.join()
+
+
+def query_romset_by_file(pu_platform, pu_file, pb_headers=False):
     """
     Function to query ROMdb about a ROMset from a file path. The function should be able to identify the proper data and
     remove unwanted pieces (headers, .cue files and so on).
@@ -112,17 +261,20 @@ def query_romset_by_file(pu_platform, pu_file):
     :param pu_file: Path of the file to be queried. e.g. u'/home/john/my_file.zip'
     :type pu_file: unicode
 
+    :param pb_headers: Whether ROM headers have to be removed (see libs/rom_headers.py). It's needed for headered dumps
+                       like NES ROMs, but it's much slower because the file has to be decompressed.
+    :type pb_headers: bool
+
     :return: A Version object with all the relevant data or None if no result is found in ROMdb.
     :rtype romdb_data.Version, None
     """
 
     # [1/?] Creating a romset-file object by reading the file
     #--------------------------------------------------------
-    # TODO: When the platform is NES (for example), remove the header and compute the CRC32
-    o_romset = _get_file_romset(pu_file)
+    o_romset = _get_file_romset(pu_file, pb_headers)
     o_romset.u_platform = pu_platform
 
-    return query_romset_by_crc32(pu_platform, o_romset.u_crc32)
+    return query_romset_by_crc32(pu_platform, o_romset.u_ccrc32)
 
 
 # Main code
@@ -132,7 +284,11 @@ if __name__ == '__main__':
     print '================================='
     dx_args = _get_args()
 
-    o_version = query_romset_by_file(dx_args['u_platform'], dx_args['u_file'])
+    o_scan_cache = scan_cache.ScanCache(scan_cache.u_DEFAULT_FILE)
+    compressed_files.set_cache(o_scan_cache)
+
+    o_version = query_romset_by_file(dx_args['u_platform'], dx_args['u_file'], dx_args['b_headers'])
+    o_scan_cache.close()
 
     #print dx_romdb_json
     print o_version.nice_text(ps_format='medium')
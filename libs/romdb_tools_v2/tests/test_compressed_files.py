@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for libs.compressed_files. The 7z command line tool is not needed, its output is read from a fixture.
+"""
+
+import codecs
+import fnmatch
+import multiprocessing.pool
+import os
+import re
+import shutil
+import tempfile
+import unittest
+
+from libs import compressed_files
+
+
+u_FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), u'fixtures')
+
+
+# Replacements of _scan_chunk() run by the workers, they must be importable
+def _scan_chunk_dead_worker(plu_files, pb_headers=False, pb_hashes=False):
+    os._exit(1)
+
+
+def _scan_chunk_unpicklable(plu_files, pb_headers=False, pb_hashes=False):
+    return [(u_file, lambda: None, None) for u_file in plu_files]
+
+
+class TestParse7zCliLines(unittest.TestCase):
+    def test_batch(self):
+        with codecs.open(os.path.join(u_FIXTURES_DIR, u'7z_slt_batch.txt'), 'r', 'utf8') as o_file:
+            lu_lines = o_file.read().splitlines()
+
+        ltx_archives = list(compressed_files._parse_7z_cli_lines(lu_lines))
+
+        self.assertEqual([tx_archive[0] for tx_archive in ltx_archives],
+                         [u'/home/john/MediEvil (Spain).7z', u'/home/john/Actraiser (Japan).7z'])
+
+        # The folder is skipped and the last file is kept although no empty line follows it
+        lo_medievil = ltx_archives[0][1]
+        self.assertEqual([o_file.u_name for o_file in lo_medievil],
+                         [u'MediEvil (Spain) (Track 1).bin', u'MediEvil (Spain) (Track 2).bin'])
+        self.assertEqual([o_file.u_crc32 for o_file in lo_medievil], [u'1a2b3c4d', u'b97ffd28'])
+        self.assertEqual([o_file.i_real_size for o_file in lo_medievil], [541678128, 32989152])
+
+        # The totals at the end of the output are not taken as files
+        lo_actraiser = ltx_archives[1][1]
+        self.assertEqual([(o_file.u_name, o_file.u_crc32) for o_file in lo_actraiser],
+                         [(u'Actraiser (Japan).sfc', u'6ee0a4ba')])
+
+    def test_build_romset(self):
+        o_file = compressed_files._CompressedFile()
+        o_file.u_name = u'Actraiser (Japan).sfc'
+        o_file.u_crc32 = u'6ee0a4ba'
+        o_file.i_real_size = 1048576
+
+        o_romset = compressed_files._build_7z_romset([o_file])
+        self.assertEqual(o_romset.lo_romfiles[0].i_size, 1048576)
+        self.assertEqual(o_romset.u_ccrc32, u'6ee0a4ba')
+
+
+def _get_7z_listing(pu_archive, pu_name, pu_crc32):
+    return [u'Listing archive: %s' % pu_archive, u'', u'--', u'Path = %s' % pu_archive, u'Type = 7z', u'',
+            u'----------', u'Path = %s' % pu_name, u'Size = 1048576', u'CRC = %s' % pu_crc32, u'']
+
+
+class _FakeCommand(object):
+    """
+    Replacement of shell.Command listing every archive of du_ARCHIVES matched by the command as a 7z wildcard.
+    """
+    du_ARCHIVES = {u'/home/john/Actraiser (Japan).7z': (u'Actraiser (Japan).sfc', u'6EE0A4BA'),
+                   u'/home/john/Actraiser (Japan) [b].7z': (u'Actraiser (Japan) [b].sfc', u'12345678'),
+                   u'/home/john/Actraiser (Japan) [!].7z': (u'Actraiser (Japan) [!].sfc', u'9ABCDEF0')}
+    lu_cmds = []
+
+    def __init__(self, pu_cmd):
+        self.u_cmd = pu_cmd
+        self.lu_cmds.append(pu_cmd)
+
+    def execute_lines(self):
+        lu_names = re.findall(r'"([^"]*)"', self.u_cmd)
+        lu_lines = [u'7-Zip [64] 16.02 : Copyright (c) 1999-2016 Igor Pavlov : 2016-05-21', u'']
+        for u_archive in sorted(self.du_ARCHIVES):
+            if any(fnmatch.fnmatchcase(u_archive, u_name) for u_name in lu_names):
+                lu_lines += _get_7z_listing(u_archive, *self.du_ARCHIVES[u_archive])
+        return lu_lines
+
+
+class TestScan7zFiles(unittest.TestCase):
+    def setUp(self):
+        self._c_command = compressed_files.shell.Command
+        compressed_files.shell.Command = _FakeCommand
+        _FakeCommand.lu_cmds = []
+
+    def tearDown(self):
+        compressed_files.shell.Command = self._c_command
+
+    def test_wildcard_names(self):
+        lu_files = [u'/home/john/Actraiser (Japan).7z', u'/home/john/Actraiser (Japan) [!].7z']
+        dx_romsets = dict(compressed_files.scan_7z_files(lu_files, pb_cache=False))
+
+        # "[!]" would match "[b]" as a wildcard, so that file is listed on its own
+        self.assertEqual(len(_FakeCommand.lu_cmds), 2)
+        self.assertEqual([u_cmd for u_cmd in _FakeCommand.lu_cmds if u'-ai!' in u_cmd],
+                         [u'7z l -slt -an -ai!"/home/john/Actraiser (Japan).7z"'])
+        self.assertEqual(dx_romsets[lu_files[0]].u_ccrc32, u'6ee0a4ba')
+        self.assertEqual(dx_romsets[lu_files[1]].u_ccrc32, u'9abcdef0')
+        self.assertEqual(dx_romsets[lu_files[1]].lo_romfiles[0].u_file, u'Actraiser (Japan) [!].sfc')
+
+
+class TestScanMany(unittest.TestCase):
+    def setUp(self):
+        self._f_scan_chunk = compressed_files._scan_chunk
+        self.u_dir = tempfile.mkdtemp()
+        self.lu_files = []
+        for i_file in range(3):
+            u_file = os.path.join(self.u_dir, u'%i.bin' % i_file)
+            with open(u_file, 'wb') as o_file:
+                o_file.write('%i' % i_file)
+            self.lu_files.append(u_file)
+
+    def tearDown(self):
+        compressed_files._scan_chunk = self._f_scan_chunk
+        shutil.rmtree(self.u_dir)
+
+    def _scan(self, pb_processes=True):
+        return list(compressed_files.scan_many(self.lu_files, pi_workers=2, pb_processes=pb_processes, pb_cache=False))
+
+    def test_scan(self):
+        ltx_results = sorted(self._scan())
+        self.assertEqual([tx_result[0] for tx_result in ltx_results], self.lu_files)
+        self.assertEqual([tx_result[1].u_ccrc32 for tx_result in ltx_results], [u'f4dbdf21', u'83dcefb7', u'1ad5be0d'])
+
+    def test_dead_worker(self):
+        compressed_files._scan_chunk = _scan_chunk_dead_worker
+        self.assertRaises(RuntimeError, self._scan)
+
+    def test_failed_task(self):
+        compressed_files._scan_chunk = _scan_chunk_unpicklable
+        self.assertRaises(multiprocessing.pool.MaybeEncodingError, self._scan)
+
+
+if __name__ == '__main__':
+    unittest.main()
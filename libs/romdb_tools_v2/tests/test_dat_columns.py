@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for libs.common_libs.dat_columns.
+"""
+
+import cPickle
+import multiprocessing
+import os
+import unittest
+
+from libs.common_libs import dat_columns
+from libs.common_libs import dat_files
+
+
+u_FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), u'fixtures')
+
+# Columns received by the worker processes (see _init_worker())
+_o_columns = None
+
+
+def _get_fixture(pu_name):
+    return os.path.join(u_FIXTURES_DIR, pu_name)
+
+
+def _init_worker(po_columns):
+    global _o_columns
+    _o_columns = po_columns
+
+
+def _get_desc(pi_romset):
+    return _o_columns[pi_romset].u_desc
+
+
+def _get_romset_data(po_romset):
+    return (po_romset.u_name, po_romset.u_desc, po_romset.u_auth, getattr(po_romset, 'u_year', None),
+            [(o_rom.u_name, o_rom.i_size, o_rom.u_crc32, o_rom.u_md5, o_rom.u_sha1, o_rom.b_bad)
+             for o_rom in po_romset])
+
+
+class TestRomSetColumns(unittest.TestCase):
+    def _check_columns(self, pu_dat, pb_shared):
+        o_container = dat_files.RomSetContainer(_get_fixture(pu_dat))
+        o_columns = dat_columns.RomSetColumns.from_dat(_get_fixture(pu_dat), pb_shared=pb_shared)
+
+        # The dats are not sorted, the columns are sorted like the container
+        self.assertEqual([_get_romset_data(o_romset) for o_romset in o_columns],
+                         [_get_romset_data(o_romset) for o_romset in o_container])
+        self.assertEqual(_get_romset_data(o_columns[-1]), _get_romset_data(o_container.lo_romsets[-1]))
+        self.assertEqual((o_columns.i_romsets, o_columns.i_roms), (2, 3))
+
+        for s_attribute in ('u_name', 'u_description', 'u_version', 'u_comment', 'u_type', 'u_author', 'u_homepage'):
+            self.assertEqual(getattr(o_columns, s_attribute), getattr(o_container, s_attribute))
+
+        return o_columns
+
+    def test_cmp(self):
+        self._check_columns(u'cmp_quoted.dat', True)
+
+    def test_xml(self):
+        o_columns = self._check_columns(u'xml_sample.xml', False)
+        self.assertEqual(o_columns.u_type, u'XML')
+
+    def test_container(self):
+        o_container = dat_files.RomSetContainer(_get_fixture(u'cmp_quoted.dat'))
+        o_columns = dat_columns.RomSetColumns(o_container)
+        self.assertEqual([_get_romset_data(o_romset) for o_romset in o_columns.to_container()],
+                         [_get_romset_data(o_romset) for o_romset in o_container])
+
+    def test_search(self):
+        o_columns = dat_columns.RomSetColumns.from_dat(_get_fixture(u'cmp_quoted.dat'))
+
+        lo_romsets = o_columns.get_romsets_by_field(u'u_ccrc32', False, (u'b19ed489', u'6ee0a4ba'))
+        self.assertEqual([o_romset.u_name for o_romset in lo_romsets],
+                         [u'Actraiser (Japan) (Rev 1)', u'Super Mario World (USA)'])
+        lo_romsets = o_columns.get_romsets_by_field(u'u_name', True, (u'Super Mario World (USA)', u'Zelda'))
+        self.assertEqual([o_romset.u_name for o_romset in lo_romsets], [u'Super Mario World (USA)'])
+        self.assertEqual(o_columns.get_romsets_by_field(u'u_desc', False, ([u'Zelda'],)), [])
+        self.assertRaises(ValueError, o_columns.get_romsets_by_field, u'u_name', False, u'Zelda')
+
+        lo_romsets = o_columns.get_romsets_by_field(u'u_year', False, (u'1990',))
+        self.assertEqual([o_romset.u_name for o_romset in lo_romsets], [u'Actraiser (Japan) (Rev 1)'])
+
+        # CRC32s are searched in any case
+        lo_romsets = o_columns.get_romsets_by_rom_crc32((u'01020304',))
+        self.assertEqual([o_romset.u_name for o_romset in lo_romsets], [u'Actraiser (Japan) (Rev 1)'])
+        lo_romsets = o_columns.get_romsets_by_rom_crc32((u'B19ED489', u'6EE0a4ba', u'6ee0a4ba', u'zzzzzzzz'))
+        self.assertEqual([o_romset.u_name for o_romset in lo_romsets],
+                         [u'Actraiser (Japan) (Rev 1)', u'Super Mario World (USA)'])
+        self.assertEqual(o_columns.get_romsets_by_rom_crc32((u'00000000',)), [])
+
+        self.assertEqual(o_columns.get_duplicated_crc32(), {})
+
+    def test_container_indexes(self):
+        o_container = dat_files.RomSetContainer(_get_fixture(u'cmp_quoted.dat'))
+        dli_index = o_container._get_index(u'u_name')
+
+        # Building RomSets from the columns doesn't discard the indexes of containers
+        o_columns = dat_columns.RomSetColumns.from_dat(_get_fixture(u'cmp_quoted.dat'))
+        list(o_columns)
+        self.assertTrue(o_container._get_index(u'u_name') is dli_index)
+
+    def test_workers(self):
+        o_columns = dat_columns.RomSetColumns.from_dat(_get_fixture(u'cmp_quoted.dat'))
+
+        # Shared columns only reach the workers when they are created
+        o_pool = multiprocessing.Pool(2, initializer=_init_worker, initargs=(o_columns,))
+        try:
+            self.assertEqual(o_pool.map(_get_desc, range(2)), [o_romset.u_desc for o_romset in o_columns])
+            self.assertRaises(cPickle.PicklingError, o_pool.apply, len, (o_columns,))
+        finally:
+            o_pool.terminate()
+            o_pool.join()
+
+
+if __name__ == '__main__':
+    unittest.main()
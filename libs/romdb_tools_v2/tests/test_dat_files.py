@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for libs.common_libs.dat_files. Run them from the romdb_tools_v2 directory with:
+
+    python -m unittest discover -s tests -t .
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from libs.common_libs import dat_files
+
+
+u_FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), u'fixtures')
+
+
+def _get_fixture(pu_name):
+    return os.path.join(u_FIXTURES_DIR, pu_name)
+
+
+class TestCmpReader(unittest.TestCase):
+    def _check_container(self, po_container):
+        self.assertEqual(po_container.u_name, u'Nintendo - Super Nintendo Entertainment System')
+        self.assertEqual(po_container.u_version, u'20191014')
+        self.assertEqual(po_container.i_romsets, 2)
+
+        o_actraiser, o_smw = po_container.lo_romsets
+
+        self.assertEqual(o_smw.u_name, u'Super Mario World (USA)')
+        self.assertEqual(o_smw.u_desc, u'Super Mario World (USA)')
+        self.assertEqual(len(o_smw.lo_roms), 1)
+        o_rom = o_smw.lo_roms[0]
+        self.assertEqual(o_rom.u_name, u'Super Mario World (USA).sfc')
+        self.assertEqual(o_rom.i_size, 524288)
+        self.assertEqual(o_rom.u_crc32, u'b19ed489')
+        self.assertEqual(o_rom.u_md5, u'cdd3c8c37322978ca8669b34bc89c804')
+        self.assertEqual(o_rom.u_sha1, u'6b47bb75d16514b6a476aa0c73a683a2a4c18765')
+        self.assertFalse(o_rom.b_bad)
+        self.assertEqual(o_smw.u_ccrc32, u'b19ed489')
+
+        self.assertEqual(o_actraiser.u_name, u'Actraiser (Japan) (Rev 1)')
+        self.assertEqual(o_actraiser.u_year, u'1990')
+        self.assertEqual([o_rom.u_name for o_rom in o_actraiser],
+                         [u'Actraiser (Japan) (Rev 1).sfc', u'Actraiser (Japan) (Rev 1).cue'])
+        self.assertEqual([o_rom.i_size for o_rom in o_actraiser], [1048576, 98])
+        self.assertEqual([o_rom.b_bad for o_rom in o_actraiser], [False, True])
+        self.assertEqual(o_actraiser.u_ccrc32, u'6ee0a4ba')
+        self.assertEqual(o_actraiser.u_dcrc32, u'6fe2a7be')
+
+    def test_quoted(self):
+        o_container = dat_files.RomSetContainer(_get_fixture(u'cmp_quoted.dat'))
+        self._check_container(o_container)
+        self.assertEqual(o_container.u_comment, u'no-intro | datomatic')
+        self.assertEqual(o_container.lo_romsets[1].u_auth, u'Nintendo')
+
+    def test_unquoted(self):
+        o_container = dat_files.RomSetContainer(_get_fixture(u'cmp_unquoted.dat'))
+        self._check_container(o_container)
+
+    def test_single_line_blocks(self):
+        ltx_blocks = list(dat_files._iter_cmp_blocks('game ( name foo year 1990 rom ( name a b (c).bin size 1 ) )'))
+        self.assertEqual(ltx_blocks, [('game', [('name', 'foo'), ('year', '1990'),
+                                                ('rom', [('name', 'a b (c).bin'), ('size', '1')])])])
+
+
+class TestXmlReader(unittest.TestCase):
+    def test_container(self):
+        o_container = dat_files.RomSetContainer(_get_fixture(u'xml_sample.xml'))
+        self.assertEqual(o_container.u_type, u'XML')
+        self.assertEqual(o_container.u_name, u'Nintendo - Super Nintendo Entertainment System')
+        self.assertEqual(o_container.u_version, u'20191014')
+        self.assertEqual(o_container.u_author, u'No-Intro')
+        self.assertEqual(o_container.u_homepage, u'No-Intro')
+
+        # <game> and <machine> elements are both RomSets
+        o_actraiser, o_smw = o_container.lo_romsets
+        self.assertEqual(o_actraiser.u_name, u'actraiser')
+        self.assertEqual([(o_rom.u_name, o_rom.i_size, o_rom.u_crc32, o_rom.u_md5, o_rom.b_bad)
+                          for o_rom in o_actraiser],
+                         [(u'Actraiser (Japan) (Rev 1).sfc', 1048576, u'6ee0a4ba', None, False),
+                          (u'Actraiser (Japan) (Rev 1).cue', 98, u'01020304', None, True)])
+
+        o_rom = o_smw.lo_roms[0]
+        self.assertEqual(o_rom.u_crc32, u'b19ed489')
+        self.assertEqual(o_rom.u_md5, u'cdd3c8c37322978ca8669b34bc89c804')
+        self.assertEqual(o_rom.u_sha1, u'6b47bb75d16514b6a476aa0c73a683a2a4c18765')
+
+    def test_iter(self):
+        o_header = dat_files.RomSetContainer()
+        o_romsets = dat_files.iter_xml_romsets(_get_fixture(u'xml_sample.xml'), po_container=o_header)
+
+        # RomSets are yielded in the order of the dat, as soon as they are read
+        self.assertEqual(next(o_romsets).u_name, u'Super Mario World (USA)')
+        self.assertEqual(o_header.u_version, u'20191014')
+        self.assertEqual([o_romset.u_name for o_romset in o_romsets], [u'actraiser'])
+
+
+class TestSorting(unittest.TestCase):
+    def test_sort_in_place(self):
+        o_container = dat_files.RomSetContainer()
+        lo_romsets = o_container.lo_romsets
+        for u_desc in (u'b', u'c', u'a'):
+            o_container.add_romset(dat_files.RomSet(u_desc, u_desc))
+
+        self.assertEqual([o_romset.u_desc for o_romset in o_container], [u'a', u'b', u'c'])
+        self.assertTrue(lo_romsets is o_container.lo_romsets)
+        self.assertEqual([o_romset.u_desc for o_romset in lo_romsets], [u'a', u'b', u'c'])
+
+    def test_nested_iteration(self):
+        o_container = dat_files.RomSetContainer(_get_fixture(u'cmp_quoted.dat'))
+        ltu_pairs = [(o_a.u_name, o_b.u_name) for o_a in o_container for o_b in o_container]
+        self.assertEqual(len(ltu_pairs), 4)
+
+    def test_sorted_flag(self):
+        o_container = dat_files.RomSetContainer()
+        o_container.add_romset(dat_files.RomSet(u'a', u'a'))
+        o_container.add_romset(dat_files.RomSet(u'b', u'b'))
+        self.assertTrue(o_container._is_sorted())
+
+        o_container.add_romset(dat_files.RomSet(u'0', u'0'))
+        self.assertFalse(o_container._is_sorted())
+
+        list(o_container)
+        self.assertTrue(o_container._is_sorted())
+
+        # External changes are detected too
+        o_container.lo_romsets.append(dat_files.RomSet(u'00', u'00'))
+        self.assertFalse(o_container._is_sorted())
+
+
+class TestSearch(unittest.TestCase):
+    def setUp(self):
+        self.o_container = dat_files.RomSetContainer(_get_fixture(u'cmp_quoted.dat'))
+
+    def test_get_romsets_by_field(self):
+        lo_romsets = self.o_container.get_romsets_by_field(u'u_ccrc32', False, (u'b19ed489', u'6ee0a4ba', u'b19ed489'))
+        self.assertEqual([o_romset.u_name for o_romset in lo_romsets],
+                         [u'Actraiser (Japan) (Rev 1)', u'Super Mario World (USA)'])
+
+        lo_romsets = self.o_container.get_romsets_by_field(u'u_ccrc32', True, (u'b19ed489', u'6ee0a4ba'))
+        self.assertEqual([o_romset.u_name for o_romset in lo_romsets], [u'Actraiser (Japan) (Rev 1)'])
+
+        self.assertEqual(self.o_container.get_romsets_by_field(u'u_name', False, (u'Zelda',)), [])
+
+    def test_index_after_add_rom(self):
+        self.assertEqual(len(self.o_container.get_romsets_by_field(u'u_ccrc32', False, (u'b19ed489',))), 1)
+
+        o_rom = dat_files.Rom()
+        o_rom.u_name = u'extra.bin'
+        o_rom.u_crc32 = u'00000001'
+        self.o_container.lo_romsets[1].add_rom(o_rom)
+
+        self.assertEqual(self.o_container.get_romsets_by_field(u'u_ccrc32', False, (u'b19ed489',)), [])
+        self.assertEqual(len(self.o_container.get_romsets_by_field(u'u_ccrc32', False, (u'b19ed48a',))), 1)
+
+    def test_index_kept(self):
+        dli_index = self.o_container._get_index(u'u_ccrc32')
+
+        # ROMs added to RomSets of other containers don't discard the indexes
+        o_other = dat_files.RomSetContainer(_get_fixture(u'cmp_quoted.dat'))
+        o_other.get_romsets_by_field(u'u_ccrc32', False, (u'b19ed489',))
+        o_rom = dat_files.Rom()
+        o_rom.u_name = u'extra.bin'
+        o_rom.u_crc32 = u'00000001'
+        o_other.lo_romsets[1].add_rom(o_rom)
+        dat_files.RomSet(u'a', u'a').add_rom(o_rom)
+
+        self.assertTrue(self.o_container._get_index(u'u_ccrc32') is dli_index)
+        self.assertEqual(o_other.get_romsets_by_field(u'u_ccrc32', False, (u'b19ed489',)), [])
+
+    def test_unhashable_value(self):
+        self.assertEqual(self.o_container.get_romsets_by_field(u'u_name', False, ([u'Zelda'],)), [])
+
+
+class TestCompoundHash(unittest.TestCase):
+    def test_compound_hash(self):
+        self.assertEqual(dat_files._compound_hash([u'6ee0a4ba', u'01020304']), u'6fe2a7be')
+        self.assertEqual(dat_files._compound_hash([u'ffffffff', u'00000001']), u'100000000')
+        self.assertEqual(dat_files._compound_hash([u'', u'00000001']), u'1')
+        self.assertEqual(dat_files._compound_hash([u'00000000']), u'')
+        self.assertEqual(dat_files._compound_hash([]), u'0')
+        self.assertEqual(dat_files._compound_hash([u'00000001', None]), None)
+
+    def test_romset_hash_length(self):
+        o_romset = dat_files.RomSet(u'a', u'a')
+        for u_crc32 in (u'ffffffff', u'00000002'):
+            o_rom = dat_files.Rom()
+            o_rom.u_name = u'a.bin'
+            o_rom.u_crc32 = u_crc32
+            o_romset.add_rom(o_rom)
+
+        self.assertEqual(o_romset.u_ccrc32, u'00000001')
+
+        # Hashes are memoised, but adding ROMs discards them
+        o_rom = dat_files.Rom()
+        o_rom.u_name = u'b.bin'
+        o_rom.u_crc32 = u'00000001'
+        o_romset.add_rom(o_rom)
+        self.assertEqual(o_romset.u_ccrc32, u'00000002')
+
+
+class TestCache(unittest.TestCase):
+    def setUp(self):
+        self._u_cache_dir = dat_files.u_CACHE_DIR
+        self.u_dir = tempfile.mkdtemp()
+        dat_files.u_CACHE_DIR = os.path.join(self.u_dir, u'cache')
+
+        self.u_dat = os.path.join(self.u_dir, u'test.dat')
+        shutil.copy(_get_fixture(u'cmp_quoted.dat'), self.u_dat)
+
+    def tearDown(self):
+        dat_files.u_CACHE_DIR = self._u_cache_dir
+        shutil.rmtree(self.u_dir)
+
+    def test_disabled_by_default(self):
+        dat_files.RomSetContainer(self.u_dat)
+        self.assertFalse(os.path.exists(dat_files.u_CACHE_DIR))
+
+    def test_cache(self):
+        o_parsed = dat_files.RomSetContainer(self.u_dat, pb_cache=True)
+        self.assertEqual(len(os.listdir(dat_files.u_CACHE_DIR)), 1)
+
+        # Only the hashes already computed are stored
+        self.assertEqual(o_parsed.lo_romsets[0]._du_hashes, {})
+
+        o_cached = dat_files.RomSetContainer(self.u_dat, pb_cache=True)
+        self.assertEqual([o_romset.u_name for o_romset in o_cached], [o_romset.u_name for o_romset in o_parsed])
+        self.assertEqual(o_cached.get_romsets_by_field(u'u_name', True, (u'Super Mario World (USA)',))[0].u_ccrc32,
+                         u'b19ed489')
+
+        # A modified dat is parsed again
+        with open(self.u_dat, 'ab') as o_file:
+            o_file.write('\ngame (\n\tname "Zelda"\n\tdescription "Zelda"\n)\n')
+        self.assertEqual(dat_files.RomSetContainer(self.u_dat, pb_cache=True).i_romsets, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
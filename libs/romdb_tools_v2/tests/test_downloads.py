@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for libs.downloads.
+"""
+
+import errno
+import os
+import shutil
+import tempfile
+import unittest
+
+from libs import downloads
+
+
+class TestValidatorIndex(unittest.TestCase):
+    def setUp(self):
+        self.u_dir = tempfile.mkdtemp()
+        self.u_file = os.path.join(self.u_dir, downloads.u_INDEX_FILE)
+
+    def tearDown(self):
+        shutil.rmtree(self.u_dir)
+
+    def test_periodic_save(self):
+        o_index = downloads.ValidatorIndex(self.u_file, pi_save_every=2)
+        o_index.set(os.path.join(self.u_dir, u'a.png'), u'"a"', None)
+        self.assertFalse(os.path.isfile(self.u_file))
+
+        # An interrupted run keeps the validators saved so far
+        o_index.set(os.path.join(self.u_dir, u'b.png'), None, u'Mon, 01 Jan 2018 00:00:00 GMT')
+        o_index.set(os.path.join(self.u_dir, u'c.png'), u'"c"', None)
+        o_loaded = downloads.ValidatorIndex(self.u_file)
+        self.assertEqual(len(o_loaded), 2)
+        self.assertEqual(o_loaded.get(os.path.join(self.u_dir, u'a.png')), (u'"a"', None))
+
+        o_index.save()
+        self.assertEqual(len(downloads.ValidatorIndex(self.u_file)), 3)
+
+
+class _FakeHeaders(object):
+    def __init__(self, dx_headers):
+        self.dx_headers = dx_headers
+
+    def getheader(self, ps_name):
+        return self.dx_headers.get(ps_name)
+
+
+class _FakeResponse(object):
+    """
+    Response serving the body in small chunks. When i_fail_after is set, reading raises IOError after that many bytes
+    as a dropped connection would.
+    """
+    def __init__(self, ps_body, pi_length=None, pi_fail_after=None):
+        self.s_body = ps_body
+        self.i_fail_after = pi_fail_after
+        self.i_pos = 0
+        if pi_length is None:
+            pi_length = len(ps_body)
+        self.o_headers = _FakeHeaders({'Content-Length': str(pi_length)})
+
+    def info(self):
+        return self.o_headers
+
+    def read(self, pi_size):
+        if (self.i_fail_after is not None) and (self.i_pos >= self.i_fail_after):
+            raise IOError(u'Connection reset by peer')
+        s_chunk = self.s_body[self.i_pos:self.i_pos + min(pi_size, 16)]
+        self.i_pos += len(s_chunk)
+        return s_chunk
+
+
+class TestSaveResponse(unittest.TestCase):
+    s_PNG = downloads.s_PNG_SIGNATURE + 'x' * 100 + downloads.s_PNG_IEND
+    s_OLD = 'previous file'
+
+    def setUp(self):
+        self.u_dir = tempfile.mkdtemp()
+        self.u_file = os.path.join(self.u_dir, u'Actraiser (Japan).png')
+        with open(self.u_file, 'wb') as o_file:
+            o_file.write(self.s_OLD)
+        self._f_fsync = downloads.os.fsync
+
+    def tearDown(self):
+        downloads.os.fsync = self._f_fsync
+        shutil.rmtree(self.u_dir)
+
+    def _assert_untouched(self):
+        """
+        Method to check the destination file was kept and no temporary file was left behind.
+        """
+        self.assertEqual(os.listdir(self.u_dir), [os.path.basename(self.u_file)])
+        with open(self.u_file, 'rb') as o_file:
+            self.assertEqual(o_file.read(), self.s_OLD)
+
+    def test_downloaded(self):
+        self.assertEqual(downloads.save_response(_FakeResponse(self.s_PNG), self.u_file), 'downloaded')
+        self.assertEqual(os.listdir(self.u_dir), [os.path.basename(self.u_file)])
+        with open(self.u_file, 'rb') as o_file:
+            self.assertEqual(o_file.read(), self.s_PNG)
+
+    def test_length_mismatch(self):
+        o_response = _FakeResponse(self.s_PNG, pi_length=len(self.s_PNG) + 10)
+        self.assertEqual(downloads.save_response(o_response, self.u_file), 'download_error')
+        self._assert_untouched()
+
+    def test_png_without_iend(self):
+        s_truncated = self.s_PNG[:-len(downloads.s_PNG_IEND)]
+        self.assertEqual(downloads.save_response(_FakeResponse(s_truncated), self.u_file), 'download_error')
+        self._assert_untouched()
+
+    def test_read_error(self):
+        o_response = _FakeResponse(self.s_PNG, pi_fail_after=32)
+        self.assertEqual(downloads.save_response(o_response, self.u_file), 'download_error')
+        self._assert_untouched()
+
+    def test_flush_error(self):
+        def _fsync(pi_fd):
+            raise OSError(errno.ENOSPC, u'No space left on device')
+
+        downloads.os.fsync = _fsync
+        self.assertEqual(downloads.save_response(_FakeResponse(self.s_PNG), self.u_file), 'write_error')
+        self._assert_untouched()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for libs.image_check. The images are built on the fly, only their structure matters.
+"""
+
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+import zlib
+
+from libs import image_check
+
+
+def _get_png_chunk(ps_type, ps_data):
+    i_crc = zlib.crc32(ps_type + ps_data) & 0xffffffff
+    return struct.pack('>I', len(ps_data)) + ps_type + ps_data + struct.pack('>I', i_crc)
+
+
+def _get_png():
+    s_ihdr = struct.pack('>IIBBBBB', 1, 1, 8, 0, 0, 0, 0)
+    return (image_check.s_PNG_SIGNATURE + _get_png_chunk('IHDR', s_ihdr)
+            + _get_png_chunk('IDAT', zlib.compress('\x00\x00')) + _get_png_chunk('IEND', ''))
+
+
+def _get_jpeg():
+    # SOI, APP0 with 3 bytes of payload, fill byte, SOS with 1 byte of payload, image data and EOI
+    return (image_check.s_JPEG_SOI + '\xff\xe0\x00\x05abc' + '\xff\xff\xda\x00\x03x' + '\x12\x34'
+            + image_check.s_JPEG_EOI)
+
+
+class TestCheckImage(unittest.TestCase):
+    def setUp(self):
+        self.u_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.u_dir)
+
+    def _check(self, ps_data, pu_name=u'image.png'):
+        u_file = os.path.join(self.u_dir, pu_name)
+        with open(u_file, 'wb') as o_file:
+            o_file.write(ps_data)
+
+        u_file_checked, u_error = image_check.check_image(u_file)
+        self.assertEqual(u_file_checked, u_file)
+        return u_error
+
+    def test_png(self):
+        s_png = _get_png()
+        self.assertEqual(self._check(s_png), None)
+        self.assertEqual(self._check(s_png[:-12]), u'Truncated file, IEND chunk not found')
+        self.assertEqual(self._check(s_png[:-14]), u'Truncated file, chunk #1 "IDAT" incomplete')
+
+        # A byte of the IDAT data modified
+        i_data = len(image_check.s_PNG_SIGNATURE) + 25 + 8
+        s_damaged = s_png[:i_data] + chr(ord(s_png[i_data]) ^ 1) + s_png[i_data + 1:]
+        self.assertEqual(self._check(s_damaged), u'Bad CRC in chunk #1 "IDAT"')
+
+    def test_jpeg(self):
+        s_jpeg = _get_jpeg()
+
+        # The content is checked, not the extension
+        self.assertEqual(self._check(s_jpeg, u'image.png'), None)
+        self.assertEqual(self._check(s_jpeg[:-2]), u'Truncated file, EOI marker not found')
+        self.assertEqual(self._check(s_jpeg[:6]), u'Truncated file, image data not found')
+        self.assertEqual(self._check(s_jpeg[:2] + 'x' + s_jpeg[3:]), u'Invalid segment marker at byte 2')
+
+    def test_others(self):
+        self.assertEqual(self._check(''), u'Empty file')
+        self.assertEqual(self._check('GIF89a'), u'Unknown image format')
+        self.assertTrue(image_check.check_image(os.path.join(self.u_dir, u'missing.png'))[1].startswith(u'Read error'))
+
+    def test_get_image_files(self):
+        for u_path in (u'snt-crt/titles/b.png', u'snt-crt/titles/a.JPG', u'snt-crt/ingame/c.png',
+                       u'snt-crt/titles/notes.txt', u'snt-crt/other/d.png'):
+            u_file = os.path.join(self.u_dir, u_path)
+            if not os.path.isdir(os.path.dirname(u_file)):
+                os.makedirs(os.path.dirname(u_file))
+            open(u_file, 'wb').close()
+
+        self.assertEqual([os.path.relpath(u_file, self.u_dir) for u_file in image_check.get_image_files(self.u_dir)],
+                         [u'snt-crt/ingame/c.png', u'snt-crt/titles/a.JPG', u'snt-crt/titles/b.png'])
+
+
+if __name__ == '__main__':
+    unittest.main()
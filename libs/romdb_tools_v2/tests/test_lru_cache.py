@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for libs.lru_cache.
+"""
+
+import threading
+import time
+import unittest
+
+from libs import lru_cache
+
+
+class TestLruCache(unittest.TestCase):
+    def test_eviction(self):
+        o_cache = lru_cache.LruCache(2)
+        self.assertEqual(o_cache.get(u'a', unicode.upper, u'a'), u'A')
+        self.assertEqual(o_cache.get(u'b', unicode.upper, u'b'), u'B')
+
+        # a is used again, so b is the least recently used one when c arrives
+        self.assertEqual(o_cache.lookup(u'a'), (True, u'A'))
+        o_cache.get(u'c', unicode.upper, u'c')
+        self.assertEqual(len(o_cache), 2)
+        self.assertEqual(o_cache.lookup(u'b'), (False, None))
+        self.assertEqual(o_cache.lookup(u'a'), (True, u'A'))
+
+        self.assertEqual((o_cache.i_hits, o_cache.i_misses), (2, 3))
+
+        o_cache.put(u'a', u'x', pb_replace=False)
+        self.assertEqual(o_cache.lookup(u'a'), (True, u'A'))
+        o_cache.put(u'a', u'x')
+        self.assertEqual(o_cache.lookup(u'a'), (True, u'x'))
+
+        o_cache.clear()
+        self.assertEqual((len(o_cache), o_cache.i_hits, o_cache.i_misses), (0, 0, 0))
+
+    def test_errors(self):
+        o_cache = lru_cache.LruCache(2)
+        self.assertRaises(ValueError, o_cache.get, u'a', int, u'a')
+
+        # Errors are not stored
+        self.assertEqual(len(o_cache), 0)
+        self.assertEqual(o_cache.get(u'a', int, u'1'), 1)
+
+    def test_single_flight(self):
+        o_cache = lru_cache.LruCache(2)
+        o_started = threading.Event()
+        o_release = threading.Event()
+        li_calls = []
+
+        def _compute():
+            li_calls.append(1)
+            o_started.set()
+            o_release.wait()
+            return u'value'
+
+        lu_results = []
+        lo_threads = [threading.Thread(target=lambda: lu_results.append(o_cache.get(u'key', _compute)))
+                      for i_thread in range(4)]
+
+        lo_threads[0].start()
+        o_started.wait()
+        for o_thread in lo_threads[1:]:
+            o_thread.start()
+
+        # The rest of threads wait for the first one instead of computing the value again
+        while o_cache.i_hits < 3:
+            time.sleep(0.01)
+        o_release.set()
+        for o_thread in lo_threads:
+            o_thread.join()
+
+        self.assertEqual(lu_results, [u'value'] * 4)
+        self.assertEqual(len(li_calls), 1)
+        self.assertEqual((o_cache.i_hits, o_cache.i_misses), (3, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
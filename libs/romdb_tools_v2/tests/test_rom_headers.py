@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for libs.rom_headers.
+"""
+
+import hashlib
+import StringIO
+import unittest
+import zlib
+
+from libs import rom_headers
+
+
+def _get_chunks(ps_data, pi_chunk):
+    return [ps_data[i_pos:i_pos + pi_chunk] for i_pos in xrange(0, len(ps_data), pi_chunk)]
+
+
+class TestHeaders(unittest.TestCase):
+    def test_get_header_size(self):
+        self.assertEqual(rom_headers.get_header_size('NES\x1a' + '\x00' * 12, 16400, u'Zelda (USA).nes'), 16)
+        self.assertEqual(rom_headers.get_header_size('LYNX\x00', 131136, u'Chip (USA).lnx'), 64)
+        self.assertEqual(rom_headers.get_header_size('\x00' * 512, 1049088, u'Actraiser (Japan).SMC'), 512)
+        self.assertEqual(rom_headers.get_header_size('\x00' * 512, 1048576, u'Actraiser (Japan).sfc'), 0)
+
+        # Copier headers are only expected in SNES files
+        self.assertEqual(rom_headers.get_header_size('\x00' * 512, 1049088, u'Sonic (USA).md'), 0)
+
+    def test_clean_crc32(self):
+        s_rom = ''.join(chr(i_byte % 256) for i_byte in xrange(40000))
+        s_nes = 'NES\x1a' + '\xff' * 12 + s_rom
+
+        # The result doesn't depend on the size of the chunks, even when the header is split among them
+        for i_chunk in (3, 100, 1000000):
+            o_md5 = hashlib.md5()
+            tx_result = rom_headers.clean_crc32(_get_chunks(s_nes, i_chunk), len(s_nes), u'rom.nes', [o_md5])
+            self.assertEqual(tx_result, (zlib.crc32(s_rom) & 0xffffffff, len(s_rom)))
+            self.assertEqual(o_md5.hexdigest(), hashlib.md5(s_rom).hexdigest())
+
+        # Files smaller than the identification block
+        self.assertEqual(rom_headers.clean_crc32(['LYNX\x00', 'x' * 59, 'abc'], 67, u'rom.lnx'),
+                         (zlib.crc32('abc') & 0xffffffff, 3))
+        self.assertEqual(rom_headers.clean_crc32([], 0, u'rom.bin'), (0, 0))
+
+        self.assertRaises(IOError, rom_headers.clean_crc32, ['abc'], 4, u'rom.bin')
+
+    def test_read_chunks(self):
+        o_file = StringIO.StringIO('abcdefgh')
+        self.assertEqual(list(rom_headers.read_chunks(o_file, 5)), ['abcde'])
+        self.assertEqual(list(rom_headers.read_chunks(o_file)), ['fgh'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for romdb_dat_audit, auditing a small collection of zip files created on the fly against a fixture dat.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+
+import romdb_dat_audit
+
+
+u_FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), u'fixtures')
+
+
+class TestAudit(unittest.TestCase):
+    def setUp(self):
+        self.u_dir = tempfile.mkdtemp()
+        self.u_roms_dir = os.path.join(self.u_dir, u'roms')
+        os.mkdir(self.u_roms_dir)
+
+        self._add_zip(u'Super Mario World (USA).zip', u'Super Mario World (USA).sfc', 'SUPER MARIO WORLD' * 64)
+        self._add_zip(u'Actraiser.zip', u'Actraiser.sfc', 'ACTRAISER' * 64)
+        self._add_zip(u'Nodump (World).zip', u'Nodump (World).sfc', 'NODUMP')
+
+    def tearDown(self):
+        shutil.rmtree(self.u_dir)
+
+    def _add_zip(self, pu_zip, pu_name, ps_data):
+        with zipfile.ZipFile(os.path.join(self.u_roms_dir, pu_zip), 'w', zipfile.ZIP_DEFLATED) as o_zip:
+            o_zip.writestr(pu_name, ps_data)
+
+    def test_audit(self):
+        u_report = os.path.join(self.u_dir, u'report.txt')
+        di_statuses = romdb_dat_audit.audit(os.path.join(u_FIXTURES_DIR, u'audit.dat'), self.u_roms_dir, u_report,
+                                            pi_workers=1)
+
+        with open(u_report, 'rb') as o_file:
+            ds_statuses = dict(s_line.split('\t')[:2] for s_line in o_file.read().splitlines()
+                               if s_line and not s_line.startswith('#'))
+
+        self.assertEqual(ds_statuses['Super Mario World (USA)'], 'have')
+        self.assertEqual(ds_statuses['Actraiser (Japan)'], 'misnamed')
+        self.assertEqual(ds_statuses['Nodump (World)'], 'have')
+        self.assertEqual(ds_statuses['Nodump Missing (World)'], 'missing')
+        self.assertEqual(ds_statuses['Missing (World)'], 'missing')
+        self.assertEqual(di_statuses, {u'have': 2, u'misnamed': 1, u'bad': 0, u'missing': 2})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for libs.romdb_data.
+"""
+
+import gc
+import unittest
+
+from libs import romdb_data
+
+
+def _get_version_json(pu_crc32, plo_parent_games):
+    return {'s_dat_name': u'Nintendo - Super Nintendo Entertainment System',
+            's_dat_version': u'20191014',
+            's_dat_outdated': u'',
+            's_romset_platform': u'snt-crt',
+            's_romset_title': u'Super Mario World (USA)',
+            's_romset_crc32': pu_crc32,
+            'i_romset_size': 524288,
+            's_mdata_overscan': u'0, 0, 0, 0',
+            's_mdata_date': u'1991',
+            's_mdata_media_type': u'cartridge',
+            'i_mdata_media_number': 1,
+            'ai_mdata_players': [1, 2],
+            'as_mdata_multiplayer': [u'alternating'],
+            'f_mdata_rating_value': 4.5,
+            'i_mdata_rating_votes': 10,
+            'as_mdata_lang_text': [u'en'],
+            'as_mdata_lang_voice': [],
+            'as_mdata_views': [u'side'],
+            's_screenshot_title': u'',
+            's_screenshot_ingame': u'',
+            'as_mdata_screen_titles': [],
+            's_mdata_differences': u'',
+            'ao_sibling_versions': [],
+            'ao_parent_games': plo_parent_games}
+
+
+def _get_game_json(pi_nid):
+    return {'i_nid': pi_nid,
+            's_title': u'Super Mario World',
+            's_years': u'1990',
+            's_synopsis': u'',
+            'as_genres': [u'Platform'],
+            'ao_sagas': [{'i_nid': 1000 + pi_nid, 's_title': u'Mario', 's_synopsis': u'', 's_years': u'1985'}]}
+
+
+class TestInterning(unittest.TestCase):
+    def setUp(self):
+        romdb_data.clear_interned()
+
+    def _get_version(self, pu_crc32):
+        o_version = romdb_data.Version()
+        o_version.from_json(_get_version_json(pu_crc32, [_get_game_json(1)]))
+        return o_version
+
+    def test_shared_games(self):
+        o_version_a = self._get_version(u'b19ed489')
+        o_version_b = self._get_version(u'a31bead4')
+
+        o_game = o_version_a.lo_parent_games[0]
+        self.assertTrue(o_game is o_version_b.lo_parent_games[0])
+
+        # Shared data can't be modified through one of the versions
+        self.assertTrue(isinstance(o_version_a.lo_parent_games, tuple))
+        self.assertTrue(isinstance(o_game.lo_sagas, tuple))
+        self.assertTrue(isinstance(o_game.lu_genres, tuple))
+        self.assertEqual(o_game.to_json(), _get_game_json(1))
+
+    def test_released(self):
+        o_version = self._get_version(u'b19ed489')
+        o_version.lo_parent_games
+        self.assertEqual(len(romdb_data._do_games), 1)
+        self.assertEqual(len(romdb_data._do_sagas), 1)
+
+        del o_version
+        gc.collect()
+        self.assertEqual(len(romdb_data._do_games), 0)
+        self.assertEqual(len(romdb_data._do_sagas), 0)
+
+
+class TestLazyFields(unittest.TestCase):
+    def test_json_dropped(self):
+        dx_json = _get_version_json(u'b19ed489', [_get_game_json(1)])
+        o_version = romdb_data.Version()
+        o_version.from_json(dx_json)
+
+        # Only the json of the lazy fields is kept, and it's forgotten once decoded
+        self.assertEqual(sorted(o_version._dx_lazy_json), sorted(romdb_data._ts_LAZY_KEYS))
+        self.assertEqual(o_version.to_json(), dx_json)
+
+        o_version.lo_siblings
+        o_version.lo_parent_games
+        self.assertEqual(sorted(o_version._dx_lazy_json), ['as_mdata_screen_titles', 's_mdata_differences'])
+
+        o_version.o_mdata_screen_titles
+        o_version.lo_mdata_differences
+        self.assertTrue(o_version._dx_lazy_json is None)
+        self.assertEqual(o_version.to_json(), dx_json)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for romdb_rom_info batch queries. ROMdb is never reached, _fetch_version() is replaced by a fake one.
+"""
+
+import json
+import threading
+import unittest
+
+import romdb_rom_info
+
+from tests.test_romdb_data import _get_version_json
+
+
+class _FakeVersion(object):
+    def __init__(self, pu_platform, pu_crc32, plo_siblings=()):
+        self.u_romset_platform = pu_platform
+        self.u_romset_crc32 = pu_crc32
+        self.lo_siblings = list(plo_siblings)
+
+
+class TestQueryMany(unittest.TestCase):
+    def setUp(self):
+        self._f_fetch_version = romdb_rom_info._fetch_version
+        self.ltu_fetched = []
+        self._o_lock = threading.Lock()
+
+        # a and b are siblings, c has no siblings
+        def _fetch_version(pu_platform, pu_crc32):
+            with self._o_lock:
+                self.ltu_fetched.append((pu_platform, pu_crc32))
+            if pu_crc32 in (u'0000000a', u'0000000b'):
+                u_sibling = u'0000000b' if pu_crc32 == u'0000000a' else u'0000000a'
+                return _FakeVersion(pu_platform, pu_crc32, [_FakeVersion(pu_platform, u_sibling)])
+            return _FakeVersion(pu_platform, pu_crc32)
+
+        romdb_rom_info._fetch_version = _fetch_version
+        romdb_rom_info.o_VERSION_CACHE.clear()
+
+    def tearDown(self):
+        romdb_rom_info._fetch_version = self._f_fetch_version
+        romdb_rom_info.o_VERSION_CACHE.clear()
+
+    def test_siblings(self):
+        ltu_keys = [(u'snt-crt', u'0000000A'), (u'snt-crt', u'0000000c'), (u'snt-crt', u'0000000b'),
+                    (u'snt-crt', u'0000000a')]
+        dto_results = dict(((u_platform, u_crc32), o_version)
+                           for u_platform, u_crc32, o_version
+                           in romdb_rom_info.query_romset_by_crc32_many(ltu_keys, pi_workers=1))
+
+        self.assertEqual(sorted(dto_results), [(u'snt-crt', u'0000000a'), (u'snt-crt', u'0000000b'),
+                                               (u'snt-crt', u'0000000c')])
+
+        # b was satisfied by the answer for a
+        self.assertEqual(sorted(self.ltu_fetched), [(u'snt-crt', u'0000000a'), (u'snt-crt', u'0000000c')])
+
+        # But the partial sibling data is not cached, so a direct query gets the full version
+        o_version = romdb_rom_info.query_romset_by_crc32(u'snt-crt', u'0000000b')
+        self.assertEqual(len(o_version.lo_siblings), 1)
+        self.assertIn((u'snt-crt', u'0000000b'), self.ltu_fetched)
+
+
+class _FakeResponse(object):
+    def __init__(self, pi_status, ps_data):
+        self.i_status = pi_status
+        self.s_data = ps_data
+
+    def getcode(self):
+        return self.i_status
+
+    def read(self):
+        return self.s_data
+
+    def close(self):
+        pass
+
+
+class TestFetchVersion(unittest.TestCase):
+    def setUp(self):
+        self._f_urlopen = romdb_rom_info.urllib.urlopen
+        self.lo_responses = []
+        self.lu_urls = []
+
+        def _urlopen(pu_url):
+            self.lu_urls.append(pu_url)
+            return self.lo_responses.pop(0)
+
+        romdb_rom_info.urllib.urlopen = _urlopen
+        romdb_rom_info.o_VERSION_CACHE.clear()
+
+    def tearDown(self):
+        romdb_rom_info.urllib.urlopen = self._f_urlopen
+        romdb_rom_info.o_VERSION_CACHE.clear()
+
+    def test_failed_fetch_retried(self):
+        self.lo_responses = [_FakeResponse(500, '<html>Internal Server Error</html>'),
+                             _FakeResponse(200, '{"s_dat_name": "Nintendo - Super'),
+                             _FakeResponse(200, json.dumps(_get_version_json(u'b19ed489', [])))]
+
+        self.assertRaises(IOError, romdb_rom_info.query_romset_by_crc32, u'snt-crt', u'b19ed489')
+        self.assertRaises(ValueError, romdb_rom_info.query_romset_by_crc32, u'snt-crt', u'b19ed489')
+        o_version = romdb_rom_info.query_romset_by_crc32(u'snt-crt', u'b19ed489')
+        self.assertEqual(o_version.u_romset_crc32, u'b19ed489')
+        self.assertEqual(len(self.lu_urls), 3)
+
+    def test_not_found_cached(self):
+        self.lo_responses = [_FakeResponse(404, ''), _FakeResponse(200, '{}')]
+
+        self.assertEqual(romdb_rom_info.query_romset_by_crc32(u'snt-crt', u'00000001'), None)
+        self.assertEqual(romdb_rom_info.query_romset_by_crc32(u'snt-crt', u'00000001'), None)
+        self.assertEqual(romdb_rom_info.query_romset_by_crc32(u'snt-crt', u'00000002'), None)
+        self.assertEqual(len(self.lu_urls), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests for libs.scan_cache.
+"""
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from libs import scan_cache
+
+
+class TestScanCache(unittest.TestCase):
+    def setUp(self):
+        self.u_dir = tempfile.mkdtemp()
+        self.u_db = os.path.join(self.u_dir, u'cache', u'scan_cache.sqlite')
+        self.u_rom = os.path.join(self.u_dir, u'Actraiser (Japan).sfc')
+        with open(self.u_rom, 'wb') as o_file:
+            o_file.write('actraiser')
+
+        self.ltx_roms = [(u'Actraiser (Japan).sfc', 0x6ee0a4ba, 9, None, None)]
+
+    def tearDown(self):
+        shutil.rmtree(self.u_dir)
+
+    def test_set_get(self):
+        o_cache = scan_cache.ScanCache(self.u_db)
+        self.assertEqual(o_cache.get(self.u_rom), None)
+
+        o_cache.set(self.u_rom, self.ltx_roms)
+        self.assertEqual(o_cache.get(self.u_rom), self.ltx_roms)
+
+        # Scans with and without headers are different entries
+        self.assertEqual(o_cache.get(self.u_rom, pb_headers=True), None)
+        o_cache.set(self.u_rom, [(u'Actraiser (Japan).sfc', 1, 9, None, None)], pb_headers=True)
+        self.assertEqual(o_cache.get(self.u_rom), self.ltx_roms)
+        self.assertEqual(len(o_cache), 2)
+
+        o_cache.close()
+
+        # Entries are kept in disk
+        o_cache = scan_cache.ScanCache(self.u_db)
+        self.assertEqual(o_cache.get(self.u_rom), self.ltx_roms)
+
+        o_cache.remove(self.u_rom)
+        self.assertEqual(len(o_cache), 0)
+        o_cache.close()
+
+    def test_modified_file(self):
+        o_cache = scan_cache.ScanCache(self.u_db)
+        o_cache.set(self.u_rom, self.ltx_roms)
+
+        with open(self.u_rom, 'ab') as o_file:
+            o_file.write('!')
+        self.assertEqual(o_cache.get(self.u_rom), None)
+
+        os.remove(self.u_rom)
+        self.assertEqual(o_cache.get(self.u_rom), None)
+        o_cache.close()
+
+    def test_old_format(self):
+        o_cache = scan_cache.ScanCache(self.u_db)
+        o_cache.set(self.u_rom, self.ltx_roms)
+        o_cache.close()
+
+        o_db = sqlite3.connect(self.u_db)
+        o_db.execute('PRAGMA user_version = 0')
+        o_db.close()
+
+        # Databases with other formats are emptied
+        o_cache = scan_cache.ScanCache(self.u_db)
+        self.assertEqual(len(o_cache), 0)
+        o_cache.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
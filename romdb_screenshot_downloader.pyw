@@ -11,6 +11,7 @@ import urllib2
 import webbrowser
 
 import libs.sitemap
+import libs.romdb_tools_v2.libs.downloads as downloads
 import libs.romdb_tools_v2.romdb_rom_info as romdb_rom_info
 
 # Constants
@@ -384,6 +385,17 @@ class MainWindow:
                 if u_platform in lu_selected_platforms:
                     lu_filtered_urls.append(u_url)
 
+        # Repeated versions in the sitemap are only processed once. ROMdb results come back with a lowercase CRC32, so
+        # it's only used as lookup key and the CRC32 written in the sitemap is kept for the file names.
+        ltu_keys = []
+        dtu_sitemap_crc32s = {}
+        for u_url in lu_filtered_urls:
+            u_platform, u_crc32 = _platform_and_crc32_from_url(u_url)
+            tu_key = (u_platform, u_crc32.lower())
+            if tu_key not in dtu_sitemap_crc32s:
+                dtu_sitemap_crc32s[tu_key] = u_crc32
+                ltu_keys.append(tu_key)
+
         # [3/?] Downloading images for selected URLs
         #-------------------------------------------
         i_romdb_title = 0    # Number of ROMdb title screenshots found
@@ -395,90 +407,103 @@ class MainWindow:
         i_local_title = 0    # Number of local title screenshots
         i_local_ingame = 0   # Number of local ingame screenshots
 
-        i_total = len(lu_filtered_urls)
+        i_total = len(ltu_keys)
         u_total = unicode(i_total)
         i_total_char_len = len(u_total)
         self._u_log = u''
-        for i_current_url_pos, u_url in enumerate(tuple(lu_filtered_urls)):
-            u_current_url_pos = u'%s' % (i_current_url_pos + 1)
-            u_current_url_pos = u_current_url_pos.rjust(i_total_char_len, u' ')
-            u_platform, u_crc32 = _platform_and_crc32_from_url(u_url)
-            o_romdb_version = romdb_rom_info.query_romset_by_crc32(pu_platform=u_platform, pu_crc32=u_crc32)
 
-            if o_romdb_version is None:
-                u_window_msg = u'FOO'
-                u_log_msg = u'BAR'
+        # HTTP validators of the already downloaded images, so they are only downloaded again when they change
+        o_index = downloads.ValidatorIndex(os.path.join(u_output_root, downloads.u_INDEX_FILE))
 
-            else:
-                # Downloading title screenshots
-                #------------------------------
-                u_output_dir = _build_save_dir(u_output_root, u_platform, ps_type='title')
+        # ROMdb is queried concurrently for several versions, and they are processed as soon as they are received
+        o_results = romdb_rom_info.query_romset_by_crc32_many(ltu_keys)
+
+        # The index is also saved periodically, and whatever happens, the validators already received are kept
+        try:
+            for i_current_url_pos, (u_platform, u_key_crc32, o_romdb_version) in enumerate(o_results):
+                u_crc32 = dtu_sitemap_crc32s[(u_platform, u_key_crc32)]
+                u_current_url_pos = u'%s' % (i_current_url_pos + 1)
+                u_current_url_pos = u_current_url_pos.rjust(i_total_char_len, u' ')
+
+                if o_romdb_version is None:
+                    u_window_msg = u'FOO'
+                    u_log_msg = u'BAR'
 
-                if self._o_var_crc_name.get():
-                    s_filename = u_crc32
-                else:
-                    s_filename = o_romdb_version.u_romset_title
-
-                u_output_file = os.path.join(u_output_dir, u'%s.png' % s_filename)
-                s_result = _download_file(
-                               o_romdb_version.u_screenshot_title,
-                               u_output_file,
-                               pb_overwrite=self._o_var_overwrite.get())
-
-                # Keeping track of online/downloaded/local images to make some stats
-                if o_romdb_version.u_screenshot_title is not None:
-                    i_romdb_title += 1
-                if s_result == 'downloaded':
-                    i_dl_title += 1
-                if s_result in ('downloaded', 'skipped'):
-                    i_local_title += 1
-
-                u_title = du_download_result_codes_to_log[s_result]
-
-                # Downloading ingame screenshots
-                #------------------------------
-                u_output_dir = _build_save_dir(u_output_root, u_platform, ps_type='ingame')
-
-                if self._o_var_crc_name.get():
-                    s_filename = u_crc32
                 else:
-                    s_filename = o_romdb_version.u_romset_title
-
-                u_output_file = os.path.join(u_output_dir, u'%s.png' % s_filename)
-                s_result = _download_file(
-                               o_romdb_version.u_screenshot_ingame,
-                               u_output_file,
-                               pb_overwrite=self._o_var_overwrite.get())
-
-                # Keeping track of online/downloaded/local images to make some stats
-                if o_romdb_version.u_screenshot_ingame is not None:
-                    i_romdb_ingame += 1
-                if s_result == 'downloaded':
-                    i_dl_ingame += 1
-                if s_result in ('downloaded', 'skipped'):
-                    i_local_ingame += 1
-
-                u_ingame = du_download_result_codes_to_log[s_result]
-
-                u_face = u'%s_%s' % (u_title, u_ingame)
-                u_top_left = u'%s %s %s' % (u_face, u_platform, u_crc32)
-                u_progress = u'[%s/%s]' % (u_current_url_pos, u_total)
-                u_progress = u_progress.rjust(64 - len(u_top_left), u' ')
-                u_top = u'%s %s\n' % (u_top_left, u_progress)
-                u_bottom = u'    %s' % o_romdb_version.u_romset_title
-                u_window_msg = u'%s%s' % (u_top, u_bottom)
-
-                # log message doesn't contain version name because it'll be resorted before saving to disk
-                u_log_msg = u'%s %s %s | %s' % (
-                                u_face,
-                                u_platform,
-                                u_crc32,
-                                o_romdb_version.u_romset_title,
-                                )
-
-            self._o_text_var.set(u_window_msg)
-            self._u_log += u'%s\n' % u_log_msg
-            self._o_window.update_idletasks()
+                    # Downloading title screenshots
+                    #------------------------------
+                    u_output_dir = _build_save_dir(u_output_root, u_platform, ps_type='title')
+
+                    if self._o_var_crc_name.get():
+                        s_filename = u_crc32
+                    else:
+                        s_filename = o_romdb_version.u_romset_title
+
+                    u_output_file = os.path.join(u_output_dir, u'%s.png' % s_filename)
+                    s_result = _download_file(
+                                   o_romdb_version.u_screenshot_title,
+                                   u_output_file,
+                                   pb_overwrite=self._o_var_overwrite.get(),
+                                   po_index=o_index)
+
+                    # Keeping track of online/downloaded/local images to make some stats
+                    if o_romdb_version.u_screenshot_title is not None:
+                        i_romdb_title += 1
+                    if s_result == 'downloaded':
+                        i_dl_title += 1
+                    if s_result in ('downloaded', 'skipped'):
+                        i_local_title += 1
+
+                    u_title = du_download_result_codes_to_log[s_result]
+
+                    # Downloading ingame screenshots
+                    #------------------------------
+                    u_output_dir = _build_save_dir(u_output_root, u_platform, ps_type='ingame')
+
+                    if self._o_var_crc_name.get():
+                        s_filename = u_crc32
+                    else:
+                        s_filename = o_romdb_version.u_romset_title
+
+                    u_output_file = os.path.join(u_output_dir, u'%s.png' % s_filename)
+                    s_result = _download_file(
+                                   o_romdb_version.u_screenshot_ingame,
+                                   u_output_file,
+                                   pb_overwrite=self._o_var_overwrite.get(),
+                                   po_index=o_index)
+
+                    # Keeping track of online/downloaded/local images to make some stats
+                    if o_romdb_version.u_screenshot_ingame is not None:
+                        i_romdb_ingame += 1
+                    if s_result == 'downloaded':
+                        i_dl_ingame += 1
+                    if s_result in ('downloaded', 'skipped'):
+                        i_local_ingame += 1
+
+                    u_ingame = du_download_result_codes_to_log[s_result]
+
+                    u_face = u'%s_%s' % (u_title, u_ingame)
+                    u_top_left = u'%s %s %s' % (u_face, u_platform, u_crc32)
+                    u_progress = u'[%s/%s]' % (u_current_url_pos, u_total)
+                    u_progress = u_progress.rjust(64 - len(u_top_left), u' ')
+                    u_top = u'%s %s\n' % (u_top_left, u_progress)
+                    u_bottom = u'    %s' % o_romdb_version.u_romset_title
+                    u_window_msg = u'%s%s' % (u_top, u_bottom)
+
+                    # log message doesn't contain version name because it'll be resorted before saving to disk
+                    u_log_msg = u'%s %s %s | %s' % (
+                                    u_face,
+                                    u_platform,
+                                    u_crc32,
+                                    o_romdb_version.u_romset_title,
+                                    )
+
+                self._o_text_var.set(u_window_msg)
+                self._u_log += u'%s\n' % u_log_msg
+                self._o_window.update_idletasks()
+
+        finally:
+            o_index.save()
 
         self._u_log += u'\nIngame: ROMdb %i/%i  local %i (%.1f %%)  downloaded %i' % (
             i_romdb_title,
@@ -623,13 +648,22 @@ def _build_save_dir(pu_root, pu_platform, ps_type):
     return u_dir
 
 
-def _download_file(pu_source, pu_destination, pb_overwrite=False):
+def _download_file(pu_source, pu_destination, pb_overwrite=False, po_index=None):
     """
     Function to download a file.
 
+    When overwriting is enabled and the validators (ETag/Last-Modified) of the local file are known, a conditional
+    request is made so the file is only downloaded and rewritten if it changed in ROMdb.
+
     :param pu_source:
     :param pu_destination:
 
+    :param pb_overwrite: Whether already existing files will be downloaded again (when they changed).
+    :type pb_overwrite: bool
+
+    :param po_index: Index with the HTTP validators of the downloaded files.
+    :type po_index: libs.romdb_tools_v2.libs.downloads.ValidatorIndex
+
     :return:
     :rtype str
     """
@@ -642,15 +676,29 @@ def _download_file(pu_source, pu_destination, pb_overwrite=False):
         s_result = 'skipped'
 
     else:
-        o_remote_file = urllib2.urlopen(pu_source)
-        s_remote_data = o_remote_file.read()
+        u_etag = None
+        u_last_modified = None
+        if (po_index is not None) and os.path.isfile(pu_destination):
+            u_etag, u_last_modified = po_index.get(pu_destination)
 
         try:
-            with open(pu_destination, 'wb') as o_file:
-                o_file.write(s_remote_data)
-                s_result = 'downloaded'
-        except IOError:
-            s_result = 'write_error'
+            o_remote_file = downloads.conditional_urlopen(pu_source, u_etag, u_last_modified)
+        except (urllib2.URLError, IOError):
+            o_remote_file = None
+            s_result = 'download_error'
+        else:
+            # Remote file didn't change since the last download, the local copy is kept untouched
+            if o_remote_file is None:
+                s_result = 'skipped'
+
+            else:
+                s_result = downloads.save_response(o_remote_file, pu_destination)
+
+                if po_index is not None:
+                    if s_result == 'downloaded':
+                        po_index.set(pu_destination, *downloads.get_validators(o_remote_file))
+                    else:
+                        po_index.remove(pu_destination)
 
     return s_result
 